@@ -0,0 +1,71 @@
+"""Directory autocomplete: filtering the listing per keystroke vs the folded index.
+
+Builds a synthetic listing of nested Arabic and Latin folder names and times each
+prefix of a few queries, the way `/api/directories` is called while typing:
+
+    python -m benchmarks.directory_search [--directories N] [--limit N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from core.dirtree import DirectoryIndex
+
+STEMS = ['كتب', 'الفقه', 'التفسير', 'الحديث', 'مخطوطات', 'رسائل', 'Books', 'Archive', 'Scans']
+QUERIES = ['الحديث', 'books', 'رسائل قديمة', 'مخطوط']
+
+
+def synthetic_listing(count: int) -> list[str]:
+    rng = random.Random(0)
+    listing = ['.']
+    # folders that may still get children, at most four levels deep
+    parents = ['.']
+    while len(listing) < count:
+        parent = rng.choice(parents)
+        name = f'{rng.choice(STEMS)} {rng.randrange(10_000)}'
+        path = name if parent == '.' else f'{parent}/{name}'
+        listing.append(path)
+        if path.count('/') < 3:
+            parents.append(path)
+    return listing
+
+
+def substring_filter(listing: list[str], query: str, limit: int) -> list[str]:
+    """The previous lookup: lower-case every entry on every request."""
+    term = query.lower()
+    return [item for item in listing if term in item.lower()][:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--directories', type=int, default=300_000)
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+
+    listing = synthetic_listing(args.directories)
+    started = time.perf_counter()
+    index = DirectoryIndex(listing)
+    print(f'{len(listing)} directories, index built in {time.perf_counter() - started:.2f} s')
+
+    keystrokes = [query[:n] for query in QUERIES for n in range(1, len(query) + 1)]
+    for name, lookup in (
+        ('filter', lambda q: substring_filter(listing, q, args.limit)),
+        ('index', lambda q: index.search(q, args.limit)),
+    ):
+        timings = []
+        for query in keystrokes:
+            started = time.perf_counter()
+            lookup(query)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f'{name:<7} median {timings[len(timings) // 2] * 1e3:8.3f} ms  '
+            f'max {timings[-1] * 1e3:8.3f} ms  over {len(keystrokes)} keystrokes'
+        )
+
+
+if __name__ == '__main__':
+    main()
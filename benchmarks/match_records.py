@@ -0,0 +1,114 @@
+"""Per-match cost of Pydantic models vs slotted match records.
+
+Parses a synthetic rg JSON stream of 100k matches and turns every line into an
+event the way `ResultStreamProcessor` does, then serializes it for SSE:
+
+    python -m benchmarks.match_records [--matches N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import orjson
+
+from core import highlight_matches
+from core.schemas import MatchRecord, SearchMatch
+from core.streaming import BATCH_SIZE, encode_events
+
+
+def synthetic_output(matches: int) -> list[bytes]:
+    lines = []
+    for i in range(matches):
+        text = f'سطر رقم {i} فيه كلمة البحث وبعض النص الإضافي\n'
+        start = text.encode().index('البحث'.encode())
+        lines.append(
+            orjson.dumps(
+                {
+                    'type': 'match',
+                    'data': {
+                        'path': {'text': f'books/{i % 500}/part-{i % 7}.txt'},
+                        'lines': {'text': text},
+                        'line_number': i + 1,
+                        'absolute_offset': i * 80,
+                        'submatches': [
+                            {'match': {'text': 'البحث'}, 'start': start, 'end': start + 10}
+                        ],
+                    },
+                }
+            )
+        )
+    return lines
+
+
+def _fields(line: bytes) -> dict[str, Any]:
+    data = orjson.loads(line)['data']
+    text = data['lines']['text']
+    return {
+        'path': data['path']['text'],
+        'line_number': data['line_number'],
+        'lines': text,
+        'submatches': data['submatches'],
+        'highlighted_text': highlight_matches(text, data['submatches']),
+    }
+
+
+def pydantic_path(lines: list[bytes]) -> list[Any]:
+    events = []
+    for line in lines:
+        match = SearchMatch(**_fields(line))
+        events.append(f'data: {orjson.dumps(match.model_dump()).decode()}\n\n')
+    return events
+
+
+def record_path(lines: list[bytes]) -> list[Any]:
+    frames = []
+    batch: list[MatchRecord] = []
+    for line in lines:
+        batch.append(MatchRecord(**_fields(line)))
+        if len(batch) == BATCH_SIZE:
+            frames.append(encode_events(batch))
+            batch = []
+    frames.append(encode_events(batch))
+    return frames
+
+
+def retained(make: Callable[..., Any], fields: list[dict[str, Any]]) -> float:
+    """Bytes held per event by a buffer of events (result cache, flight replay)."""
+    tracemalloc.start()
+    events = [make(**item) for item in fields]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+    return current / len(fields)
+
+
+def measure(name: str, run: Callable[[list[bytes]], list[Any]], lines: list[bytes]) -> None:
+    started = time.process_time()
+    run(lines)
+    cpu = time.process_time() - started
+    print(f'{name:<10} {cpu * 1e6 / len(lines):7.2f} us/match  {len(lines) / cpu:9.0f} matches/s')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--matches', type=int, default=100_000)
+    args = parser.parse_args()
+
+    lines = synthetic_output(args.matches)
+    print(f'{args.matches} synthetic matches, parse + build + SSE encode')
+    measure('pydantic', pydantic_path, lines)
+    measure('records', record_path, lines)
+
+    fields = [_fields(line) for line in lines]
+    print('retained per buffered event (excluding shared field values)')
+    print(f'pydantic   {retained(SearchMatch, fields):7.0f} B')
+    print(f'records    {retained(MatchRecord, fields):7.0f} B')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Per-query latency of the rg subprocess vs the in-process engine.
+
+Searches a synthetic corpus that stays hot in the page cache with every query
+mode and reports p50/p95 latency per engine:
+
+    python -m benchmarks.native_engine [--files N] [--queries N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from core import stream_search
+from core.patterns import build_pattern
+from core.sharding import invalidate_shard_plans
+
+WORDS = 'كِتَابٌ بَابُ فصل مسألة قال حدثنا أخبرنا الشَّيخ عن في من إلى على هذا ذلك'.split()
+QUERIES = ['الشيخ', 'حدثنا عن', 'كتاب', 'مسألة']
+
+
+def build_corpus(root: Path, files: int) -> int:
+    rng = random.Random(0)
+    total = 0
+    for i in range(files):
+        path = root / f'shelf{i % 8}' / f'book{i}.txt'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('\n'.join(' '.join(rng.choices(WORDS, k=10)) for _ in range(200)))
+        total += path.stat().st_size
+    return total
+
+
+async def query(data_dir: Path, mode: str, text: str, engine: str) -> float:
+    pattern, use_pcre = build_pattern(mode, text)
+    started = time.perf_counter()
+    processor = stream_search(pattern, '.', [], data_dir, use_pcre=use_pcre, engine=engine)
+    async for _ in processor.process():
+        pass
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        size = build_corpus(data_dir, args.files)
+        print(f'corpus: {size / 1e6:.1f} MB in {args.files} files')
+        for mode in ('smart', 'ignore'):
+            for engine in ('rg', 'native'):
+                invalidate_shard_plans()
+                # warm the page cache, the walk and the compiled pattern
+                asyncio.run(query(data_dir, mode, QUERIES[0], engine))
+                timings = sorted(
+                    asyncio.run(query(data_dir, mode, QUERIES[i % len(QUERIES)], engine))
+                    for i in range(args.queries)
+                )
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(
+                    f'{mode:<6} {engine:<6} p50 {statistics.median(timings) * 1e3:7.1f} ms  '
+                    f'p95 {p95 * 1e3:7.1f} ms'
+                )
+
+
+if __name__ == '__main__':
+    main()
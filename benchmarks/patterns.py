@@ -0,0 +1,118 @@
+"""Pattern building: the per-character loops vs translation tables vs the LRU cache.
+
+Builds the pattern of every prefix of a set of Arabic queries (with and without
+diacritics, tatweel and letter variants) in each mode, the way the search box
+calls `build_pattern` while typing:
+
+    python -m benchmarks.patterns [--rounds N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import unicodedata
+
+from core import patterns
+from core.patterns import build_ignore, build_pattern, build_plain, build_require
+
+QUERIES = [
+    'بسم الله الرحمن الرحيم',
+    'بِسْمِ اللَّهِ الرَّحْمَٰنِ الرَّحِيمِ',
+    'الحمد لله رب العالمين',
+    'الْحَمْدُ لِلَّهِ رَبِّ الْعَالَمِينَ',
+    'إنما الأعمال بالنيات',
+    'إِنَّمَا الْأَعْمَالُ بِالنِّيَّاتِ',
+    'قال رسول الله صلى الله عليه وسلم',
+    'كتاب الصلاة باب فضل الجماعة',
+    'الصَّلَاةُ',
+    'الصلـــاة',
+    'مسألة في الطهارة',
+    'المسأله',
+    'ابن تيمية',
+    'أبو حامد الغزالي',
+    'إحياء علوم الدين',
+    'مقدمة ابن خلدون',
+    'تفسير الطبري سورة البقرة',
+    'وَإِذْ قَالَ رَبُّكَ لِلْمَلَائِكَةِ',
+    'فتح الباري شرح صحيح البخاري',
+    'Ibn Khaldun muqaddima',
+]
+MODES = ['smart', 'ignore', 'require']
+
+
+# the per-character implementation the translation tables replaced
+def _legacy_sanitize(text: str) -> str:
+    out = [ch for ch in text if ch == ' ' or unicodedata.category(ch)[0] in {'L', 'N', 'M'}]
+    return ''.join(out).strip()
+
+
+def _legacy_plain(query: str) -> str:
+    expanded = ''.join(patterns._expand(ch) for ch in _legacy_sanitize(query))
+    return '.*?'.join(part for part in expanded.split(' ') if part)
+
+
+def _legacy_marked(query: str, require: bool) -> str:
+    s = _legacy_sanitize(query)
+    out: list[str] = []
+    i, n = 0, len(s)
+    while i < n:
+        ch = s[i]
+        i += 1
+        if ch == ' ':
+            out.append('.*?')
+            continue
+        if patterns._is_mark(ch):
+            continue
+        token = patterns._expand(ch)
+        if not patterns._is_arabic(ch):
+            out.append(token)
+            continue
+        j = i
+        while j < n and patterns._is_mark(s[j]):
+            j += 1
+        if not require:
+            out.append(f'(?:{token}[\\p{{M}}\\x{{0640}}]*)')
+        else:
+            out.append(f'(?:{token}[\\p{{M}}]+)' if j > i else token)
+        i = j
+    return ''.join(out)
+
+
+LEGACY = {
+    'smart': _legacy_plain,
+    'ignore': lambda q: _legacy_marked(q, require=False),
+    'require': lambda q: _legacy_marked(q, require=True),
+}
+TABLES = {'smart': build_plain, 'ignore': build_ignore, 'require': build_require}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    keystrokes = [
+        (mode, query[:n]) for mode in MODES for query in QUERIES for n in range(1, len(query) + 1)
+    ]
+    for mode, query in keystrokes:
+        if LEGACY[mode](query) != TABLES[mode](query):
+            raise SystemExit(f'{mode} pattern differs for {query!r}')
+    print(f'{len(keystrokes)} keystrokes over {len(QUERIES)} queries and {len(MODES)} modes')
+
+    for name, build in (
+        ('loops', lambda mode, q: LEGACY[mode](q)),
+        ('tables', lambda mode, q: TABLES[mode](q)),
+        ('cached', build_pattern),
+    ):
+        best = float('inf')
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            for mode, query in keystrokes:
+                build(mode, query)
+            best = min(best, time.perf_counter() - started)
+        print(f'{name:<7} {best / len(keystrokes) * 1e6:8.2f} us per pattern')
+
+
+if __name__ == '__main__':
+    main()
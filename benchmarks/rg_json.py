@@ -0,0 +1,128 @@
+"""Throughput of parsing rg's JSON output into match records, in MB/s.
+
+Feeds a synthetic rg stream (many small files with a few matches each, context
+lines, per-file `end` stats and a summary) through the old line-by-line parse
+and through `ResultStreamProcessor.parse_output`:
+
+    python -m benchmarks.rg_json [--files N] [--matches N] [--rounds N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections.abc import Callable, Coroutine
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from core import ResultStreamProcessor
+
+TEXT = 'حدثنا أبو بكر قال أخبرنا الشيخ عن كتاب الطهارة في باب المياه وما جاء فيها'
+
+
+def _stats() -> dict[str, Any]:
+    return {
+        'elapsed': {'secs': 0, 'nanos': 52_000, 'human': '0.000052s'},
+        'searches': 1,
+        'searches_with_match': 1,
+        'bytes_searched': 48_000,
+        'bytes_printed': 1_200,
+        'matched_lines': 3,
+        'matches': 3,
+    }
+
+
+def synthetic_output(files: int, matches: int) -> bytes:
+    start = TEXT.encode().index('الشيخ'.encode())
+    events: list[dict[str, Any]] = []
+    for i in range(files):
+        path = {'text': f'./shelf{i % 20}/book{i}.txt'}
+        events.append({'type': 'begin', 'data': {'path': path}})
+        for n in range(matches):
+            line = n * 10 + 1
+            for kind, number in (('context', line - 1), ('match', line), ('context', line + 1)):
+                data: dict[str, Any] = {
+                    'path': path,
+                    'lines': {'text': f'{TEXT} {number}\n'},
+                    'line_number': number,
+                    'absolute_offset': number * 140,
+                    'submatches': [],
+                }
+                if kind == 'match':
+                    data['submatches'] = [
+                        {'match': {'text': 'الشيخ'}, 'start': start, 'end': start + 10}
+                    ]
+                events.append({'type': kind, 'data': data})
+        events.append(
+            {'type': 'end', 'data': {'path': path, 'binary_offset': None, 'stats': _stats()}}
+        )
+    events.append(
+        {'type': 'summary', 'data': {'elapsed_total': _stats()['elapsed'], 'stats': _stats()}}
+    )
+    return b''.join(orjson.dumps(event) + b'\n' for event in events)
+
+
+def _reader(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader(limit=1 << 20)
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def line_by_line(data: bytes, processor: ResultStreamProcessor) -> int:
+    """The previous parse: every line decoded in full, one await per line."""
+    records = 0
+    async for line in _reader(data):
+        result = orjson.loads(line)
+        kind = result.get('type')
+        if kind == 'begin':
+            processor._file(result['data']['path']['text'])
+        elif kind == 'match':
+            records += processor._handle_match(result['data']) is not None
+        elif kind == 'context':
+            records += processor._handle_context(result['data']) is not None
+        elif kind == 'end' and processor.previous_match:
+            processor.previous_match = None
+            records += 1
+    return records
+
+
+async def chunked(data: bytes, processor: ResultStreamProcessor) -> int:
+    return sum([1 async for _ in processor.parse_output(_reader(data))])
+
+
+def measure(
+    name: str,
+    parse: Callable[[bytes, ResultStreamProcessor], Coroutine[Any, Any, int]],
+    data: bytes,
+    rounds: int,
+) -> None:
+    timings = []
+    for _ in range(rounds):
+        processor = ResultStreamProcessor(['rg'], Path('/nonexistent'))
+        started = time.perf_counter()
+        records = asyncio.run(parse(data, processor))
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f'{name:<13} {best * 1e3:8.1f} ms  {len(data) / best / 1e6:7.1f} MB/s  {records} matches')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20_000)
+    parser.add_argument('--matches', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_output(args.files, args.matches)
+    events = data.count(b'\n')
+    print(f'rg output: {len(data) / 1e6:.1f} MB, {events} events')
+    measure('line-by-line', line_by_line, data, args.rounds)
+    measure('chunked', chunked, data, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
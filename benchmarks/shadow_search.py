@@ -0,0 +1,109 @@
+"""Ignore-mode latency: the PCRE pattern over the corpus vs plain rg over its shadow.
+
+Builds a synthetic, fully vocalized Arabic corpus over a large vocabulary and its
+shadow corpus, then reports p50/p95 latency of `ignore` searches both ways (and the
+time rg itself spent searching), plus the cost of building the shadow:
+
+    python -m benchmarks.shadow_search [--files N] [--queries N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from core import MatchRecord, SearchComplete, stream_search
+from core.patterns import build_pattern, build_shadow
+from core.shadow import ShadowCorpus
+
+LETTERS = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+MARKS = ['\u064e', '\u064f', '\u0650', '\u0652', '\u064e\u0651', '']
+# the PCRE pattern lets marks through after every letter, so queries are typed bare
+# single words and as many two-word phrases
+QUERIES = 5
+
+
+def vocabulary(rng: random.Random, size: int) -> list[str]:
+    """Fully vocalized words of three to six letters."""
+    return [
+        ''.join(rng.choice(LETTERS) + rng.choice(MARKS) for _ in range(rng.randint(3, 6)))
+        for _ in range(size)
+    ]
+
+
+def build_corpus(root: Path, files: int, words: list[str]) -> int:
+    rng = random.Random(0)
+    total = 0
+    for i in range(files):
+        path = root / f'shelf{i % 8}' / f'book{i}.txt'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('\n'.join(' '.join(rng.choices(words, k=12)) for _ in range(400)))
+        total += path.stat().st_size
+    return total
+
+
+def bare(word: str) -> str:
+    return ''.join(ch for ch in word if ch in LETTERS)
+
+
+async def query(data_dir: Path, text: str, shadow: ShadowCorpus | None) -> tuple[float, float, int]:
+    """Wall time, rg's own search time and matches of one `ignore` search."""
+    if shadow is None:
+        pattern, use_pcre = build_pattern('ignore', text)
+    else:
+        pattern, use_pcre = build_shadow(text), False
+    started = time.perf_counter()
+    processor = stream_search(pattern, '.', [], data_dir, use_pcre=use_pcre, shadow=shadow)
+    matches = 0
+    engine = 0.0
+    async for event in processor.process():
+        matches += isinstance(event, MatchRecord)
+        if isinstance(event, SearchComplete) and event.stats:
+            engine = event.stats.engine_seconds or 0.0
+    return time.perf_counter() - started, engine, matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=600)
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = vocabulary(rng, 20_000)
+    queries = [bare(word) for word in rng.sample(words, QUERIES)]
+    queries += [f'{bare(a)} {bare(b)}' for a, b in zip(*(rng.sample(words, QUERIES),) * 2)]
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'data'
+        size = build_corpus(data_dir, args.files, words)
+        shadow = ShadowCorpus(Path(tmp) / 'shadow', data_dir)
+        report = shadow.build()
+        folded = sum(p.stat().st_size for p in shadow.text_dir.rglob('*') if p.is_file())
+        print(
+            f'corpus: {size / 1e6:.1f} MB in {args.files} files, '
+            f'shadow {folded / 1e6:.1f} MB built in {report.elapsed:.2f} s'
+        )
+        for name, corpus in (('pcre', None), ('shadow', shadow)):
+            # warm the page cache
+            asyncio.run(query(data_dir, queries[0], corpus))
+            runs = [
+                asyncio.run(query(data_dir, queries[i % len(queries)], corpus))
+                for i in range(args.queries)
+            ]
+            timings = sorted(elapsed for elapsed, _, _ in runs)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            engine = statistics.median(seconds for _, seconds, _ in runs)
+            print(
+                f'{name:<7} p50 {statistics.median(timings) * 1e3:7.1f} ms  '
+                f'p95 {p95 * 1e3:7.1f} ms  rg p50 {engine * 1e3:6.1f} ms  '
+                f'{sum(n for _, _, n in runs)} matches'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Wall time of one search process vs a sharded search over the same corpus.
+
+Builds a synthetic mixed-format corpus (txt, md, json, html; PDFs too when
+`--pdf DIR` points at sample files) in a temporary directory and runs the same
+query through `stream_search` with and without shards:
+
+    python -m benchmarks.sharded_search [--shelves N] [--files N] [--shards N] [--rga] [--pdf DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from core import SearchComplete, stream_search
+from core.sharding import invalidate_shard_plans
+
+WORDS = 'كتاب باب فصل مسألة قال حدثنا أخبرنا عن في من إلى على هذا ذلك الذي التي'.split()
+
+
+def _paragraph(rng: random.Random, lines: int) -> list[str]:
+    return [' '.join(rng.choices(WORDS, k=12)) for _ in range(lines)]
+
+
+def build_corpus(root: Path, shelves: int, files: int, pdf_dir: Path | None) -> int:
+    rng = random.Random(0)
+    total = 0
+    samples = sorted(pdf_dir.glob('*.pdf')) if pdf_dir else []
+    for shelf in range(shelves):
+        # uneven shelves, like real libraries
+        for book in range(files * (1 + shelf % 3)):
+            folder = root / f'shelf{shelf}' / f'part{book % 4}'
+            folder.mkdir(parents=True, exist_ok=True)
+            lines = _paragraph(rng, 400)
+            lines[rng.randrange(len(lines))] += ' الإبرة'
+            kind = book % 4
+            if kind == 0:
+                target = folder / f'book{book}.txt'
+                target.write_text('\n'.join(lines))
+            elif kind == 1:
+                target = folder / f'book{book}.md'
+                target.write_text('# عنوان\n\n' + '\n\n'.join(lines))
+            elif kind == 2:
+                target = folder / f'book{book}.json'
+                target.write_text(json.dumps({'lines': lines}, ensure_ascii=False, indent=1))
+            else:
+                target = folder / f'book{book}.html'
+                target.write_text('<html><body>' + ''.join(f'<p>{x}</p>\n' for x in lines))
+            total += target.stat().st_size
+            if samples and book % 10 == 0:
+                sample = samples[book % len(samples)]
+                shutil.copy(sample, folder / f'book{book}.pdf')
+                total += sample.stat().st_size
+    return total
+
+
+async def run(data_dir: Path, shards: int, filters: list[str]) -> tuple[float, int, int]:
+    started = time.perf_counter()
+    processor = stream_search('الإبرة', '.', filters, data_dir, shards=shards)
+    matches = 0
+    async for event in processor.process():
+        if not isinstance(event, SearchComplete):
+            matches += 1
+    processes = len(getattr(processor, 'shard_commands', [None]))
+    return time.perf_counter() - started, matches, processes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shelves', type=int, default=12)
+    parser.add_argument('--files', type=int, default=60)
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--pdf', type=Path, help='directory of sample PDFs to mix in')
+    parser.add_argument('--rga', action='store_true', help='search through rga adapters')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        size = build_corpus(data_dir, args.shelves, args.files, args.pdf)
+        filters = ['all'] if args.rga or args.pdf else []
+        print(f'corpus: {size / 1e6:.1f} MB in {sum(1 for _ in data_dir.rglob("*.*"))} files')
+        for shards in (1, args.shards):
+            invalidate_shard_plans()
+            timings = []
+            for _ in range(args.rounds):
+                elapsed, matches, processes = asyncio.run(run(data_dir, shards, filters))
+                timings.append(elapsed)
+            best = min(timings)
+            print(
+                f'{processes} process(es): best {best * 1e3:7.1f} ms  '
+                f'median {sorted(timings)[len(timings) // 2] * 1e3:7.1f} ms  '
+                f'{size / best / 1e6:6.0f} MB/s  {matches} matches'
+            )
+
+
+if __name__ == '__main__':
+    main()
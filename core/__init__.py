@@ -2,47 +2,142 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import mmap
 import os
-import subprocess
+import re
 import sys
 import time
-from collections.abc import AsyncGenerator, Iterable
-from contextlib import suppress
-from pathlib import Path
+from base64 import b64encode
+from collections.abc import AsyncGenerator, Hashable, Iterable, Iterator
+from contextlib import aclosing, suppress
+from fnmatch import fnmatchcase
+from html import escape
+from pathlib import Path, PurePosixPath
 from shutil import which
-from typing import Any
-
-import orjson
-
+from typing import TYPE_CHECKING, Any
+
+from core.admission import SearchScheduler, Ticket
+from core.dirtree import (
+    DIR_CACHE_TTL,
+    MAX_DEPTH,
+    DirectoryTree,
+    directory_index,
+    invalidate_children,
+    list_children,
+    scan_directories,
+)
+from core.extract import (
+    EXTRACTABLE_SUFFIXES,
+    TEXT_SUFFIX,
+    ConversionTimeout,
+    TextCache,
+    extract_text,
+)
+from core.metrics import Counter, Histogram
+from core.native import NATIVE_MAX_BYTES, SCAN_BATCH_BYTES, compile_pattern, scan_file
+from core.preview import pages_window_async, preview_window
+from core.rgjson import match_lines, parse_event, read_lines, text_of
 from core.schemas import (
     DirectoriesRequest,
     DirectoriesResponse,
+    DirectoryChild,
+    DirectoryChildrenRequest,
+    DirectoryChildrenResponse,
     FileRequest,
     FileResponse,
+    MatchRecord,
     SearchComplete,
     SearchError,
     SearchEvent,
     SearchMatch,
+    SearchQueued,
     SearchRequest,
+    SearchStats,
+    StreamEvent,
 )
+from core.sharding import merge_shards, plan_shards, tree_files
+
+if TYPE_CHECKING:
+    from core.ngram import NgramIndex
+    from core.results import ResultCache, SearchFlights
+    from core.shadow import OffsetMap, ShadowCorpus
 
 RGA_FILE_FILTERS: tuple[str, ...] = (
     '*.doc', '*.docx', '*.pdf', '*.json', '*.md',
     '*.epub', '*.odt', '*.fb2', '*.ipynb', '*.html', '*.htm'
 )
-DIR_CACHE_TTL = 60
-MAX_DEPTH = 3
+# beyond this many candidate files a full directory scan is cheaper than a long argv
+MAX_INDEX_CANDIDATES = 2000
+
+# rg reports every match with its path; stat'ing each file once per search is enough
+MTIME_CACHE_TTL = 10
+MTIME_CACHE_SIZE = 50_000
+
+_RG_OPTIONS = (
+    '--json',
+    '-n',
+    '--max-count',
+    '100',
+    '-m',
+    '500',
+    '--no-ignore-vcs',
+    '-C',
+    '1',
+    '--follow',
+)
+
+_HIGHLIGHT_OPEN = '<span class="bg-yellow-200">'
+
+SEARCH_SECONDS = Histogram(
+    'baheth_search_duration_seconds', 'Wall time of searches by mode and engine.'
+)
+SEARCH_FIRST_MATCH = Histogram(
+    'baheth_search_first_match_seconds', 'Time to the first match of searches that found one.'
+)
+SEARCH_SPAWN = Histogram(
+    'baheth_search_spawn_seconds',
+    'Time to start a search process.',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+SEARCH_MATCHES = Counter('baheth_search_matches_total', 'Matches emitted by searches.')
+SEARCH_BYTES = Counter(
+    'baheth_search_bytes_searched_total', 'Bytes searched as reported by engines.'
+)
+
+_dir_cache: dict[tuple[Path, int], tuple[float, list[str], int | None]] = {}
+_mtime_cache: dict[tuple[Path, str], tuple[float, float | None, int | None]] = {}
 
-_dir_cache: dict[tuple[Path, int], tuple[float, list[str]]] = {}
 
+def highlight_matches(text: str, submatches: list[dict[str, Any]]) -> str:
+    """Wrap rg submatches of a line in highlight spans, HTML-escaping everything else.
 
-def highlight_matches(text: str, submatches: list[dict[str, dict[str, str]]]) -> str:
+    Submatch `start`/`end` are UTF-8 byte offsets into the line, so the line is
+    sliced as bytes in a single pass; submatches without offsets are located by text.
+    """
+    data = text.encode('utf-8')
+    spans: list[tuple[int, int]] = []
     for item in submatches:
-        text = text.replace(
-            item['match']['text'],
-            f'<span class="bg-yellow-200">{item["match"]["text"]}</span>',
-        )
-    return text.strip()
+        start, end = item.get('start'), item.get('end')
+        if not isinstance(start, int) or not isinstance(end, int):
+            needle = (item.get('match') or {}).get('text', '').encode('utf-8')
+            start = data.find(needle) if needle else -1
+            end = start + len(needle)
+        if 0 <= start < end <= len(data):
+            spans.append((start, end))
+
+    parts: list[str] = []
+    cursor = 0
+    for start, end in sorted(spans):
+        start = max(start, cursor)
+        if start >= end:
+            continue
+        parts.append(escape(data[cursor:start].decode('utf-8', errors='replace'), quote=False))
+        parts.append(_HIGHLIGHT_OPEN)
+        parts.append(escape(data[start:end].decode('utf-8', errors='replace'), quote=False))
+        parts.append('</span>')
+        cursor = end
+    parts.append(escape(data[cursor:].decode('utf-8', errors='replace'), quote=False))
+    return ''.join(parts).strip()
 
 
 def resolve_data_path(data_dir: Path, relative: str) -> Path:
@@ -55,6 +150,25 @@ def resolve_data_path(data_dir: Path, relative: str) -> Path:
     return candidate
 
 
+def file_mtime(data_dir: Path, relative: str, generation: int | None = None) -> float | None:
+    """mtime of a data file, shared across searches for `MTIME_CACHE_TTL` seconds.
+
+    With a live watcher's `generation`, entries also expire as soon as it changes.
+    """
+    key = (data_dir, relative)
+    now = time.time()
+    cached = _mtime_cache.get(key)
+    if cached and now - cached[0] < MTIME_CACHE_TTL and cached[2] == generation:
+        return cached[1]
+    mtime = None
+    with suppress(Exception):
+        mtime = resolve_data_path(data_dir, relative).stat().st_mtime
+    if len(_mtime_cache) >= MTIME_CACHE_SIZE:
+        _mtime_cache.clear()
+    _mtime_cache[key] = (now, mtime, generation)
+    return mtime
+
+
 def _normalize_directory(directory: str, data_dir: Path) -> str:
     normalized = (directory or '').strip()
     if not normalized or normalized == '.':
@@ -94,11 +208,15 @@ def build_search_command(
     data_dir: Path,
     rga_config: Path | None = None,
     use_pcre: bool = False,
+    text_cache: TextCache | None = None,
+    paths: list[str] | None = None,
+    roots: list[str] | None = None,
+    threads: int | None = None,
 ) -> list[str]:
-    filters = [f.strip() for f in (file_filters or []) if f and f.strip()]
-    use_all = any(f in {'*', 'all'} for f in filters)
-    needs_rga = use_all or any(f in RGA_FILE_FILTERS for f in filters)
-    tool = 'rga' if needs_rga else 'rg'
+    filters, use_all, needs_rga = _parse_filters(file_filters)
+    # a fully warmed extraction cache lets plain rg search converted text directly
+    use_cache = needs_rga and text_cache is not None and text_cache.is_complete()
+    tool = 'rga' if needs_rga and not use_cache else 'rg'
     binary = _find_tool(tool)
     if not binary and tool == 'rga':
         tool = 'rg'
@@ -110,99 +228,319 @@ def build_search_command(
     if tool == 'rga' and rga_config and rga_config.exists():
         cmd.append(f'--rga-config-file={str(rga_config)}')
 
-    cmd.extend(
-        [
-            '--json',
-            '-n',
-            '--max-count',
-            '100',
-            '-m',
-            '500',
-            '--no-ignore-vcs',
-            '-C',
-            '1',
-            '--follow',
-        ]
-    )
+    cmd.extend(_RG_OPTIONS)
 
     if use_pcre:
         cmd.append('-P')
+    if threads:
+        cmd.extend(['-j', str(threads)])
 
     target_dir = _normalize_directory(directory, data_dir)
 
+    if paths is not None:
+        # explicit files bypass -g globs, callers pre-filter them
+        cmd.append(query)
+        cmd.extend(
+            str(text_cache.text_path(p)) if use_cache and _is_extractable(p) else p for p in paths
+        )
+        return cmd
+
     if filters and not use_all:
         for f in filters:
+            if use_cache and _is_extractable(f):
+                cmd.extend(['-g', f'**/{f}{TEXT_SUFFIX}'])
+                continue
             pattern = f'**/{f}' if target_dir == '.' else f'{target_dir}/**/{f}'
             cmd.extend(['-g', pattern])
     elif target_dir != '.':
         cmd.extend(['-g', f'{target_dir}/**'])
+        if use_cache:
+            cmd.extend(['-g', f'**/*{TEXT_SUFFIX}'])
+
+    if use_cache and use_all:
+        # originals are searched through their cached text instead
+        for suffix in sorted(EXTRACTABLE_SUFFIXES):
+            cmd.extend(['-g', f'!*{suffix}'])
 
     cmd.append(query)
-    cmd.append(target_dir)
+    for root in [target_dir] if roots is None else roots:
+        # loose files in a shard were pre-filtered, see `core.sharding.plan_shards`
+        if use_cache and _is_extractable(root) and (data_dir / root).is_file():
+            cached = text_cache.text_path(root)
+            if cached.exists():
+                cmd.append(str(cached))
+            continue
+        cmd.append(root)
+        if use_cache and (text_cache.text_dir / root).is_dir():
+            # spelled like `root` so rg prints cached texts under the same prefix, e.g. `./`
+            cmd.append(f'{text_cache.text_dir}{os.sep}{root}')
     return cmd
 
 
+def build_shadow_command(
+    query: str,
+    directory: str,
+    file_filters: list[str],
+    data_dir: Path,
+    shadow: ShadowCorpus,
+    paths: list[str] | None = None,
+) -> list[str]:
+    """`build_search_command` over a shadow corpus, always plain rg.
+
+    Documents are searched through their folded extracted text only where rga
+    would search them. Empty when nothing selected has a shadow.
+    """
+    binary = _find_tool('rg')
+    if not binary:
+        raise FileNotFoundError('rg not found on PATH')
+    filters, use_all, needs_rga = _parse_filters(file_filters)
+    cmd = [binary, *_RG_OPTIONS]
+
+    if paths is not None:
+        shadows = [
+            str(shadow.shadow_path(p))
+            for p in paths
+            if (needs_rga or not _is_extractable(p)) and shadow.shadow_path(p).exists()
+        ]
+        return [*cmd, query, *shadows] if shadows else []
+
+    if filters and not use_all:
+        for f in filters:
+            cmd.extend(['-g', shadow.glob(f)])
+    elif not needs_rga:
+        for suffix in sorted(EXTRACTABLE_SUFFIXES):
+            cmd.extend(['-g', f'!{shadow.glob(f"*{suffix}")}'])
+
+    target_dir = _normalize_directory(directory, data_dir)
+    if (data_dir / target_dir).is_file():
+        root = shadow.shadow_path(Path(target_dir).as_posix())
+    else:
+        root = shadow.text_dir / target_dir
+    if not root.exists():
+        return []
+    if target_dir == '.':
+        # spelled like the root so rg prints shadows under the same `./` prefix
+        return [*cmd, query, f'{shadow.text_dir}{os.sep}.']
+    return [*cmd, query, str(root)]
+
+
+def _parse_filters(file_filters: list[str]) -> tuple[list[str], bool, bool]:
+    filters = [f.strip() for f in (file_filters or []) if f and f.strip()]
+    use_all = any(f in {'*', 'all'} for f in filters)
+    needs_rga = use_all or any(f in RGA_FILE_FILTERS for f in filters)
+    return filters, use_all, needs_rga
+
+
+def _is_extractable(name: str) -> bool:
+    return Path(name).suffix.lower() in EXTRACTABLE_SUFFIXES
+
+
 class ResultStreamProcessor:
-    def __init__(self, command: Iterable[str], data_dir: Path):
+    def __init__(
+        self,
+        command: Iterable[str],
+        data_dir: Path,
+        text_cache: TextCache | None = None,
+        result_cache: ResultCache | None = None,
+        generation: int | None = None,
+        flights: SearchFlights | None = None,
+        scheduler: SearchScheduler | None = None,
+        highlight: bool = True,
+        mode: str | None = None,
+    ):
         self.command = list(command)
         self.data_dir = data_dir
-        self.previous_match: SearchMatch | None = None
+        self.text_cache = text_cache
+        self.result_cache = result_cache
+        self.generation = generation
+        self.flights = flights
+        self.scheduler = scheduler
+        # without it clients highlight from the submatch offsets themselves
+        self.highlight = highlight
+        # searches are recorded in the metrics under their mode, parts of a larger one are not
+        self.mode = mode
+        self.stats = SearchStats()
+        self._started = 0.0
+        self._ticket = Ticket()
+        self._flight_key: Hashable | None = None
+        self.previous_match: MatchRecord | None = None
         self.context_before = ''
+        # reported path -> (path shown to clients, mtime), filled from rg's `begin` events
+        self._files: dict[str, tuple[str, float | None]] = {}
         self.proc: asyncio.subprocess.Process | None = None
         self.cancelled = False
 
-    async def process(self) -> AsyncGenerator[SearchEvent, None]:
-        try:
-            self.cancelled = False
-            self.proc = await asyncio.create_subprocess_exec(
-                *self.command,
-                cwd=self.data_dir,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+    async def process(self) -> AsyncGenerator[StreamEvent]:
+        self.cancelled = False
+        if not self.command or (self.result_cache is None and self.flights is None):
+            async for event in self._stream():
+                yield event
+            return
 
-            assert self.proc.stdout is not None
-            async for line in self.proc.stdout:
-                try:
-                    # Prefer parsing bytes directly; if decoding fails, fall back with replacement
-                    try:
-                        result = orjson.loads(line)
-                    except orjson.JSONDecodeError:
-                        # tolerate occasional invalid utf-8 in tool output (e.g., truncated multibyte)
-                        result = orjson.loads(line.decode('utf-8', errors='replace'))
-                except orjson.JSONDecodeError as exc:
-                    logging.error('JSON decode error: %s', exc)
-                    continue
+        # commands are relative to the data directory they run in
+        key = (str(self.data_dir), self.highlight, *self.command)
+        if self.result_cache is not None:
+            cached = self.result_cache.get(key, self.generation)
+            if cached is not None:
+                for event in cached:
+                    if isinstance(event, SearchComplete) and event.stats is not None:
+                        stats = event.stats.model_copy(update={'cached': True})
+                        event = event.model_copy(update={'stats': stats})
+                    yield event
+                return
+
+        if self.flights is not None:
+            self._flight_key = (key, self.generation)
+            stream = self.flights.subscribe(self._flight_key, self._runner, lambda: self.cancelled)
+        else:
+            stream = self._stream()
+        recorded: list[StreamEvent] = []
+        async with aclosing(stream):
+            async for event in stream:
+                if not isinstance(event, SearchQueued):
+                    recorded.append(event)
+                yield event
+        # a consumer that stops early never gets here, so partial runs aren't stored
+        if (
+            self.result_cache is not None
+            and not self.cancelled
+            and recorded
+            and isinstance(recorded[-1], SearchComplete)
+        ):
+            self.result_cache.put(key, recorded, self.generation)
+
+    def _runner(self) -> ResultStreamProcessor:
+        return ResultStreamProcessor(
+            self.command,
+            self.data_dir,
+            text_cache=self.text_cache,
+            generation=self.generation,
+            scheduler=self.scheduler,
+            highlight=self.highlight,
+            mode=self.mode,
+        )
 
-                match_type = result.get('type')
-                if match_type == 'match':
-                    payload = self._handle_match(result)
+    async def _stream(self) -> AsyncGenerator[StreamEvent]:
+        try:
+            if not self.command:
+                # the index ruled out every file, there is nothing to scan
+                yield SearchComplete()
+                return
+            self.stats = SearchStats(engine=self.engine, mode=self.mode)
+            queued = time.perf_counter()
+            if self.scheduler is not None:
+                self._ticket = Ticket()
+                async with aclosing(self.scheduler.acquire(self._ticket)) as queue:
+                    async for position in queue:
+                        yield SearchQueued(position=position)
+                if not self._ticket.acquired or self.cancelled:
+                    return
+            self._started = time.perf_counter()
+            self.stats.queued_seconds = self._started - queued
+            async with aclosing(self._search()) as events:
+                async for event in events:
+                    if not self.stats.matches:
+                        self.stats.first_match_seconds = time.perf_counter() - self._started
+                    self.stats.matches += 1
+                    yield event
+            if not self.cancelled:
+                self.stats.elapsed_seconds = time.perf_counter() - self._started
+                self._observe()
+                yield SearchComplete(stats=self.stats)
+        except Exception as exc:  # noqa: BLE001
+            logging.error('Stream processing error: %s', exc)
+            yield SearchError(error=str(exc))
+        finally:
+            if self.proc:
+                assert self.proc.stdout is not None
+                if self.proc.returncode is None and not self.proc.stdout.at_eof():
+                    # closed or cancelled before rg finished, nobody reads the rest
+                    with suppress(ProcessLookupError):
+                        self.proc.terminate()
+                await self.proc.wait()
+            if self.scheduler is not None:
+                self.scheduler.release(self._ticket)
+
+    async def _search(self) -> AsyncGenerator[MatchRecord]:
+        """Run the search once a slot is held; backends other than rg override this."""
+        self.proc = await asyncio.create_subprocess_exec(
+            *self.command,
+            cwd=self.data_dir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self.stats.spawn_seconds = time.perf_counter() - self._started
+
+        assert self.proc.stdout is not None
+        async with aclosing(self.parse_output(self.proc.stdout)) as events:
+            async for event in events:
+                yield event
+
+    async def parse_output(self, stdout: asyncio.StreamReader) -> AsyncGenerator[MatchRecord]:
+        """Turn rg's JSON stream into match records, pairing context lines with matches."""
+        async for lines in read_lines(stdout):
+            self.stats.bytes_streamed += sum(map(len, lines)) + len(lines)
+            for line in lines:
+                event = parse_event(line) if line else None
+                if event is None:
+                    continue
+                match_type, data = event
+                if match_type == 'begin':
+                    self._file(text_of(data.get('path')))
+                elif match_type == 'match':
+                    payload = self._handle_match(data)
                     if payload:
                         yield payload
                 elif match_type == 'context':
-                    payload = self._handle_context(result)
+                    payload = self._handle_context(data)
                     if payload:
                         yield payload
+                elif match_type == 'end':
+                    # context lines never cross files, the next one belongs to a new match
+                    self.context_before = ''
+                    if self.previous_match:
+                        yield self.previous_match
+                        self.previous_match = None
+                elif match_type == 'summary':
+                    self._summary(data)
 
-            if self.previous_match:
-                if not self.cancelled:
-                    yield self.previous_match
-
+        if self.previous_match:
             if not self.cancelled:
-                yield SearchComplete()
-        except Exception as exc:  # noqa: BLE001
-            logging.error('Stream processing error: %s', exc)
-            yield SearchError(error=str(exc))
-        finally:
-            if self.proc:
-                try:
-                    await asyncio.wait_for(self.proc.wait(), timeout=5)
-                except asyncio.TimeoutError:
-                    self.proc.terminate()
-                    await self.proc.wait()
+                yield self.previous_match
+
+    @property
+    def engine(self) -> str:
+        return Path(self.command[0]).name if self.command else ''
+
+    def _summary(self, data: dict[str, Any]) -> None:
+        stats = data.get('stats') or {}
+        elapsed = data.get('elapsed_total') or stats.get('elapsed') or {}
+        self.stats.files_searched = stats.get('searches')
+        self.stats.bytes_searched = stats.get('bytes_searched')
+        if 'secs' in elapsed:
+            self.stats.engine_seconds = elapsed['secs'] + elapsed.get('nanos', 0) / 1e9
+
+    def _observe(self) -> None:
+        if self.mode is None:
+            return
+        stats = self.stats
+        labels = {'mode': self.mode, 'engine': stats.engine}
+        SEARCH_SECONDS.observe(stats.elapsed_seconds, **labels)
+        if stats.first_match_seconds is not None:
+            SEARCH_FIRST_MATCH.observe(stats.first_match_seconds, **labels)
+        if stats.spawn_seconds is not None:
+            SEARCH_SPAWN.observe(stats.spawn_seconds, **labels)
+        SEARCH_MATCHES.inc(stats.matches, **labels)
+        if stats.bytes_searched:
+            SEARCH_BYTES.inc(stats.bytes_searched, **labels)
 
     async def cancel(self) -> None:
         self.cancelled = True
+        if self.scheduler is not None:
+            self.scheduler.withdraw(self._ticket)
+        if self.flights is not None and self._flight_key is not None:
+            # the shared process keeps running until its last subscriber is gone
+            self.flights.wake(self._flight_key)
         if not self.proc:
             return
         if self.proc.returncode is None:
@@ -213,24 +551,19 @@ class ResultStreamProcessor:
                 self.proc.kill()
                 await self.proc.wait()
 
-    def _handle_match(self, result: dict[str, Any]) -> SearchMatch | None:
-        data = result.get('data', {})
-        match_payload = SearchMatch(
-            path=data.get('path', {}).get('text', ''),
+    def _handle_match(self, data: dict[str, Any]) -> MatchRecord | None:
+        path, mtime = self._file(text_of(data.get('path')))
+        lines, submatches = match_lines(data)
+        match_payload = MatchRecord(
+            path=path,
             line_number=data.get('line_number') or 0,
-            lines=data.get('lines', {}).get('text', ''),
-            submatches=data.get('submatches', []),
-            highlighted_text=highlight_matches(
-                data.get('lines', {}).get('text', ''),
-                data.get('submatches', []),
-            ),
+            lines=lines,
+            submatches=submatches,
+            highlighted_text=highlight_matches(lines, submatches) if self.highlight else '',
+            # for simple date-based sorting on the frontend
+            mtime=mtime,
         )
 
-        # mtime for simple date-based sorting on the frontend
-        with suppress(Exception):
-            fs_path = resolve_data_path(self.data_dir, match_payload.path)
-            match_payload.mtime = fs_path.stat().st_mtime
-
         if self.context_before:
             match_payload.context_before = self.context_before
             self.context_before = ''
@@ -243,9 +576,17 @@ class ResultStreamProcessor:
         self.previous_match = match_payload
         return None
 
-    def _handle_context(self, result: dict[str, Any]) -> SearchMatch | None:
-        data = result.get('data', {})
-        text = data.get('lines', {}).get('text', '').strip()
+    def _file(self, reported: str) -> tuple[str, float | None]:
+        entry = self._files.get(reported)
+        if entry is None:
+            path = reported
+            if self.text_cache:
+                path = self.text_cache.original_path(reported) or reported
+            entry = self._files[reported] = (path, file_mtime(self.data_dir, path, self.generation))
+        return entry
+
+    def _handle_context(self, data: dict[str, Any]) -> MatchRecord | None:
+        text = text_of(data.get('lines')).strip()
 
         if self.previous_match:
             self.previous_match.context_after = text
@@ -257,6 +598,272 @@ class ResultStreamProcessor:
         return None
 
 
+class ShardedStreamProcessor(ResultStreamProcessor):
+    """Runs one search process per shard of the target directory and merges their events.
+
+    `command` is the equivalent unsharded search; result caching and flights are
+    keyed on it, so sharded and single runs share cached results.
+    """
+
+    def __init__(
+        self,
+        command: Iterable[str],
+        shard_commands: list[list[str]],
+        data_dir: Path,
+        **kwargs: Any,
+    ):
+        super().__init__(command, data_dir, **kwargs)
+        self.shard_commands = shard_commands
+        self._shards: list[ResultStreamProcessor] = []
+
+    def _runner(self) -> ResultStreamProcessor:
+        return ShardedStreamProcessor(
+            self.command,
+            self.shard_commands,
+            self.data_dir,
+            text_cache=self.text_cache,
+            generation=self.generation,
+            scheduler=self.scheduler,
+            highlight=self.highlight,
+            mode=self.mode,
+        )
+
+    async def _stream(self) -> AsyncGenerator[StreamEvent]:
+        # each shard holds its own scheduler slot, like any other search process
+        self._shards = [
+            ResultStreamProcessor(
+                command,
+                self.data_dir,
+                text_cache=self.text_cache,
+                generation=self.generation,
+                scheduler=self.scheduler,
+                highlight=self.highlight,
+            )
+            for command in self.shard_commands
+        ]
+        self.stats = SearchStats(engine=self.engine, mode=self.mode)
+        self._started = time.perf_counter()
+        events = merge_shards([shard.process() for shard in self._shards])
+        try:
+            async for event in events:
+                if isinstance(event, MatchRecord):
+                    if not self.stats.matches:
+                        self.stats.first_match_seconds = time.perf_counter() - self._started
+                    self.stats.matches += 1
+                elif isinstance(event, SearchComplete):
+                    self._merge_stats()
+                    self._observe()
+                    event = SearchComplete(stats=self.stats)
+                yield event
+        finally:
+            # stop the other shards right away when one fails or the client leaves
+            await asyncio.gather(*(shard.cancel() for shard in self._shards))
+            await events.aclose()
+
+    def _merge_stats(self) -> None:
+        parts = [shard.stats for shard in self._shards]
+        stats = self.stats
+        stats.elapsed_seconds = time.perf_counter() - self._started
+        # shards run side by side, the slowest one sets the pace
+        stats.queued_seconds = max(part.queued_seconds for part in parts)
+        stats.spawn_seconds = max(
+            (p.spawn_seconds for p in parts if p.spawn_seconds is not None), default=None
+        )
+        stats.engine_seconds = max(
+            (p.engine_seconds for p in parts if p.engine_seconds is not None), default=None
+        )
+        stats.bytes_streamed = sum(part.bytes_streamed for part in parts)
+        if all(part.files_searched is not None for part in parts):
+            stats.files_searched = sum(part.files_searched or 0 for part in parts)
+        if all(part.bytes_searched is not None for part in parts):
+            stats.bytes_searched = sum(part.bytes_searched or 0 for part in parts)
+
+    async def cancel(self) -> None:
+        await super().cancel()
+        await asyncio.gather(*(shard.cancel() for shard in self._shards))
+
+
+class NativeStreamProcessor(ResultStreamProcessor):
+    """Searches in-process with a compiled regex over memory-mapped files.
+
+    Skips spawning rg and decoding its JSON, which dominates small searches served
+    from the page cache. `files` pairs each path as rg would report it with the file
+    to read and its size; `command` is the equivalent rg search, so results are
+    cached and shared under the same key.
+    """
+
+    def __init__(
+        self,
+        command: Iterable[str],
+        files: list[tuple[str, Path, int]],
+        regex: re.Pattern[str],
+        data_dir: Path,
+        **kwargs: Any,
+    ):
+        super().__init__(command, data_dir, **kwargs)
+        self.files = files
+        self.regex = regex
+
+    def _runner(self) -> ResultStreamProcessor:
+        return NativeStreamProcessor(
+            self.command,
+            self.files,
+            self.regex,
+            self.data_dir,
+            text_cache=self.text_cache,
+            generation=self.generation,
+            scheduler=self.scheduler,
+            highlight=self.highlight,
+            mode=self.mode,
+        )
+
+    @property
+    def engine(self) -> str:
+        return 'native'
+
+    async def _search(self) -> AsyncGenerator[MatchRecord]:
+        self.stats.files_searched = len(self.files)
+        self.stats.bytes_searched = sum(size for _, _, size in self.files)
+        batch: list[tuple[str, Path]] = []
+        size = 0
+        for index, (reported, source, file_size) in enumerate(self.files):
+            batch.append((reported, source))
+            size += file_size
+            if size < SCAN_BATCH_BYTES and index + 1 < len(self.files):
+                continue
+            # scanning holds the GIL, but a thread keeps the loop serving between files
+            found = await asyncio.to_thread(self._scan, batch)
+            batch, size = [], 0
+            for reported_path, records in found:
+                if self.cancelled:
+                    return
+                path, mtime = self._file(reported_path)
+                for record in records:
+                    record.path = path
+                    record.mtime = mtime
+                    if self.highlight:
+                        record.highlighted_text = highlight_matches(record.lines, record.submatches)
+                    yield record
+            if self.cancelled:
+                return
+
+    def _scan(self, batch: list[tuple[str, Path]]) -> list[tuple[str, list[MatchRecord]]]:
+        found = []
+        for reported, source in batch:
+            if self.cancelled:
+                break
+            records = scan_file(source, self.regex)
+            if records:
+                found.append((reported, records))
+        return found
+
+
+class ShadowStreamProcessor(ResultStreamProcessor):
+    """Runs rg over a shadow corpus and shows its hits in the original text.
+
+    rg reports the byte offset of every line it prints; the shadow's offset map
+    turns it into the original line's, which is read back along with the
+    submatches moved over the stripped marks. Lines whose original text is gone
+    are shown as found in the shadow.
+    """
+
+    def __init__(self, command: Iterable[str], data_dir: Path, shadow: ShadowCorpus, **kwargs: Any):
+        super().__init__(command, data_dir, **kwargs)
+        self.shadow = shadow
+        # reported path -> (original text, offset map), filled on a file's first line
+        self._origins: dict[str, tuple[Path, OffsetMap] | None] = {}
+        # rg prints a file's lines together, its original stays mapped until the next one
+        self._source: tuple[Path, mmap.mmap | None] | None = None
+
+    def _runner(self) -> ResultStreamProcessor:
+        return ShadowStreamProcessor(
+            self.command,
+            self.data_dir,
+            self.shadow,
+            text_cache=self.text_cache,
+            generation=self.generation,
+            scheduler=self.scheduler,
+            highlight=self.highlight,
+            mode=self.mode,
+        )
+
+    def _file(self, reported: str) -> tuple[str, float | None]:
+        entry = self._files.get(reported)
+        if entry is None:
+            path = self.shadow.original_path(reported) or reported
+            entry = self._files[reported] = (path, file_mtime(self.data_dir, path, self.generation))
+        return entry
+
+    async def _search(self) -> AsyncGenerator[MatchRecord]:
+        try:
+            async with aclosing(super()._search()) as events:
+                async for event in events:
+                    yield event
+        finally:
+            self._close_source()
+
+    def _handle_match(self, data: dict[str, Any]) -> MatchRecord | None:
+        return super()._handle_match(self._restore(data))
+
+    def _handle_context(self, data: dict[str, Any]) -> MatchRecord | None:
+        return super()._handle_context(self._restore(data))
+
+    def _restore(self, data: dict[str, Any]) -> dict[str, Any]:
+        """rg's data for a shadow line, rewritten to the original line and offsets."""
+        reported = text_of(data.get('path'))
+        if reported not in self._origins:
+            key = self.shadow.original_path(reported)
+            self._origins[reported] = self.shadow.origin(key) if key else None
+        origin = self._origins[reported]
+        offset = data.get('absolute_offset')
+        if origin is None or not isinstance(offset, int):
+            return data
+
+        source, offsets = origin
+        # marks at the very start of a line still belong to it
+        start = offsets.original(offset, trailing=False)
+        raw = self._line_at(source, start)
+        if raw is None:
+            return data
+        spans = [
+            (
+                offsets.original(offset + item.get('start', 0)) - start,
+                # a match takes the marks after its last letter along, like the PCRE pattern
+                offsets.original(offset + item.get('end', 0)) - start,
+            )
+            for item in data.get('submatches') or []
+        ]
+        try:
+            lines = {'text': raw.decode('utf-8')}
+            submatches = [
+                {'match': {'text': raw[a:b].decode('utf-8')}, 'start': a, 'end': b}
+                for a, b in spans
+            ]
+        except UnicodeDecodeError:
+            # like rg, hand over raw bytes for `match_lines` to decode
+            lines = {'bytes': b64encode(raw).decode()}
+            submatches = [{'match': {}, 'start': a, 'end': b} for a, b in spans]
+        return {**data, 'lines': lines, 'submatches': submatches}
+
+    def _line_at(self, source: Path, start: int) -> bytes | None:
+        if self._source is None or self._source[0] is not source:
+            self._close_source()
+            view = None
+            with suppress(OSError, ValueError), source.open('rb') as fh:
+                view = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self._source = (source, view)
+        view = self._source[1]
+        if view is None or start >= len(view):
+            return None
+        end = view.find(b'\n', start)
+        return view[start : len(view) if end == -1 else end + 1]
+
+    def _close_source(self) -> None:
+        if self._source is not None and self._source[1] is not None:
+            self._source[1].close()
+        self._source = None
+
+
 def stream_search(
     query: str,
     directory: str,
@@ -264,69 +871,287 @@ def stream_search(
     data_dir: Path,
     rga_config: Path | None = None,
     use_pcre: bool = False,
+    text_cache: TextCache | None = None,
+    ngram_index: NgramIndex | None = None,
+    literals: list[str] | None = None,
+    result_cache: ResultCache | None = None,
+    generation: int | None = None,
+    flights: SearchFlights | None = None,
+    scheduler: SearchScheduler | None = None,
+    highlight: bool = True,
+    shards: int = 1,
+    engine: str = 'rg',
+    mode: str | None = None,
+    shadow: ShadowCorpus | None = None,
 ) -> ResultStreamProcessor:
-    command = build_search_command(query, directory, file_filters, data_dir, rga_config, use_pcre=use_pcre)
-    return ResultStreamProcessor(command, data_dir)
+    """Build the search for a query.
+
+    `engine` picks the backend: `rg` always spawns rg/rga, `native` scans in-process
+    whenever the pattern and the files allow it, and `auto` does so only while the
+    files to search stay under `NATIVE_MAX_BYTES`. Searches given a `mode` are
+    recorded in the search metrics under it.
+
+    With a `shadow` corpus, `query` is a pattern for its folded text (see
+    `core.patterns.build_shadow`) and one rg process searches it.
+    """
+    paths = None
+    if ngram_index and literals:
+        paths = _index_candidates(ngram_index, literals, directory, file_filters, data_dir)
+        if paths == []:
+            return ResultStreamProcessor([], data_dir)
+
+    if shadow is not None:
+        return ShadowStreamProcessor(
+            build_shadow_command(query, directory, file_filters, data_dir, shadow, paths),
+            data_dir,
+            shadow,
+            text_cache=text_cache,
+            result_cache=result_cache,
+            generation=generation,
+            flights=flights,
+            scheduler=scheduler,
+            highlight=highlight,
+            mode=mode,
+        )
+
+    command = build_search_command(
+        query,
+        directory,
+        file_filters,
+        data_dir,
+        rga_config,
+        use_pcre=use_pcre,
+        text_cache=text_cache,
+        paths=paths,
+    )
+    if engine in ('native', 'auto'):
+        regex = compile_pattern(query)
+        found = _native_files(directory, file_filters, data_dir, text_cache, paths, generation)
+        if regex is not None and found is not None:
+            files, total = found
+            if engine == 'native' or total <= NATIVE_MAX_BYTES:
+                return NativeStreamProcessor(
+                    command,
+                    files,
+                    regex,
+                    data_dir,
+                    text_cache=text_cache,
+                    result_cache=result_cache,
+                    generation=generation,
+                    flights=flights,
+                    scheduler=scheduler,
+                    highlight=highlight,
+                    mode=mode,
+                )
+
+    plan = None
+    if paths is None:
+        # index candidates are already a short list of files, only full scans are split
+        plan = _shard_plan(directory, file_filters, data_dir, shards, generation)
+    if plan:
+        threads = max(1, (os.cpu_count() or 1) // len(plan))
+        shard_commands = [
+            build_search_command(
+                query,
+                directory,
+                file_filters,
+                data_dir,
+                rga_config,
+                use_pcre=use_pcre,
+                text_cache=text_cache,
+                roots=roots,
+                threads=threads,
+            )
+            for roots in plan
+        ]
+        return ShardedStreamProcessor(
+            command,
+            shard_commands,
+            data_dir,
+            text_cache=text_cache,
+            result_cache=result_cache,
+            generation=generation,
+            flights=flights,
+            scheduler=scheduler,
+            highlight=highlight,
+            mode=mode,
+        )
+    return ResultStreamProcessor(
+        command,
+        data_dir,
+        text_cache=text_cache,
+        result_cache=result_cache,
+        generation=generation,
+        flights=flights,
+        scheduler=scheduler,
+        highlight=highlight,
+        mode=mode,
+    )
+
+
+def _native_files(
+    directory: str,
+    file_filters: list[str],
+    data_dir: Path,
+    text_cache: TextCache | None,
+    paths: list[str] | None,
+    generation: int | None,
+) -> tuple[list[tuple[str, Path, int]], int] | None:
+    """Files the rg command would search, as (reported path, file to read, size), and their total.
+
+    None when documents would have to go through rga adapters.
+    """
+    filters, use_all, needs_rga = _parse_filters(file_filters)
+    use_cache = needs_rga and text_cache is not None and text_cache.is_complete()
+    if needs_rga and not use_cache:
+        return None
+
+    if paths is not None:
+        # index hits carry no sizes; stat them so `auto` can weigh them against the cap
+        candidates = []
+        for path in paths:
+            with suppress(OSError):
+                candidates.append((path, path, (data_dir / path).stat().st_size))
+    else:
+        target_dir = _normalize_directory(directory, data_dir)
+        prefix = './' if target_dir == '.' else ''
+        globs = [] if use_all else filters
+        candidates = [
+            (f'{prefix}{path}', path, size)
+            for path, size in tree_files(data_dir, target_dir, generation)
+            if not globs or any(fnmatchcase(path.rpartition('/')[2], f) for f in globs)
+        ]
+
+    files: list[tuple[str, Path, int]] = []
+    total = 0
+    for reported, path, size in candidates:
+        if use_cache and _is_extractable(path):
+            files.append((reported, text_cache.text_path(path), size))
+        else:
+            files.append((reported, data_dir / path, size))
+        total += size
+    return files, total
+
+
+def _shard_plan(
+    directory: str,
+    file_filters: list[str],
+    data_dir: Path,
+    shards: int,
+    generation: int | None,
+) -> list[list[str]] | None:
+    if shards < 2:
+        return None
+    filters, use_all, _ = _parse_filters(file_filters)
+    globs = [] if use_all else filters
+
+    def include(path: str) -> bool:
+        return not globs or any(fnmatchcase(path.rpartition('/')[2], f) for f in globs)
+
+    target_dir = _normalize_directory(directory, data_dir)
+    return plan_shards(data_dir, target_dir, shards, include, generation)
+
+
+def _index_candidates(
+    ngram_index: NgramIndex,
+    literals: list[str],
+    directory: str,
+    file_filters: list[str],
+    data_dir: Path,
+) -> list[str] | None:
+    if not ngram_index.is_complete():
+        return None
+    filters, use_all, needs_rga = _parse_filters(file_filters)
+    # opaque (unreadable binary) files can only hold matches rga adapters expose
+    found = ngram_index.candidates(literals, include_opaque=needs_rga)
+    if found is None:
+        return None
+
+    target_dir = Path(_normalize_directory(directory, data_dir)).as_posix()
+    prefix = '' if target_dir == '.' else f'{target_dir}/'
+    globs = [] if use_all else filters
+    selected = [
+        path
+        for path in found
+        if path.startswith(prefix)
+        and (not globs or any(fnmatchcase(path.rpartition('/')[2], f) for f in globs))
+    ]
+    return None if len(selected) > MAX_INDEX_CANDIDATES else selected
+
+
+def walk_files(data_dir: Path, include_dirs: bool = False) -> Iterator[Path]:
+    """Yield non-hidden files (and directories) under data_dir, following symlinks safely."""
+    visited: set[tuple[int, int]] = set()
+    for current, dirnames, filenames in os.walk(data_dir, followlinks=True):
+        try:
+            st = os.stat(current)
+        except OSError:
+            dirnames[:] = []
+            continue
+        if (st.st_dev, st.st_ino) in visited:
+            dirnames[:] = []
+            continue
+        visited.add((st.st_dev, st.st_ino))
+
+        # hidden entries are skipped by rg as well
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        if include_dirs:
+            yield Path(current)
+        for name in sorted(filenames):
+            if not name.startswith('.'):
+                yield Path(current, name)
 
 
 def get_directories(
     data_dir: Path,
     max_depth: int = MAX_DEPTH,
     ttl: int = DIR_CACHE_TTL,
+    generation: int | None = None,
 ) -> list[str]:
     key = (data_dir.resolve(), max_depth)
     now = time.time()
     cached = _dir_cache.get(key)
-    if cached and now - cached[0] < ttl:
+    # a live watcher's generation replaces the TTL: listings stay valid until it changes
+    if cached and (cached[2] == generation if generation is not None else now - cached[0] < ttl):
         return cached[1]
 
-    dirs: list[str] = []
-    visited: set[str] = set()
-
-    for current, dirnames, _ in os.walk(data_dir, followlinks=True):
-        # TODO: use pathlib.walk instead
-        resolved = Path(current).resolve()
-        if resolved in visited:
-            dirnames[:] = []
-            continue
-        visited.add(resolved)
-
-        try:
-            rel = Path(current).relative_to(data_dir)
-        except ValueError:
-            dirnames[:] = []
-            continue
+    ordered = scan_directories(data_dir, max_depth)
+    _dir_cache[key] = (now, ordered, generation)
+    return ordered
 
-        rel_str = '.' if str(rel) == '.' else str(rel)
-        depth = 0 if rel_str == '.' else len(rel.parts)
-        dirs.append(rel_str)
 
-        if depth >= max_depth:
-            dirnames[:] = []
+def invalidate_metadata() -> None:
+    _mtime_cache.clear()
 
-    seen: set[str] = set()
-    ordered: list[str] = []
-    for item in dirs:
-        if item not in seen:
-            seen.add(item)
-            ordered.append(item)
 
-    _dir_cache[key] = (now, ordered)
-    return ordered
+def invalidate_directories() -> None:
+    _dir_cache.clear()
+    invalidate_children()
 
 
-def directories_response(data_dir: Path, request: DirectoriesRequest) -> DirectoriesResponse:
+def directories_response(
+    data_dir: Path,
+    request: DirectoriesRequest,
+    generation: int | None = None,
+    tree: DirectoryTree | None = None,
+) -> DirectoriesResponse:
+    """Directories matching the request; with a `tree`, listings never wait on a walk."""
     try:
         limit = max(1, min(request.limit, 1000))
     except Exception:  # noqa: BLE001
         limit = 200
 
-    max_depth = request.max_depth or MAX_DEPTH
+    # deeper listings would walk the tree on the request and keep every refresh that deep
+    max_depth = max(1, min(request.max_depth or MAX_DEPTH, MAX_DEPTH))
 
-    directories = get_directories(data_dir, max_depth=max_depth)
+    if tree is not None:
+        directories = tree.listing(max_depth, generation)
+    else:
+        directories = get_directories(data_dir, max_depth=max_depth, generation=generation)
     if request.query:
-        term = request.query.lower()
-        directories = [item for item in directories if term in item.lower()]
+        return DirectoriesResponse(
+            directories=directory_index(directories).search(request.query, limit)
+        )
 
     if '.' in directories:
         directories = ['.'] + [item for item in directories if item != '.']
@@ -334,41 +1159,33 @@ def directories_response(data_dir: Path, request: DirectoriesRequest) -> Directo
     return DirectoriesResponse(directories=directories[:limit])
 
 
-def read_file_lines(path: Path) -> list[str]:
+def directory_children(
+    data_dir: Path, request: DirectoryChildrenRequest
+) -> DirectoryChildrenResponse:
+    """One page of the immediate subdirectories of a directory, for lazy tree expansion."""
+    parent = PurePosixPath(request.parent or '.')
+    # checked by name rather than resolved, symlinked folders may live outside data_dir
+    if parent.is_absolute() or '..' in parent.parts:
+        raise ValueError('path must stay within data directory')
+    relative = parent.as_posix()
+    if not (data_dir / relative).is_dir():
+        raise FileNotFoundError(relative)
+
+    limit = max(1, min(request.limit, 1000))
+    children, next_cursor = list_children(data_dir, relative, request.cursor, limit)
+    return DirectoryChildrenResponse(
+        parent=relative,
+        children=[
+            DirectoryChild(path=path, name=name, children=count) for path, name, count in children
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+def read_file_lines(path: Path, text_cache: TextCache | None = None) -> list[str]:
     try:
-        ext = path.suffix.lower()
-        if ext == '.pdf' and which('pdftotext'):
-            proc = subprocess.run(
-                ['pdftotext', '-layout', '-q', str(path), '-'],
-                capture_output=True,
-                check=False,
-            )
-            text = proc.stdout.decode('utf-8', errors='replace')
-            return text.splitlines()
-        if ext == '.docx' and which('pandoc'):
-            proc = subprocess.run(
-                ['pandoc', '-f', 'docx', '-t', 'plain', str(path)],
-                capture_output=True,
-                check=False,
-            )
-            text = proc.stdout.decode('utf-8', errors='replace')
-            return text.splitlines()
-        if ext == '.doc' and which('antiword'):
-            proc = subprocess.run(
-                ['antiword', str(path)],
-                capture_output=True,
-                check=False,
-            )
-            text = proc.stdout.decode('utf-8', errors='replace')
-            return text.splitlines()
-        if which('pandoc') and ext in {'.epub', '.odt', '.fb2', '.ipynb', '.html', '.htm'}:
-            fmt = 'html' if ext == '.htm' else ext.lstrip('.')
-            proc = subprocess.run(
-                ['pandoc', '-f', fmt, '-t', 'plain', str(path)],
-                capture_output=True,
-                check=False,
-            )
-            text = proc.stdout.decode('utf-8', errors='replace')
+        text = text_cache.load(path) if text_cache else extract_text(path)
+        if text is not None:
             return text.splitlines()
 
         return path.read_text(encoding='utf-8', errors='replace').splitlines()
@@ -376,40 +1193,127 @@ def read_file_lines(path: Path) -> list[str]:
         return path.read_text(encoding='utf-8', errors='replace').splitlines()
 
 
-def file_response(data_dir: Path, request: FileRequest) -> FileResponse:
+def file_response(
+    data_dir: Path,
+    request: FileRequest,
+    text_cache: TextCache | None = None,
+) -> FileResponse:
     resolved = resolve_data_path(data_dir, request.path)
     if not resolved.exists():
         raise FileNotFoundError(request.path)
 
-    lines = read_file_lines(resolved)
+    relative = str(resolved.relative_to(data_dir))
+    if request.limit is None and request.cursor is None:
+        return FileResponse(
+            file=relative,
+            lines=read_file_lines(resolved, text_cache),
+            line_number=request.line_number,
+        )
+
+    lines, start_line, total = preview_window(
+        resolved,
+        text_cache,
+        line_number=request.line_number,
+        cursor=request.cursor,
+        direction=request.direction,
+        limit=request.limit,
+    )
+    return _window_response(relative, request, lines, start_line, total)
+
 
+def _window_response(
+    relative: str, request: FileRequest, lines: list[str], start_line: int, total: int
+) -> FileResponse:
+    end_line = start_line + len(lines)
     return FileResponse(
-        file=str(resolved.relative_to(data_dir)),
+        file=relative,
         lines=lines,
         line_number=request.line_number,
+        start_line=start_line,
+        total_lines=total,
+        prev_cursor=start_line if start_line > 1 else None,
+        next_cursor=end_line if end_line <= total else None,
     )
 
 
+async def file_response_async(
+    data_dir: Path,
+    request: FileRequest,
+    text_cache: TextCache | None = None,
+) -> FileResponse:
+    """`file_response` for event loops.
+
+    Documents are converted into the text cache with `TextCache.ensure_async`, which
+    caps concurrent conversions and times them out, and everything else runs in a
+    thread. Windows of PDFs whose text is not cached convert only the pages they
+    span, under the same caps. Without a text cache the whole response is built in a
+    thread.
+    """
+    if text_cache is not None:
+        resolved = resolve_data_path(data_dir, request.path)
+        if resolved.exists():
+            if request.limit is not None or request.cursor is not None:
+                window = await pages_window_async(
+                    resolved,
+                    text_cache,
+                    line_number=request.line_number,
+                    cursor=request.cursor,
+                    direction=request.direction,
+                    limit=request.limit,
+                )
+                if window is not None:
+                    relative = str(resolved.relative_to(data_dir))
+                    return _window_response(relative, request, *window)
+            await text_cache.ensure_async(resolved)
+    return await asyncio.to_thread(file_response, data_dir, request, text_cache)
+
+
 __all__ = [
     'DIR_CACHE_TTL',
     'MAX_DEPTH',
+    'MAX_INDEX_CANDIDATES',
+    'MTIME_CACHE_TTL',
     'RGA_FILE_FILTERS',
+    'SEARCH_BYTES',
+    'SEARCH_FIRST_MATCH',
+    'SEARCH_MATCHES',
+    'SEARCH_SECONDS',
+    'SEARCH_SPAWN',
+    'ConversionTimeout',
     'DirectoriesRequest',
     'DirectoriesResponse',
+    'DirectoryChild',
+    'DirectoryChildrenRequest',
+    'DirectoryChildrenResponse',
+    'DirectoryTree',
     'FileRequest',
     'FileResponse',
+    'MatchRecord',
+    'NativeStreamProcessor',
     'ResultStreamProcessor',
     'SearchComplete',
     'SearchError',
     'SearchEvent',
     'SearchMatch',
     'SearchRequest',
+    'SearchStats',
+    'ShadowStreamProcessor',
+    'ShardedStreamProcessor',
+    'StreamEvent',
+    'TextCache',
     'build_search_command',
+    'build_shadow_command',
     'directories_response',
+    'directory_children',
+    'file_mtime',
     'file_response',
+    'file_response_async',
     'get_directories',
     'highlight_matches',
+    'invalidate_directories',
+    'invalidate_metadata',
     'read_file_lines',
     'resolve_data_path',
     'stream_search',
+    'walk_files',
 ]
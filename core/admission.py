@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import AsyncGenerator
+from contextlib import suppress
+from pathlib import Path
+
+from core.metrics import Gauge, Histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process slots, per-process limits still apply
+    fcntl = None
+
+MAX_SEARCHES = 4
+QUEUE_TIMEOUT = 30.0
+# how often a waiter blocked only on other workers retries the slot files
+GLOBAL_POLL_INTERVAL = 0.1
+
+QUEUE_DEPTH = Gauge('baheth_search_queue_depth', 'Searches waiting for a free slot.')
+RUNNING = Gauge('baheth_searches_running', 'Search processes holding a slot.')
+QUEUE_WAIT = Histogram(
+    'baheth_search_queue_wait_seconds', 'Time searches spent waiting for a slot.'
+)
+
+
+class SearchQueueTimeout(TimeoutError):
+    pass
+
+
+class Ticket:
+    def __init__(self) -> None:
+        self.acquired = False
+        self.cancelled = False
+        self.fd: int | None = None
+
+
+class SearchScheduler:
+    """Bound concurrently running search processes per worker and across workers.
+
+    The per-worker limit is a FIFO queue; the global one is a set of `global_limit`
+    lock files under `lock_dir`, each held with `flock` by the search using it, so a
+    crashed worker can never leak a slot.
+    """
+
+    def __init__(
+        self,
+        max_running: int = MAX_SEARCHES,
+        global_limit: int = 0,
+        lock_dir: Path | None = None,
+        timeout: float = QUEUE_TIMEOUT,
+    ):
+        self.max_running = max(1, max_running)
+        self.global_limit = global_limit if lock_dir is not None and fcntl else 0
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self.running = 0
+        self._waiters: list[Ticket] = []
+        self._changed = asyncio.Event()
+
+    async def acquire(self, ticket: Ticket) -> AsyncGenerator[int]:
+        """Wait for a slot, yielding the ticket's queue position whenever it changes.
+
+        Ends without a slot if the ticket is withdrawn and raises `SearchQueueTimeout`
+        once `timeout` runs out.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self._waiters.append(ticket)
+        QUEUE_DEPTH.inc()
+        reported = 0
+        try:
+            while True:
+                if ticket.cancelled:
+                    return
+                position = self._waiters.index(ticket) + 1
+                if position == 1 and self.running < self.max_running:
+                    if self._take_global(ticket):
+                        break
+                    wait = GLOBAL_POLL_INTERVAL
+                else:
+                    wait = None
+                if position != reported:
+                    reported = position
+                    yield position
+
+                remaining = started + self.timeout - loop.time()
+                if remaining <= 0:
+                    raise SearchQueueTimeout('Too many searches are running, please retry shortly')
+                changed = self._changed
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(changed.wait(), min(remaining, wait or remaining))
+        finally:
+            self._waiters.remove(ticket)
+            QUEUE_DEPTH.dec()
+            self._notify()
+
+        ticket.acquired = True
+        self.running += 1
+        RUNNING.inc()
+        QUEUE_WAIT.observe(loop.time() - started)
+
+    def withdraw(self, ticket: Ticket) -> None:
+        """Stop a queued ticket from waiting any further."""
+        ticket.cancelled = True
+        self._notify()
+
+    def release(self, ticket: Ticket) -> None:
+        if not ticket.acquired:
+            return
+        ticket.acquired = False
+        if ticket.fd is not None:
+            os.close(ticket.fd)
+            ticket.fd = None
+        self.running -= 1
+        RUNNING.dec()
+        self._notify()
+
+    def _take_global(self, ticket: Ticket) -> bool:
+        if not self.global_limit or self.lock_dir is None or fcntl is None:
+            return True
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        for slot in range(self.global_limit):
+            fd = os.open(self.lock_dir / f'slot-{slot}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            ticket.fd = fd
+            return True
+        return False
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+__all__ = [
+    'MAX_SEARCHES',
+    'QUEUE_TIMEOUT',
+    'SearchQueueTimeout',
+    'SearchScheduler',
+    'Ticket',
+]
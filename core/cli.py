@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from os import environ
+from pathlib import Path
+
+from core.extract import CACHE_MAX_BYTES, TextCache
+from core.ngram import NgramIndex
+from core.preextract import default_workers, preextract
+from core.shadow import ShadowCorpus
+from core.watcher import (
+    POLL_INTERVAL,
+    CorpusGeneration,
+    CorpusUpdater,
+    create_watcher,
+    run_watcher,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _text_cache(args: argparse.Namespace) -> TextCache:
+    return TextCache(args.cache_dir / 'extract', args.data_dir.resolve(), max_bytes=args.max_bytes)
+
+
+def _shadow(args: argparse.Namespace, cache: TextCache) -> ShadowCorpus | None:
+    if not args.shadow:
+        return None
+    return ShadowCorpus(args.cache_dir / 'shadow', cache.data_dir, cache)
+
+
+def _extract(args: argparse.Namespace) -> int:
+    cache = _text_cache(args)
+    shadow = _shadow(args, cache)
+    while True:
+        report = preextract(cache, workers=args.workers)
+        logger.info(
+            'done: %d extracted, %d failed, %d up to date, %d removed in %.1fs',
+            report.extracted,
+            report.failed,
+            report.skipped,
+            report.removed,
+            report.elapsed,
+        )
+        if shadow:
+            folded = shadow.build()
+            logger.info(
+                'shadow: %d folded, %d removed of %d files in %.1fs',
+                folded.updated,
+                folded.removed,
+                folded.total,
+                folded.elapsed,
+            )
+        if not args.interval:
+            return 1 if report.failed else 0
+        time.sleep(args.interval)
+
+
+def _index(args: argparse.Namespace) -> int:
+    cache = _text_cache(args)
+    index = NgramIndex(args.cache_dir / 'index', cache.data_dir, cache)
+    while True:
+        report = index.build()
+        logger.info(
+            'done: %d indexed, %d removed of %d files in %.1fs',
+            report.indexed,
+            report.removed,
+            report.total,
+            report.elapsed,
+        )
+        if not args.interval:
+            return 0
+        time.sleep(args.interval)
+
+
+def _watch(args: argparse.Namespace) -> int:
+    cache = _text_cache(args)
+    updater = CorpusUpdater(
+        cache.data_dir,
+        cache,
+        NgramIndex(args.cache_dir / 'index', cache.data_dir, cache),
+        CorpusGeneration(args.cache_dir / 'generation'),
+        _shadow(args, cache),
+    )
+    watcher = create_watcher(cache.data_dir, poll=args.poll, interval=args.poll_interval)
+    logger.info('watching %s with %s', cache.data_dir, type(watcher).__name__)
+    # catch up on whatever changed while no watcher was running
+    updater.apply([cache.data_dir])
+    try:
+        run_watcher(watcher, updater)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='mini-baheth')
+    parser.add_argument('--data-dir', type=Path, default=Path('data'))
+    parser.add_argument(
+        '--cache-dir',
+        type=Path,
+        default=Path(environ.get('BAHETH_CACHE_DIR') or '.cache'),
+    )
+    parser.add_argument(
+        '--max-bytes',
+        type=int,
+        default=int(environ.get('BAHETH_CACHE_MAX_BYTES') or CACHE_MAX_BYTES),
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    extract = commands.add_parser('extract', help='pre-extract document text into the cache')
+    extract.add_argument(
+        '-j',
+        '--workers',
+        type=int,
+        default=default_workers(),
+        help='extraction processes (default: a quarter of the CPUs)',
+    )
+    extract.add_argument(
+        '--interval',
+        type=float,
+        default=0,
+        help='keep running and rescan every N seconds',
+    )
+    extract.add_argument(
+        '--shadow',
+        action='store_true',
+        help='also keep a copy without diacritics for faster Ignore-mode searches',
+    )
+    extract.set_defaults(handler=_extract)
+
+    index = commands.add_parser('index', help='build the n-gram index used to prefilter files')
+    index.add_argument(
+        '--interval',
+        type=float,
+        default=0,
+        help='keep running and refresh every N seconds',
+    )
+    index.set_defaults(handler=_index)
+
+    watch = commands.add_parser(
+        'watch', help='keep the cache, index and directory listings in sync with file changes'
+    )
+    watch.add_argument('--poll', action='store_true', help='poll instead of using inotify')
+    watch.add_argument('--poll-interval', type=float, default=POLL_INTERVAL)
+    watch.add_argument('--shadow', action='store_true', help='also update the shadow corpus')
+    watch.set_defaults(handler=_watch)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+__all__ = ['build_parser', 'main']
@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from core.patterns import normalize
+
+DIR_CACHE_TTL = 60
+MAX_DEPTH = 3
+# top-level subtrees listed side by side; listing directories mostly waits on the disk
+WALK_WORKERS = 8
+# a refresh lock left behind by a dead worker is taken over after this long
+REFRESH_LOCK_TIMEOUT = 300
+# directory indexes kept for the listings searched last
+INDEX_CACHE_SIZE = 8
+# directories whose subdirectory names are kept, checked against their mtime
+CHILDREN_CACHE_SIZE = 10_000
+
+_Key = tuple[int, int]
+_indexes: dict[int, tuple[list[str], DirectoryIndex]] = {}
+_children_cache: OrderedDict[str, tuple[int, list[str]]] = OrderedDict()
+
+logger = logging.getLogger(__name__)
+
+
+def _depth(relative: str) -> int:
+    return 0 if relative == '.' else relative.count('/') + 1
+
+
+def _child_dirs(data_dir: Path, relative: str) -> list[tuple[str, _Key]]:
+    children = []
+    try:
+        with os.scandir(data_dir / relative) as entries:
+            for entry in entries:
+                with suppress(OSError):
+                    # symlinks are followed, loops are caught on (device, inode)
+                    if entry.is_dir():
+                        st = entry.stat()
+                        name = entry.name if relative == '.' else f'{relative}/{entry.name}'
+                        children.append((name, (st.st_dev, st.st_ino)))
+    except OSError:
+        pass
+    return sorted(children)
+
+
+def _walk_subtree(
+    data_dir: Path, top: tuple[str, _Key], max_depth: int, root: _Key
+) -> list[tuple[str, _Key]]:
+    found: list[tuple[str, _Key]] = []
+    visited = {root}
+    pending = [top]
+    while pending:
+        relative, key = pending.pop()
+        if key in visited:
+            continue
+        visited.add(key)
+        found.append((relative, key))
+        if _depth(relative) < max_depth:
+            pending.extend(reversed(_child_dirs(data_dir, relative)))
+    return found
+
+
+def scan_directories(
+    data_dir: Path, max_depth: int = MAX_DEPTH, workers: int = WALK_WORKERS
+) -> list[str]:
+    """Directories under data_dir down to max_depth, `.` first, then depth-first by name.
+
+    Each top-level subtree is listed with `os.scandir` in its own thread. A directory
+    reached twice through symlinks is listed once, under the first path in that order.
+    """
+    st = os.stat(data_dir)
+    root = (st.st_dev, st.st_ino)
+    top = _child_dirs(data_dir, '.') if max_depth > 0 else []
+    with ThreadPoolExecutor(max(1, min(workers, len(top)))) as pool:
+        subtrees = list(pool.map(lambda item: _walk_subtree(data_dir, item, max_depth, root), top))
+
+    seen = {root}
+    ordered = ['.']
+    for subtree in subtrees:
+        for relative, key in subtree:
+            # an alias' children alias the original's, so they drop out as well
+            if key not in seen:
+                seen.add(key)
+                ordered.append(relative)
+    return ordered
+
+
+def child_names(path: Path) -> list[str]:
+    """Sorted names of the subdirectories of path, read again only once its mtime changes."""
+    key = str(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _children_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        _children_cache.move_to_end(key)
+        return cached[1]
+    names = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            with suppress(OSError):
+                if entry.is_dir():
+                    names.append(entry.name)
+    names.sort()
+    _children_cache[key] = (mtime, names)
+    _children_cache.move_to_end(key)
+    while len(_children_cache) > CHILDREN_CACHE_SIZE:
+        _children_cache.popitem(last=False)
+    return names
+
+
+def list_children(
+    data_dir: Path, parent: str, cursor: str | None, limit: int
+) -> tuple[list[tuple[str, str, int]], str | None]:
+    """One page of the subdirectories of parent as (path, name, subdirectory count).
+
+    Pages follow name order and resume after the `cursor` name, so folders added
+    or removed between pages never shift the ones still to come.
+    """
+    directory = data_dir / parent
+    names = child_names(directory)
+    start = bisect_right(names, cursor) if cursor else 0
+    page = names[start : start + limit]
+    children = []
+    for name in page:
+        try:
+            count = len(child_names(directory / name))
+        except OSError:
+            count = 0
+        children.append((name if parent == '.' else f'{parent}/{name}', name, count))
+    next_cursor = page[-1] if start + limit < len(names) else None
+    return children, next_cursor
+
+
+def invalidate_children() -> None:
+    _children_cache.clear()
+
+
+class DirectoryIndex:
+    """Folded lookup over a directory listing, for autocomplete.
+
+    Queries and paths are folded with `core.patterns.normalize` (case, diacritics,
+    letter variants). Directories named exactly like the query rank first, then
+    those whose name starts with it, then every other path containing it; each
+    group is ordered by depth, then path. Rare terms are looked up through the
+    sorted names and a 1- to 3-gram index of them, a matching directory bringing
+    its subtree along; common ones are read off the ranked listing until it fills.
+    """
+
+    def __init__(self, directories: list[str]):
+        self.directories = sorted(directories, key=lambda item: (_depth(item), item))
+        self.folded = [normalize(item).strip() for item in self.directories]
+        self._own = [normalize(item.rsplit('/', 1)[-1]).strip() for item in self.directories]
+        named: dict[str, list[int]] = {}
+        for position, name in enumerate(self._own):
+            if self.directories[position] != '.':
+                named.setdefault(name, []).append(position)
+        self.names = sorted(named)
+        self._numbers = {name: number for number, name in enumerate(self.names)}
+        self._named = [array('I', named[name]) for name in self.names]
+
+        grams: dict[str, list[int]] = {}
+        for number, name in enumerate(self.names):
+            found = {name[i : i + size] for size in (1, 2, 3) for i in range(len(name) - size + 1)}
+            for gram in found:
+                grams.setdefault(gram, []).append(number)
+        self._grams = {gram: array('I', numbers) for gram, numbers in grams.items()}
+
+        # folded paths in order, a subtree is the run of paths that extend its root
+        by_path = sorted(range(len(self.folded)), key=self.folded.__getitem__)
+        self._paths = [self.folded[i] for i in by_path]
+        self._path_positions = array('I', by_path)
+
+    def search(self, query: str, limit: int) -> list[str]:
+        term = normalize(query).strip()
+        if not term:
+            return self.directories[:limit]
+
+        number = self._numbers.get(term)
+        ranked = list(self._named[number][:limit]) if number is not None else []
+        if len(ranked) < limit:
+            lo = bisect_left(self.names, term)
+            hi = bisect_left(self.names, f'{term}\U0010ffff', lo)
+            taken = set(ranked)
+            if self._dense(hi - lo, limit):
+                ranked += self._scan(self._own.__getitem__, term, taken, limit - len(ranked), True)
+            else:
+                found = {p for n in range(lo, hi) for p in self._named[n]} - taken
+                ranked += sorted(found)[: limit - len(ranked)]
+
+        if len(ranked) < limit:
+            # every name starting with the term has been taken whole
+            taken = set(ranked)
+            word = min(term.split(), key=self._estimate)
+            if self._dense(self._estimate(word), limit):
+                ranked += self._scan(self.folded.__getitem__, term, taken, limit - len(ranked))
+            else:
+                # every path under a matching directory contains its name as well
+                below = self._subtrees(self._names_containing(word))
+                found = {p for p in below if p not in taken and term in self.folded[p]}
+                ranked += heapq.nsmallest(limit - len(ranked), found)
+        return [self.directories[p] for p in ranked]
+
+    def _dense(self, names: int, limit: int) -> bool:
+        # reading the ranked listing costs about limit / share of matching names,
+        # gathering the matches costs about their number
+        return names * names > limit * len(self.names)
+
+    def _estimate(self, word: str) -> int:
+        """Upper bound on the names containing word."""
+        if len(word) <= 3:
+            return len(self._grams.get(word, ()))
+        return min(len(self._grams.get(word[i : i + 3], ())) for i in range(len(word) - 2))
+
+    def _names_containing(self, word: str) -> list[int]:
+        if len(word) <= 3:
+            return list(self._grams.get(word, ()))
+        postings = sorted(
+            (self._grams.get(word[i : i + 3], array('I')) for i in range(len(word) - 2)), key=len
+        )
+        return [number for number in postings[0] if word in self.names[number]]
+
+    def _scan(
+        self,
+        text: Callable[[int], str],
+        term: str,
+        taken: set[int],
+        count: int,
+        prefix: bool = False,
+    ) -> list[int]:
+        found: list[int] = []
+        for position in range(len(self.directories)):
+            value = text(position)
+            if (value.startswith(term) if prefix else term in value) and position not in taken:
+                found.append(position)
+                if len(found) == count:
+                    break
+        return found
+
+    def _subtrees(self, numbers: list[int]) -> set[int]:
+        roots = {p for number in numbers for p in self._named[number]}
+        found = set(roots)
+        covered = None
+        for root in sorted({self.folded[p] for p in roots}):
+            if covered is not None and root.startswith(covered):
+                continue
+            covered = f'{root} '
+            start = bisect_left(self._paths, covered)
+            stop = bisect_left(self._paths, f'{root}!', start)
+            found.update(self._path_positions[start:stop])
+        return found
+
+
+def directory_index(directories: list[str]) -> DirectoryIndex:
+    """The index of a listing, built once for as long as the same list is served."""
+    cached = _indexes.get(id(directories))
+    if cached is not None and cached[0] is directories:
+        return cached[1]
+    index = DirectoryIndex(directories)
+    while len(_indexes) >= INDEX_CACHE_SIZE:
+        del _indexes[next(iter(_indexes))]
+    _indexes[id(directories)] = (directories, index)
+    return index
+
+
+class DirectoryTree:
+    """Directory listings shared by every worker process through an on-disk snapshot.
+
+    Stale listings are still served while one background thread walks the tree
+    again, so callers only wait for a walk before the first snapshot exists. A lock
+    file next to the snapshot keeps workers from walking at the same time.
+    """
+
+    def __init__(
+        self, path: Path, data_dir: Path, ttl: float = DIR_CACHE_TTL, depth: int = MAX_DEPTH
+    ):
+        self.path = path
+        self.data_dir = data_dir
+        self.ttl = ttl
+        self.depth = depth
+        self.lock_path = path.with_name(f'{path.name}.lock')
+        self._snapshot: dict[str, Any] | None = None
+        self._loaded: int | None = None
+        self._guard = threading.Lock()
+        self._refreshing: threading.Thread | None = None
+        # listings cut from a snapshot by depth, kept so their indexes are reused
+        self._listings: tuple[dict[str, Any] | None, dict[int, list[str]]] = (None, {})
+
+    def listing(self, max_depth: int = MAX_DEPTH, generation: int | None = None) -> list[str]:
+        snapshot = self._current()
+        if snapshot is None or snapshot['depth'] < max_depth:
+            snapshot = self.refresh(max(max_depth, self.depth), generation)
+        elif not self._fresh(snapshot, generation):
+            self._refresh_in_background(snapshot['depth'], generation)
+        owner, listings = self._listings
+        if owner is not snapshot:
+            listings = {}
+            self._listings = (snapshot, listings)
+        if max_depth not in listings:
+            listings[max_depth] = [
+                item for item in snapshot['directories'] if _depth(item) <= max_depth
+            ]
+        return listings[max_depth]
+
+    def refresh(self, depth: int | None = None, generation: int | None = None) -> dict[str, Any]:
+        """Walk the tree now and publish the snapshot to every worker."""
+        walked_at = time.time()
+        depth = depth or self.depth
+        snapshot = {
+            'data_dir': str(self.data_dir),
+            'walked_at': walked_at,
+            'generation': generation,
+            'depth': depth,
+            'directories': scan_directories(self.data_dir, depth),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(orjson.dumps(snapshot))
+        os.replace(tmp, self.path)
+        with self._guard:
+            self._snapshot = snapshot
+            with suppress(OSError):
+                self._loaded = self.path.stat().st_mtime_ns
+        return snapshot
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Wait for a background refresh started by this process, if any."""
+        thread = self._refreshing
+        if thread is not None:
+            thread.join(timeout)
+
+    def _current(self) -> dict[str, Any] | None:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return self._snapshot
+        if mtime == self._loaded and self._snapshot is not None:
+            return self._snapshot
+        try:
+            data = self.path.read_bytes()
+        except OSError:
+            return self._snapshot
+        try:
+            snapshot = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return self._snapshot
+        if snapshot.get('data_dir') != str(self.data_dir):
+            return self._snapshot
+        with self._guard:
+            self._snapshot, self._loaded = snapshot, mtime
+        return snapshot
+
+    def _fresh(self, snapshot: dict[str, Any], generation: int | None) -> bool:
+        # a live watcher's generation replaces the TTL: listings stay valid until it changes
+        if generation is not None:
+            return snapshot['generation'] == generation
+        return time.time() - snapshot['walked_at'] < self.ttl
+
+    def _refresh_in_background(self, depth: int, generation: int | None) -> None:
+        with self._guard:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            if not self._claim():
+                return
+            self._refreshing = threading.Thread(
+                target=self._background_refresh,
+                args=(depth, generation),
+                name='directory-tree-refresh',
+                daemon=True,
+            )
+            self._refreshing.start()
+
+    def _background_refresh(self, depth: int, generation: int | None) -> None:
+        try:
+            self.refresh(depth, generation)
+        except Exception as exc:  # noqa: BLE001
+            logger.error('Directory tree refresh failed: %s', exc)
+        finally:
+            with suppress(OSError):
+                self.lock_path.unlink()
+
+    def _claim(self) -> bool:
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime < REFRESH_LOCK_TIMEOUT:
+                        return False
+                    self.lock_path.unlink()
+                except FileNotFoundError:
+                    continue
+            except OSError:
+                return False
+        return False
+
+
+__all__ = [
+    'CHILDREN_CACHE_SIZE',
+    'DIR_CACHE_TTL',
+    'INDEX_CACHE_SIZE',
+    'MAX_DEPTH',
+    'REFRESH_LOCK_TIMEOUT',
+    'WALK_WORKERS',
+    'DirectoryIndex',
+    'DirectoryTree',
+    'child_names',
+    'directory_index',
+    'invalidate_children',
+    'list_children',
+    'scan_directories',
+]
@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import time
+from array import array
+from bisect import bisect_right
+from contextlib import AbstractContextManager, suppress
+from itertools import accumulate
+from pathlib import Path
+from shutil import which
+from weakref import WeakKeyDictionary
+
+from core.store import get_meta, open_store, relative_key, set_meta
+
+CACHE_MAX_BYTES = 2 * 1024**3
+# extracted text is stored as `<relative path><TEXT_SUFFIX>`; the suffix must not
+# collide with file filters users pick in the UI (e.g. `*.txt`)
+TEXT_SUFFIX = '.text'
+# line-offset indexes of previewed files, see `core.preview.LineIndex`
+INDEX_SUFFIX = '.lines'
+
+_PANDOC_FORMATS: dict[str, str] = {
+    '.docx': 'docx',
+    '.epub': 'epub',
+    '.odt': 'odt',
+    '.fb2': 'fb2',
+    '.ipynb': 'ipynb',
+    '.html': 'html',
+    '.htm': 'html',
+}
+EXTRACTABLE_SUFFIXES: frozenset[str] = frozenset({'.pdf', '.doc', '.json', *_PANDOC_FORMATS})
+
+# conversions per converter running at once in an event loop, see `extract_text_async`
+CONVERTER_LIMITS: dict[str, int] = {'pdftotext': 2, 'pandoc': 2, 'antiword': 4, 'gron': 4}
+CONVERT_TIMEOUT = 60.0
+
+_converter_slots: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+    WeakKeyDictionary()
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    text_bytes INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    total_lines INTEGER NOT NULL,
+    starts BLOB NOT NULL
+);
+"""
+
+
+def extract_command(path: Path) -> list[str] | None:
+    ext = path.suffix.lower()
+    if ext == '.pdf' and which('pdftotext'):
+        return ['pdftotext', '-layout', '-q', str(path), '-']
+    if ext == '.doc' and which('antiword'):
+        return ['antiword', str(path)]
+    if ext == '.json' and which('gron'):
+        return ['gron', str(path)]
+    if ext in _PANDOC_FORMATS and which('pandoc'):
+        return ['pandoc', '-f', _PANDOC_FORMATS[ext], '-t', 'plain', str(path)]
+    return None
+
+
+def extract_text(path: Path) -> str | None:
+    command = extract_command(path)
+    if not command:
+        return None
+    proc = subprocess.run(command, capture_output=True, check=False)
+    # a failed conversion is a miss, not an empty text to cache
+    if proc.returncode:
+        return None
+    return proc.stdout.decode('utf-8', errors='replace')
+
+
+class ConversionTimeout(TimeoutError):
+    pass
+
+
+def pages_command(path: Path, first: int, last: int) -> list[str] | None:
+    if path.suffix.lower() != '.pdf' or not which('pdftotext'):
+        return None
+    return ['pdftotext', '-layout', '-q', '-f', str(first), '-l', str(last), str(path), '-']
+
+
+def extract_pages(
+    path: Path, first: int, last: int, timeout: float = CONVERT_TIMEOUT
+) -> str | None:
+    """Text of pages first..last of a PDF, laid out exactly as in the full extraction."""
+    command = pages_command(path, first, last)
+    if not command:
+        return None
+    try:
+        proc = subprocess.run(command, capture_output=True, check=False, timeout=timeout)
+    except subprocess.TimeoutExpired as exc:
+        raise ConversionTimeout(f'Converting {path.name} took longer than {timeout:g}s') from exc
+    if proc.returncode:
+        return None
+    return proc.stdout.decode('utf-8', errors='replace')
+
+
+class PageMap:
+    """First line of every page in a PDF's extracted text.
+
+    pdftotext ends each page with a form feed, so the map comes for free whenever a
+    whole PDF is converted.
+    """
+
+    def __init__(self, starts: array[int], total_lines: int):
+        self.starts = starts
+        self.total_lines = total_lines
+
+    @classmethod
+    def from_text(cls, text: str) -> PageMap:
+        # the form feeds closing the last pages do not start another line
+        text = text.rstrip('\f')
+        pages = text.split('\f')
+        starts = array('I', accumulate((page.count('\n') for page in pages[:-1]), initial=1))
+        total = text.count('\n') + (bool(text) and not text.endswith('\n'))
+        return cls(starts, total)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def page_of(self, line: int) -> int:
+        """1-based page holding a 1-based line."""
+        return max(1, bisect_right(self.starts, line))
+
+
+def _converter_slot(converter: str) -> asyncio.Semaphore:
+    slots = _converter_slots.setdefault(asyncio.get_running_loop(), {})
+    slot = slots.get(converter)
+    if slot is None:
+        slot = slots[converter] = asyncio.Semaphore(CONVERTER_LIMITS.get(converter, 2))
+    return slot
+
+
+async def extract_text_async(path: Path, timeout: float = CONVERT_TIMEOUT) -> str | None:
+    """`extract_text` without blocking the event loop.
+
+    Each converter runs at most `CONVERTER_LIMITS` times at once; waiting for a slot
+    counts towards `timeout`, after which the converter is killed and
+    `ConversionTimeout` is raised.
+    """
+    command = extract_command(path)
+    return await _convert(command, path, timeout) if command else None
+
+
+async def extract_pages_async(
+    path: Path, first: int, last: int, timeout: float = CONVERT_TIMEOUT
+) -> str | None:
+    """`extract_pages` without blocking the event loop, limited like `extract_text_async`."""
+    command = pages_command(path, first, last)
+    return await _convert(command, path, timeout) if command else None
+
+
+async def _convert(command: list[str], path: Path, timeout: float) -> str | None:
+    proc: asyncio.subprocess.Process | None = None
+
+    async def run() -> bytes | None:
+        nonlocal proc
+        async with _converter_slot(command[0]):
+            proc = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await proc.communicate()
+            return stdout if proc.returncode == 0 else None
+
+    try:
+        stdout = await asyncio.wait_for(run(), timeout)
+    except TimeoutError as exc:
+        raise ConversionTimeout(f'Converting {path.name} took longer than {timeout:g}s') from exc
+    finally:
+        if proc is not None and proc.returncode is None:
+            with suppress(ProcessLookupError):
+                proc.kill()
+            await proc.wait()
+    return None if stdout is None else stdout.decode('utf-8', errors='replace')
+
+
+class TextCache:
+    """On-disk store of extracted plain text, keyed by path + size + mtime.
+
+    Texts mirror the data directory layout under `text_dir` so ripgrep can search
+    them directly; a SQLite manifest tracks freshness and drives LRU eviction.
+    """
+
+    def __init__(self, root: Path, data_dir: Path, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root.absolute()
+        self.data_dir = data_dir
+        self.max_bytes = max_bytes
+        self.text_dir = self.root / 'text'
+        self.index_dir = self.root / 'lines'
+        self._db_path = self.root / 'manifest.sqlite3'
+
+    def _connect(self) -> AbstractContextManager[sqlite3.Connection]:
+        return open_store(self._db_path, _SCHEMA)
+
+    def key(self, path: Path) -> str | None:
+        return relative_key(path, self.data_dir)
+
+    def text_path(self, key: str) -> Path:
+        return self.text_dir / f'{key}{TEXT_SUFFIX}'
+
+    def index_path(self, path: Path) -> Path | None:
+        """Where the line index of a data file or of a cached text is persisted."""
+        with suppress(ValueError):
+            relative = path.absolute().relative_to(self.text_dir).as_posix()
+            return self.index_dir / 'text' / f'{relative}{INDEX_SUFFIX}'
+        key = self.key(path)
+        return None if key is None else self.index_dir / 'data' / f'{key}{INDEX_SUFFIX}'
+
+    def original_path(self, reported: str) -> str | None:
+        """Map a path printed by ripgrep for a cached text back to its source file."""
+        prefix = f'{self.text_dir}{os.sep}'
+        if not reported.startswith(prefix) or not reported.endswith(TEXT_SUFFIX):
+            return None
+        return reported[len(prefix) : -len(TEXT_SUFFIX)].replace(os.sep, '/')
+
+    def fresh_path(self, path: Path) -> Path | None:
+        """The cached text file of path if it is up to date, without reading it."""
+        key = self.key(path)
+        if key is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        with self._connect() as db:
+            row = db.execute('SELECT size, mtime_ns FROM entries WHERE path = ?', (key,)).fetchone()
+            if row != (st.st_size, st.st_mtime_ns):
+                return None
+            db.execute('UPDATE entries SET accessed = ? WHERE path = ?', (time.time(), key))
+        return self.text_path(key)
+
+    def get(self, path: Path) -> str | None:
+        cached = self.fresh_path(path)
+        if cached is None:
+            return None
+        try:
+            return cached.read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def put(self, path: Path, text: str) -> None:
+        key = self.key(path)
+        if key is None:
+            return
+        st = path.stat()
+        # pdftotext ends every page with a form feed
+        paged = path.suffix.lower() == '.pdf' and '\f' in text
+        if paged:
+            # as in `PageMap`, so the text has the lines its page map counts
+            text = text.rstrip('\f')
+        data = text.encode('utf-8')
+        target = self.text_path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+        with self._connect() as db:
+            total = self._text_bytes(db) + len(data) - self._entry_bytes(db, key)
+            db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                (key, st.st_size, st.st_mtime_ns, len(data), time.time()),
+            )
+            if paged:
+                pages = PageMap.from_text(text)
+                db.execute(
+                    'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                    (key, st.st_size, st.st_mtime_ns, pages.total_lines, pages.starts.tobytes()),
+                )
+            evicted = self._evict(db, total)
+        for stale in evicted:
+            self._unlink(stale)
+
+    def page_map(self, path: Path) -> PageMap | None:
+        """Page map of a PDF, kept after its text is evicted so previews can convert single pages."""
+        key = self.key(path)
+        if key is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        with self._connect() as db:
+            row = db.execute(
+                'SELECT size, mtime_ns, total_lines, starts FROM pages WHERE path = ?', (key,)
+            ).fetchone()
+        if row is None or row[:2] != (st.st_size, st.st_mtime_ns):
+            return None
+        starts = array('I')
+        starts.frombytes(row[3])
+        return PageMap(starts, row[2])
+
+    def load(self, path: Path) -> str | None:
+        if path.suffix.lower() not in EXTRACTABLE_SUFFIXES:
+            return None
+        text = self.get(path)
+        if text is None:
+            text = extract_text(path)
+            if text is not None:
+                self.put(path, text)
+        return text
+
+    def ensure(self, path: Path) -> Path | None:
+        """Path of the cached text of path, extracting it first when missing or stale."""
+        if path.suffix.lower() not in EXTRACTABLE_SUFFIXES:
+            return None
+        cached = self.fresh_path(path)
+        if cached is None or not cached.exists():
+            text = extract_text(path)
+            if text is None:
+                return None
+            self.put(path, text)
+            cached = self.fresh_path(path)
+        return cached
+
+    async def ensure_async(self, path: Path, timeout: float = CONVERT_TIMEOUT) -> Path | None:
+        """`ensure` for event loops: converts with `extract_text_async`, file I/O in a thread."""
+        if path.suffix.lower() not in EXTRACTABLE_SUFFIXES:
+            return None
+        cached = await asyncio.to_thread(self.fresh_path, path)
+        if cached is None or not cached.exists():
+            text = await extract_text_async(path, timeout)
+            if text is None:
+                return None
+            await asyncio.to_thread(self.put, path, text)
+            cached = await asyncio.to_thread(self.fresh_path, path)
+        return cached
+
+    def entries(self) -> dict[str, tuple[int, int]]:
+        with self._connect() as db:
+            rows = db.execute('SELECT path, size, mtime_ns FROM entries').fetchall()
+        return {key: (size, mtime_ns) for key, size, mtime_ns in rows}
+
+    def discard(self, path: Path) -> None:
+        key = self.key(path)
+        if key is None:
+            return
+        with self._connect() as db:
+            total = self._text_bytes(db) - self._entry_bytes(db, key)
+            db.execute('DELETE FROM entries WHERE path = ?', (key,))
+            db.execute('DELETE FROM pages WHERE path = ?', (key,))
+            set_meta(db, 'text_bytes', str(total))
+        self._unlink(key)
+        with suppress(OSError):
+            self.index_dir.joinpath('data', f'{key}{INDEX_SUFFIX}').unlink()
+
+    def is_complete(self) -> bool:
+        """Whether every extractable file has been cached, so search may skip rga."""
+        with self._connect() as db:
+            return get_meta(db, 'complete') is not None
+
+    def mark_complete(self, complete: bool = True) -> None:
+        with self._connect() as db:
+            set_meta(db, 'complete', '1' if complete else None)
+
+    @staticmethod
+    def _text_bytes(db: sqlite3.Connection) -> int:
+        """Running size of all cached texts, summed once for manifests that predate it."""
+        total = get_meta(db, 'text_bytes')
+        if total is None:
+            return db.execute('SELECT COALESCE(SUM(text_bytes), 0) FROM entries').fetchone()[0]
+        return int(total)
+
+    @staticmethod
+    def _entry_bytes(db: sqlite3.Connection, key: str) -> int:
+        row = db.execute('SELECT text_bytes FROM entries WHERE path = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _evict(self, db: sqlite3.Connection, total: int) -> list[str]:
+        """Drop least recently used entries until `total` fits; returns their keys to unlink."""
+        evicted: list[str] = []
+        if total > self.max_bytes:
+            rows = db.execute('SELECT path, text_bytes FROM entries ORDER BY accessed')
+            for key, size in rows.fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append(key)
+                total -= size
+            db.executemany('DELETE FROM entries WHERE path = ?', [(key,) for key in evicted])
+            set_meta(db, 'complete', None)
+        set_meta(db, 'text_bytes', str(total))
+        return evicted
+
+    def _unlink(self, key: str) -> None:
+        index = self.index_dir / 'text' / f'{key}{TEXT_SUFFIX}{INDEX_SUFFIX}'
+        for stale in (self.text_path(key), index):
+            with suppress(OSError):
+                stale.unlink()
+
+
+__all__ = [
+    'CACHE_MAX_BYTES',
+    'CONVERTER_LIMITS',
+    'CONVERT_TIMEOUT',
+    'EXTRACTABLE_SUFFIXES',
+    'INDEX_SUFFIX',
+    'TEXT_SUFFIX',
+    'ConversionTimeout',
+    'PageMap',
+    'TextCache',
+    'extract_command',
+    'extract_pages',
+    'extract_pages_async',
+    'extract_text',
+    'extract_text_async',
+    'pages_command',
+]
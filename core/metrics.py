@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterator
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, str]) -> LabelValues:
+    return tuple(sorted(labels.items()))
+
+
+def _format(name: str, labels: LabelValues, value: float) -> str:
+    if labels:
+        rendered = ','.join(f'{key}="{val}"' for key, val in labels)
+        return f'{name}{{{rendered}}} {value:g}'
+    return f'{name} {value:g}'
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: dict[LabelValues, float] = {}
+        REGISTRY.append(self)
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(_labels(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in sorted(self.values.items()):
+            yield _format(self.name, labels, value)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _labels(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[_labels(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _labels(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self.counts: dict[LabelValues, list[int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels(labels)
+        counts = self.counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        counts[bisect_left(self.buckets, value)] += 1
+        self.values[key] = self.values.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self.counts.get(_labels(labels), ()))
+
+    def samples(self) -> Iterator[str]:
+        for labels, counts in sorted(self.counts.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                yield _format(f'{self.name}_bucket', (*labels, ('le', le)), cumulative)
+            yield _format(f'{self.name}_sum', labels, self.values[labels])
+            yield _format(f'{self.name}_count', labels, cumulative)
+
+
+REGISTRY: list[Metric] = []
+
+
+def render() -> str:
+    """Metrics of this process in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+__all__ = ['DEFAULT_BUCKETS', 'REGISTRY', 'Counter', 'Gauge', 'Histogram', 'Metric', 'render']
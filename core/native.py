@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import mmap
+import re
+import unicodedata
+from functools import cache, lru_cache
+from pathlib import Path
+
+from core.schemas import MatchRecord
+
+# the rg command runs with `-m 500`: matching lines reported per file
+MAX_MATCHES_PER_FILE = 500
+# `auto` only scans in-process while the files to search stay below this size
+NATIVE_MAX_BYTES = 256 << 20
+# files handed to one worker thread hop
+SCAN_BATCH_BYTES = 4 << 20
+
+# constructs that match a line break in Python's `re` while rg matches line by line,
+# and word classes, which leave out the combining marks rg counts as word characters
+_NEEDS_RG = re.compile(r'\\[sSwWbBDnrRvfNhH]|\[\^|\(\?[a-zA-Z]*s')
+
+
+@cache
+def mark_ranges() -> str:
+    """`\\p{M}` as character class ranges for Python's `re`."""
+    ranges: list[tuple[int, int]] = []
+    # combining marks only live in the BMP, the SMP and the variation selectors block
+    for cp in (*range(0x20000), *range(0xE0000, 0xE1000)):
+        if unicodedata.category(chr(cp))[0] != 'M':
+            continue
+        if ranges and ranges[-1][1] == cp - 1:
+            ranges[-1] = (ranges[-1][0], cp)
+        else:
+            ranges.append((cp, cp))
+    return ''.join(
+        f'\\U{start:08x}' if start == stop else f'\\U{start:08x}-\\U{stop:08x}'
+        for start, stop in ranges
+    )
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str) -> re.Pattern[str] | None:
+    """Compile an rg pattern for the in-process engine, None if it needs rg.
+
+    The PCRE-style `\\p{M}` and `\\x{....}` that `core.patterns` emits inside
+    character classes are translated; patterns that could match across lines,
+    word classes and what Python does not understand are left to rg.
+    """
+    if not pattern or _NEEDS_RG.search(pattern):
+        return None
+    translated = re.sub(r'\\x\{([0-9a-fA-F]{1,6})\}', lambda m: f'\\U{int(m[1], 16):08x}', pattern)
+    translated = translated.replace('\\p{M}', mark_ranges())
+    if '\\p' in translated or '\\P' in translated:
+        return None
+    try:
+        # files are scanned whole, anchors have to hold at every line like in rg
+        regex = re.compile(translated, re.MULTILINE)
+    except re.error:
+        return None
+    return None if regex.search('') is not None else regex
+
+
+def _read(path: Path) -> str | None:
+    with path.open('rb') as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return None
+        with mm:
+            # rg skips files that look binary
+            if mm.find(b'\0') != -1:
+                return None
+            return mm[:].decode('utf-8', errors='replace')
+
+
+def scan_file(path: Path, regex: re.Pattern[str]) -> list[MatchRecord]:
+    """Match lines of a file with one line of context, paired the way rg's output is.
+
+    Records carry rg's fields (line with its terminator, submatches with UTF-8
+    byte offsets into it) and are left for the caller to label with a path.
+    """
+    try:
+        text = _read(path)
+    except OSError:
+        return []
+    if text is None:
+        return []
+
+    records: list[MatchRecord] = []
+    spans: list[tuple[int, int]] = []
+    line_number = 1
+    counted = 0
+    line_start = line_end = -1
+    for match in regex.finditer(text):
+        if match.start() > line_end:
+            if len(records) == MAX_MATCHES_PER_FILE:
+                break
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            line_number += text.count('\n', counted, line_start)
+            counted = line_start
+            line_end = text.find('\n', match.end())
+            if line_end == -1:
+                line_end = len(text)
+            records.append(
+                MatchRecord(path='', line_number=line_number, lines=text[line_start : line_end + 1])
+            )
+            spans.append((line_start, line_end))
+        start = len(text[line_start : match.start()].encode())
+        records[-1].submatches.append(
+            {'match': {'text': match[0]}, 'start': start, 'end': start + len(match[0].encode())}
+        )
+
+    # a context line between two matches goes to the one above, like in rg's stream
+    numbers = {record.line_number for record in records}
+    for record, (start, end) in zip(records, spans, strict=True):
+        previous = record.line_number - 1
+        if start and previous not in numbers and previous - 1 not in numbers:
+            record.context_before = text[text.rfind('\n', 0, start - 1) + 1 : start - 1].strip()
+        if end + 1 < len(text) and record.line_number + 1 not in numbers:
+            following = text.find('\n', end + 1)
+            record.context_after = text[
+                end + 1 : len(text) if following == -1 else following
+            ].strip()
+    return records
+
+
+__all__ = [
+    'MAX_MATCHES_PER_FILE',
+    'NATIVE_MAX_BYTES',
+    'SCAN_BATCH_BYTES',
+    'compile_pattern',
+    'mark_ranges',
+    'scan_file',
+]
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import codecs
+import logging
+import sqlite3
+import time
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from pathlib import Path
+
+from core import walk_files
+from core.extract import EXTRACTABLE_SUFFIXES, TextCache, extract_text
+from core.patterns import normalize
+from core.store import get_meta, open_store, relative_key, set_meta
+
+_BATCH_FILES = 200
+_READ_CHUNK = 1 << 20
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    opaque INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    gram INTEGER PRIMARY KEY,
+    ids BLOB NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexReport:
+    total: int = 0
+    indexed: int = 0
+    removed: int = 0
+    elapsed: float = 0.0
+
+
+def text_grams(text: str) -> set[int]:
+    """Trigrams of the normalized words of text, packed as three 21-bit code points."""
+    # natural text repeats the same words over and over, fold each distinct one once
+    words = set(normalize(' '.join(set(text.split()))).split())
+    grams: set[int] = set()
+    for word in words:
+        codes = [ord(ch) for ch in word]
+        grams.update(
+            (codes[i] << 42) | (codes[i + 1] << 21) | codes[i + 2] for i in range(len(codes) - 2)
+        )
+    return grams
+
+
+def file_grams(path: Path, text_cache: TextCache | None = None) -> tuple[set[int], bool]:
+    """Grams of a file's raw text and of its extracted text.
+
+    Both are indexed because rg searches the raw file while rga (or the extraction
+    cache) searches the converted text. The second value is True when neither
+    could be read, meaning the file has to stay a candidate for every query.
+    """
+    grams: set[int] = set()
+    binary = _raw_grams(path, grams)
+    extracted = None
+    if path.suffix.lower() in EXTRACTABLE_SUFFIXES:
+        extracted = text_cache.load(path) if text_cache else extract_text(path)
+        if extracted:
+            grams |= text_grams(extracted)
+    return grams, binary and extracted is None
+
+
+def _raw_grams(path: Path, grams: set[int]) -> bool:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    tail = ''
+    with path.open('rb') as fh:
+        while chunk := fh.read(_READ_CHUNK):
+            # same heuristic rg uses to skip binary files
+            if b'\0' in chunk:
+                return True
+            text = tail + decoder.decode(chunk)
+            # carry the trailing partial word over to the next chunk
+            cut = max(text.rfind(' '), text.rfind('\n'))
+            grams |= text_grams(text[: cut + 1])
+            tail = text[cut + 1 :]
+    grams |= text_grams(tail)
+    return False
+
+
+def _chunks(items: Sequence[int], size: int = _SQL_CHUNK) -> Iterator[Sequence[int]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _ids(blob: bytes) -> array[int]:
+    ids = array('I')
+    ids.frombytes(blob)
+    return ids
+
+
+class NgramIndex:
+    """Trigram index over normalized file text used to narrow rg to candidate files.
+
+    Posting lists are arrays of file ids. Re-indexing or removing a file only drops
+    its `files` row; the stale ids left in postings are filtered out at query
+    time and purged by `compact`.
+    """
+
+    def __init__(self, root: Path, data_dir: Path, text_cache: TextCache | None = None):
+        self.root = root.absolute()
+        self.data_dir = data_dir
+        self.text_cache = text_cache
+        self._db_path = self.root / 'ngram.sqlite3'
+
+    def _connect(self) -> AbstractContextManager[sqlite3.Connection]:
+        return open_store(self._db_path, _SCHEMA)
+
+    def is_complete(self) -> bool:
+        with self._connect() as db:
+            return get_meta(db, 'complete') is not None
+
+    def mark_complete(self, complete: bool = True) -> None:
+        with self._connect() as db:
+            set_meta(db, 'complete', '1' if complete else None)
+
+    def files(self) -> dict[str, tuple[int, int]]:
+        with self._connect() as db:
+            rows = db.execute('SELECT path, size, mtime_ns FROM files').fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def update(self, paths: Iterable[Path]) -> int:
+        batch: list[tuple[str, int, int, set[int], bool]] = []
+        missing: list[Path] = []
+        for path in paths:
+            key = relative_key(path, self.data_dir)
+            if key is None:
+                continue
+            try:
+                st = path.stat()
+                grams, opaque = file_grams(path, self.text_cache)
+            except OSError:
+                missing.append(path)
+                continue
+            batch.append((key, st.st_size, st.st_mtime_ns, grams, opaque))
+
+        pending: defaultdict[int, array[int]] = defaultdict(lambda: array('I'))
+        with self._connect() as db:
+            for key, size, mtime_ns, grams, opaque in batch:
+                self._forget(db, key)
+                cursor = db.execute(
+                    'INSERT INTO files (path, size, mtime_ns, opaque) VALUES (?, ?, ?, ?)',
+                    (key, size, mtime_ns, int(opaque)),
+                )
+                for gram in grams:
+                    pending[gram].append(cursor.lastrowid)
+
+            for chunk in _chunks(list(pending)):
+                marks = ','.join('?' * len(chunk))
+                existing = dict(
+                    db.execute(f'SELECT gram, ids FROM postings WHERE gram IN ({marks})', chunk)
+                )
+                db.executemany(
+                    'INSERT OR REPLACE INTO postings VALUES (?, ?)',
+                    [(gram, existing.get(gram, b'') + pending[gram].tobytes()) for gram in chunk],
+                )
+        if missing:
+            self.remove(missing)
+        return len(batch)
+
+    def remove(self, paths: Iterable[Path]) -> None:
+        with self._connect() as db:
+            for path in paths:
+                if (key := relative_key(path, self.data_dir)) is not None:
+                    self._forget(db, key)
+
+    def _forget(self, db: sqlite3.Connection, key: str) -> None:
+        if db.execute('DELETE FROM files WHERE path = ?', (key,)).rowcount:
+            dead = int(get_meta(db, 'dead') or 0) + 1
+            set_meta(db, 'dead', str(dead))
+
+    def candidates(self, literals: Iterable[str], include_opaque: bool = True) -> list[str] | None:
+        """Relative paths of files that may contain every literal, or None if unprunable."""
+        grams = set().union(*(text_grams(word) for word in literals))
+        if not grams:
+            return None
+
+        with self._connect() as db:
+            sizes: dict[int, int] = {}
+            for chunk in _chunks(sorted(grams)):
+                marks = ','.join('?' * len(chunk))
+                sizes.update(
+                    db.execute(
+                        f'SELECT gram, length(ids) FROM postings WHERE gram IN ({marks})', chunk
+                    )
+                )
+
+            ids: set[int] = set()
+            if len(sizes) == len(grams):
+                # intersect starting from the rarest gram so the working set stays small
+                for position, gram in enumerate(sorted(sizes, key=sizes.__getitem__)):
+                    (blob,) = db.execute(
+                        'SELECT ids FROM postings WHERE gram = ?', (gram,)
+                    ).fetchone()
+                    ids = set(_ids(blob)) if position == 0 else ids.intersection(_ids(blob))
+                    if not ids:
+                        break
+
+            found: list[str] = []
+            for chunk in _chunks(sorted(ids)):
+                marks = ','.join('?' * len(chunk))
+                found.extend(
+                    row[0]
+                    for row in db.execute(f'SELECT path FROM files WHERE id IN ({marks})', chunk)
+                )
+            if include_opaque:
+                found.extend(
+                    row[0] for row in db.execute('SELECT path FROM files WHERE opaque = 1')
+                )
+        return sorted(set(found))
+
+    def build(self) -> IndexReport:
+        """Bring the index in line with the data directory, re-reading only changed files."""
+        started = time.monotonic()
+        report = IndexReport()
+        known = self.files()
+        seen: set[str] = set()
+        pending: list[Path] = []
+
+        for path in walk_files(self.data_dir):
+            key = relative_key(path, self.data_dir)
+            if key is None:
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen.add(key)
+            report.total += 1
+            if known.get(key) != (st.st_size, st.st_mtime_ns):
+                pending.append(path)
+
+        stale = known.keys() - seen
+        if pending or stale:
+            self.mark_complete(False)
+        self.remove(self.data_dir / key for key in stale)
+        report.removed = len(stale)
+
+        for start in range(0, len(pending), _BATCH_FILES):
+            report.indexed += self.update(pending[start : start + _BATCH_FILES])
+            logger.info('indexed %d/%d files', report.indexed, len(pending))
+
+        self.compact()
+        self.mark_complete()
+        report.elapsed = time.monotonic() - started
+        return report
+
+    def compact(self, force: bool = False) -> None:
+        """Purge ids of removed files from the postings once they pile up."""
+        with self._connect() as db:
+            dead = int(get_meta(db, 'dead') or 0)
+            live = db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+            if not dead or (dead < live and not force):
+                return
+            alive = {row[0] for row in db.execute('SELECT id FROM files')}
+            last = -1
+            while rows := db.execute(
+                'SELECT gram, ids FROM postings WHERE gram > ? ORDER BY gram LIMIT 5000', (last,)
+            ).fetchall():
+                last = rows[-1][0]
+                for gram, blob in rows:
+                    kept = array('I', (i for i in _ids(blob) if i in alive))
+                    if kept:
+                        db.execute(
+                            'UPDATE postings SET ids = ? WHERE gram = ?', (kept.tobytes(), gram)
+                        )
+                    else:
+                        db.execute('DELETE FROM postings WHERE gram = ?', (gram,))
+            set_meta(db, 'dead', None)
+
+
+__all__ = [
+    'IndexReport',
+    'NgramIndex',
+    'file_grams',
+    'text_grams',
+]
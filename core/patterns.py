@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import re
 import unicodedata
+from collections.abc import Callable
+from functools import cache, lru_cache
 
 _MULTI_MATCH: dict[str, str] = {
     'ا': 'اأآإى',
@@ -15,105 +18,164 @@ _MULTI_MATCH: dict[str, str] = {
 }
 
 
+# queries built into patterns, per (mode, query); `build_pattern` runs on every keystroke
+PATTERN_CACHE_SIZE = 4096
+
+# code points treated as Arabic: `ignore` lets marks and tatweel follow their letters
+ARABIC_RANGES = (
+    (0x0600, 0x06FF),
+    (0x0750, 0x077F),
+    (0x08A0, 0x08FF),
+    (0xFB50, 0xFDFF),
+    (0xFE70, 0xFEFF),
+)
+# stand-ins that cannot survive _sanitize: a mark, and the bounds of an Arabic letter's token
+_MARK, _OPEN, _CLOSE = '\x00', '\x01', '\x02'
+_MARKED_LETTER = re.compile(f'{_OPEN}([^{_CLOSE}]*){_CLOSE}{_MARK}+')
+_STAND_INS = str.maketrans('', '', _MARK + _OPEN + _CLOSE)
+
+
 def _is_arabic(ch: str) -> bool:
     cp = ord(ch)
-    ranges = (
-        (0x0600, 0x06FF),
-        (0x0750, 0x077F),
-        (0x08A0, 0x08FF),
-        (0xFB50, 0xFDFF),
-        (0xFE70, 0xFEFF),
-    )
-    return any(a <= cp <= b for a, b in ranges)
+    return any(a <= cp <= b for a, b in ARABIC_RANGES)
 
 
 def _is_mark(ch: str) -> bool:
     return unicodedata.combining(ch) != 0
 
 
-def _sanitize(text: str) -> str:
-    out: list[str] = []
-    for ch in text or '':
-        if ch == ' ':
-            out.append(ch)
-            continue
-        cat = unicodedata.category(ch)[0]
-        if cat in {'L', 'N', 'M'}:
-            out.append(ch)
-    return ''.join(out).strip()
-
-
 def _expand(ch: str) -> str:
     mapped = _MULTI_MATCH.get(ch)
     return f'[{mapped}]' if mapped else ch
 
 
+class _CharTable(dict[int, str | None]):
+    """`str.translate` table that works out each code point once, on first sight."""
+
+    def __init__(self, translate: Callable[[str], str | None]):
+        super().__init__()
+        self.translate = translate
+
+    def __missing__(self, cp: int) -> str | None:
+        value = self[cp] = self.translate(chr(cp))
+        return value
+
+
+def _keep(ch: str) -> str | None:
+    return ch if ch == ' ' or unicodedata.category(ch)[0] in {'L', 'N', 'M'} else None
+
+
+def _ignore_token(ch: str) -> str | None:
+    if ch == ' ':
+        return '.*?'
+    if _is_mark(ch):
+        return None
+    if _is_arabic(ch):
+        return f'(?:{_expand(ch)}[\\p{{M}}\\x{{0640}}]*)'
+    return _expand(ch)
+
+
+def _require_token(ch: str) -> str:
+    if ch == ' ':
+        return '.*?'
+    if _is_mark(ch):
+        return _MARK
+    if _is_arabic(ch):
+        return f'{_OPEN}{_expand(ch)}{_CLOSE}'
+    return _expand(ch)
+
+
+def _unmarked(ch: str) -> str | None:
+    return None if ch == '\u0640' or unicodedata.category(ch)[0] == 'M' else ch
+
+
+_SANITIZE = _CharTable(_keep)
+_UNMARKED = _CharTable(_unmarked)
+_PLAIN = _CharTable(_expand)
+_IGNORE = _CharTable(_ignore_token)
+_REQUIRE = _CharTable(_require_token)
+
+
+def _sanitize(text: str) -> str:
+    return (text or '').translate(_SANITIZE).strip()
+
+
 def _gaps(s: str) -> str:
     return '.*?'.join(part for part in s.split(' ') if part)
 
 
 def build_plain(query: str) -> str:
-    s = _sanitize(query)
-    expanded = ''.join(_expand(ch) for ch in s)
-    return _gaps(expanded)
+    return _gaps(_sanitize(query).translate(_PLAIN))
 
 
 def build_ignore(query: str) -> str:
-    s = _sanitize(query)
-    out: list[str] = []
-    i = 0
-    n = len(s)
-    while i < n:
-        ch = s[i]
-        if ch == ' ':
-            out.append('.*?')
-            i += 1
-            continue
-        if _is_mark(ch):
-            i += 1
-            continue
-        token = _expand(ch)
-        if _is_arabic(ch):
-            out.append(f'(?:{token}[\\p{{M}}\\x{{0640}}]*)')
-            j = i + 1
-            while j < n and _is_mark(s[j]):
-                j += 1
-            i = j
-        else:
-            out.append(token)
-            i += 1
-    return ''.join(out)
+    # marks are dropped, every Arabic letter takes any marks and tatweel after it
+    return _sanitize(query).translate(_IGNORE)
 
 
 def build_require(query: str) -> str:
-    s = _sanitize(query)
-    out: list[str] = []
-    i = 0
-    n = len(s)
-    while i < n:
-        ch = s[i]
-        if ch == ' ':
-            out.append('.*?')
-            i += 1
-            continue
-        if _is_mark(ch):
-            i += 1
-            continue
-        token = _expand(ch)
-        if not _is_arabic(ch):
-            out.append(token)
-            i += 1
-            continue
-        j = i + 1
-        has = False
-        while j < n and _is_mark(s[j]):
-            has = True
-            j += 1
-        out.append(f'(?:{token}[\\p{{M}}]+)' if has else token)
-        i = j
-    return ''.join(out)
+    # an Arabic letter typed with marks must carry marks, other marks are dropped
+    tokens = _sanitize(query).translate(_REQUIRE)
+    return _MARKED_LETTER.sub(r'(?:\1[\\p{M}]+)', tokens).translate(_STAND_INS)
+
+
+def build_shadow(query: str) -> str:
+    """Pattern of an `ignore` query for the shadow corpus (see `core.shadow`).
+
+    The shadow has every mark and tatweel stripped, so the query loses them too
+    and the rest is matched like `smart` mode, without PCRE.
+    """
+    return build_plain((query or '').translate(_UNMARKED))
+
+
+# combining marks only live in the BMP, the SMP and the variation selectors block
+_MARK_PLANES = ((0, 0x20000), (0xE0000, 0xE1000))
+
+
+@cache
+def _normalize_table() -> dict[int, int | None]:
+    # drop every mark (what `\p{M}` matches) plus tatweel, and fold each letter
+    # onto one representative of its _MULTI_MATCH equivalence class
+    table: dict[int, int | None] = {
+        cp: None
+        for start, stop in _MARK_PLANES
+        for cp in range(start, stop)
+        if unicodedata.category(chr(cp))[0] == 'M'
+    }
+    table[0x0640] = None
+    groups: list[set[str]] = []
+    for key, members in _MULTI_MATCH.items():
+        merged = {key, *members}
+        for group in [g for g in groups if g & merged]:
+            merged |= group
+            groups.remove(group)
+        groups.append(merged)
+    for group in groups:
+        target = ord(min(group))
+        table.update((ord(ch), target) for ch in group)
+    return table
 
 
+_WORD_BREAK = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Fold text so every string the non-regex modes can match folds to the query.
+
+    Case, diacritics, tatweel and letter variants are erased and every run of
+    non-word characters becomes a single space.
+    """
+    return _WORD_BREAK.sub(' ', text.lower().translate(_normalize_table()))
+
+
+def build_literals(mode: str | None, query: str) -> list[str]:
+    """Normalized words every match of the query must contain, empty for regex mode."""
+    if (mode or '').strip().lower() == 'regex':
+        return []
+    return normalize(_sanitize(query)).split()
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
 def build_pattern(mode: str | None, query: str) -> tuple[str, bool]:
     m = (mode or '').strip().lower()
     if m == 'regex':
@@ -127,8 +189,13 @@ def build_pattern(mode: str | None, query: str) -> tuple[str, bool]:
 
 
 __all__ = [
+    'ARABIC_RANGES',
+    'PATTERN_CACHE_SIZE',
+    'build_ignore',
+    'build_literals',
     'build_pattern',
     'build_plain',
-    'build_ignore',
     'build_require',
+    'build_shadow',
+    'normalize',
 ]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+
+from core import RGA_FILE_FILTERS, walk_files
+from core.extract import EXTRACTABLE_SUFFIXES, TextCache, extract_text
+
+PROGRESS_INTERVAL = 5.0
+WORKER_NICENESS = 10
+
+_SUFFIXES = frozenset(f[1:] for f in RGA_FILE_FILTERS if f[1:] in EXTRACTABLE_SUFFIXES)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExtractionReport:
+    total: int = 0
+    skipped: int = 0
+    extracted: int = 0
+    failed: int = 0
+    removed: int = 0
+    source_bytes: int = 0
+    elapsed: float = 0.0
+
+
+def default_workers() -> int:
+    # leave most cores to the Granian workers serving searches
+    return max(1, (os.cpu_count() or 2) // 4)
+
+
+def iter_extractable(data_dir: Path) -> Iterator[Path]:
+    for path in walk_files(data_dir):
+        if path.suffix.lower() in _SUFFIXES:
+            yield path
+
+
+def _init_worker() -> None:
+    with suppress(AttributeError, OSError):
+        os.nice(WORKER_NICENESS)
+
+
+def _extract(path: Path) -> str | None:
+    try:
+        return extract_text(path)
+    except Exception as exc:  # noqa: BLE001
+        logger.error('Extraction failed for %s: %s', path, exc)
+        return None
+
+
+def preextract(cache: TextCache, workers: int | None = None) -> ExtractionReport:
+    """Extract every searchable document under the cache's data directory.
+
+    Entries already cached with a matching size and mtime are skipped, and each
+    finished extraction is committed right away, so an interrupted run resumes
+    where it stopped. The cache is marked complete only after a clean pass.
+    """
+    started = time.monotonic()
+    report = ExtractionReport()
+    known = cache.entries()
+    seen: set[str] = set()
+    pending: list[tuple[Path, int]] = []
+
+    for path in iter_extractable(cache.data_dir):
+        key = cache.key(path)
+        if key is None:
+            continue
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        seen.add(key)
+        report.total += 1
+        if known.get(key) == (st.st_size, st.st_mtime_ns):
+            report.skipped += 1
+            continue
+        pending.append((path, st.st_size))
+
+    stale = known.keys() - seen
+    if pending or stale:
+        cache.mark_complete(False)
+    for key in stale:
+        cache.discard(cache.data_dir / key)
+        report.removed += 1
+
+    workers = max(1, workers or default_workers())
+    last_report = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight: dict[Future[str | None], tuple[Path, int]] = {}
+        queue = iter(pending)
+        while True:
+            # bound submissions so huge corpora don't queue millions of futures
+            while len(in_flight) < workers * 4 and (item := next(queue, None)):
+                in_flight[pool.submit(_extract, item[0])] = item
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, size = in_flight.pop(future)
+                text = future.result()
+                if text is None:
+                    report.failed += 1
+                    continue
+                try:
+                    cache.put(path, text)
+                except OSError as exc:
+                    logger.error('Caching failed for %s: %s', path, exc)
+                    report.failed += 1
+                    continue
+                report.extracted += 1
+                report.source_bytes += size
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                _log_progress(report, len(pending), now - started)
+
+    report.elapsed = time.monotonic() - started
+    _log_progress(report, len(pending), report.elapsed)
+
+    # eviction may have dropped entries if the corpus outgrew the size budget
+    if not report.failed and seen <= cache.entries().keys():
+        cache.mark_complete()
+    return report
+
+
+def _log_progress(report: ExtractionReport, pending: int, elapsed: float) -> None:
+    done = report.extracted + report.failed
+    elapsed = max(elapsed, 1e-9)
+    logger.info(
+        'extracted %d/%d files (%d failed, %d up to date) - %.1f files/s, %.2f MB/s',
+        done,
+        pending,
+        report.failed,
+        report.skipped,
+        report.extracted / elapsed,
+        report.source_bytes / elapsed / 1024**2,
+    )
+
+
+__all__ = [
+    'ExtractionReport',
+    'default_workers',
+    'iter_extractable',
+    'preextract',
+]
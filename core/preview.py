@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import struct
+from array import array
+from collections import OrderedDict
+from contextlib import suppress
+from itertools import accumulate, count
+from operator import add
+from os import stat_result
+from pathlib import Path
+from typing import Literal
+
+from core.extract import (
+    EXTRACTABLE_SUFFIXES,
+    PageMap,
+    TextCache,
+    extract_pages,
+    extract_pages_async,
+    extract_text,
+)
+
+PREVIEW_LIMIT = 200
+MAX_PREVIEW_LIMIT = 2000
+
+_READ_CHUNK = 8 << 20
+_INDEX_CACHE_SIZE = 32
+# smaller files are indexed faster than a sidecar can be read back
+PERSIST_MIN_BYTES = 1 << 20
+# magic, then size and mtime_ns of the indexed file, then the offsets
+_SIDECAR_HEADER = struct.Struct('<8sQq')
+_SIDECAR_MAGIC = b'BHLINES1'
+
+Direction = Literal['after', 'before']
+
+
+class LineIndex:
+    """Byte offset of the start of every line of a file.
+
+    Lines are split on `\\n` only, matching rg's line numbers.
+    """
+
+    def __init__(self, offsets: array[int], size: int):
+        self.offsets = offsets
+        self.size = size
+
+    @classmethod
+    def build(cls, path: Path) -> LineIndex:
+        offsets = array('Q', [0])
+        position = 0
+        with path.open('rb') as fh:
+            while chunk := fh.read(_READ_CHUNK):
+                lengths = map(len, chunk.split(b'\n')[:-1])
+                # line i + 1 starts after i + 1 newlines and the bytes of lines 0..i
+                offsets.extend(map(add, accumulate(lengths), count(position + 1)))
+                position += len(chunk)
+        return cls(offsets, position)
+
+    @classmethod
+    def load(cls, sidecar: Path, st: stat_result) -> LineIndex | None:
+        """Read a persisted index, unless it was built for another version of the file."""
+        try:
+            with sidecar.open('rb') as fh:
+                header = fh.read(_SIDECAR_HEADER.size)
+                if len(header) < _SIDECAR_HEADER.size:
+                    return None
+                magic, size, mtime_ns = _SIDECAR_HEADER.unpack(header)
+                if (magic, size, mtime_ns) != (_SIDECAR_MAGIC, st.st_size, st.st_mtime_ns):
+                    return None
+                data = fh.read()
+        except OSError:
+            return None
+        offsets = array('Q')
+        # a truncated sidecar does not hold whole offsets
+        if len(data) % offsets.itemsize:
+            return None
+        offsets.frombytes(data)
+        if not offsets or offsets[0] != 0:
+            return None
+        return cls(offsets, size)
+
+    def save(self, sidecar: Path, st: stat_result) -> None:
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        tmp = sidecar.with_name(f'{sidecar.name}.{os.getpid()}.tmp')
+        with tmp.open('wb') as fh:
+            fh.write(_SIDECAR_HEADER.pack(_SIDECAR_MAGIC, st.st_size, st.st_mtime_ns))
+            self.offsets.tofile(fh)
+        os.replace(tmp, sidecar)
+
+    def __len__(self) -> int:
+        # a trailing newline does not start another line
+        return len(self.offsets) - (self.offsets[-1] == self.size)
+
+    def span(self, first: int, last: int) -> tuple[int, int]:
+        """Byte range covering lines first..last-1."""
+        end = self.offsets[last] if last < len(self.offsets) else self.size
+        return self.offsets[first], end
+
+
+_indexes: OrderedDict[tuple[Path, int, int], LineIndex] = OrderedDict()
+
+
+def line_index(path: Path, sidecar: Path | None = None) -> LineIndex:
+    """Line index of path, built on first use and persisted to `sidecar` if given.
+
+    Indexes are keyed by size and mtime, so a changed file is indexed again.
+    """
+    st = path.stat()
+    key = (path, st.st_size, st.st_mtime_ns)
+    index = _indexes.get(key)
+    if index is not None:
+        _indexes.move_to_end(key)
+        return index
+
+    persist = sidecar is not None and st.st_size >= PERSIST_MIN_BYTES
+    if persist:
+        index = LineIndex.load(sidecar, st)
+    if index is None:
+        index = LineIndex.build(path)
+        if persist:
+            with suppress(OSError):
+                index.save(sidecar, st)
+    _indexes[key] = index
+    if len(_indexes) > _INDEX_CACHE_SIZE:
+        _indexes.popitem(last=False)
+    return index
+
+
+def read_lines(path: Path, index: LineIndex, first: int, last: int) -> list[str]:
+    start, end = index.span(first, last)
+    if start >= end:
+        return []
+    with path.open('rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+    return _split(data.decode('utf-8', errors='replace'))
+
+
+def _split(text: str) -> list[str]:
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    # form feeds between PDF pages start the next page's first line
+    return [line.removesuffix('\r').lstrip('\f') for line in lines]
+
+
+def line_window(
+    total: int,
+    line_number: int | None = None,
+    cursor: int | None = None,
+    direction: Direction = 'after',
+    limit: int | None = None,
+) -> tuple[int, int]:
+    """0-based [first, last) range of lines to show.
+
+    With a cursor (a 1-based line number) the window starts at it, or ends right
+    before it when paging backwards; otherwise it is centered on `line_number`.
+    """
+    limit = max(1, min(limit or PREVIEW_LIMIT, MAX_PREVIEW_LIMIT))
+    if cursor is not None:
+        if direction == 'before':
+            last = max(0, min(cursor - 1, total))
+            return max(0, last - limit), last
+        first = max(0, min(cursor - 1, total))
+        return first, min(total, first + limit)
+    if line_number:
+        first = max(0, min(line_number - 1 - limit // 2, total - limit))
+        return first, min(total, first + limit)
+    return 0, min(total, limit)
+
+
+def _uncached_pdf(path: Path, text_cache: TextCache | None) -> bool:
+    return (
+        text_cache is not None
+        and path.suffix.lower() == '.pdf'
+        and text_cache.fresh_path(path) is None
+    )
+
+
+def _page_lines(text: str) -> list[str]:
+    """Lines of whole pages of pdftotext output, which closes every page with a form feed."""
+    # feeds after the last line, e.g. of trailing blank pages, start no line of their own
+    return _split(text.rstrip('\f'))
+
+
+def _pages_plan(
+    pages: PageMap,
+    line_number: int | None,
+    cursor: int | None,
+    direction: Direction,
+    limit: int | None,
+) -> tuple[int, int, int, int]:
+    """[first, last) lines of a window and the first and last page holding them."""
+    first, last = line_window(pages.total_lines, line_number, cursor, direction, limit)
+    return first, last, pages.page_of(first + 1), pages.page_of(last)
+
+
+def _pages_slice(text: str, pages: PageMap, first: int, last: int) -> list[str]:
+    skip = first + 1 - pages.starts[pages.page_of(first + 1) - 1]
+    return _page_lines(text)[skip : skip + last - first]
+
+
+def _pages_window(
+    path: Path,
+    text_cache: TextCache | None,
+    line_number: int | None,
+    cursor: int | None,
+    direction: Direction,
+    limit: int | None,
+) -> tuple[list[str], int, int] | None:
+    """Window of a PDF whose text is not cached, converting only the pages it spans."""
+    if not _uncached_pdf(path, text_cache):
+        return None
+    pages = text_cache.page_map(path)
+    if pages is None:
+        return None
+    first, last, first_page, last_page = _pages_plan(pages, line_number, cursor, direction, limit)
+    if first >= last:
+        return [], first + 1, pages.total_lines
+    text = extract_pages(path, first_page, last_page)
+    if text is None:
+        return None
+    return _pages_slice(text, pages, first, last), first + 1, pages.total_lines
+
+
+async def pages_window_async(
+    path: Path,
+    text_cache: TextCache | None,
+    line_number: int | None = None,
+    cursor: int | None = None,
+    direction: Direction = 'after',
+    limit: int | None = None,
+) -> tuple[list[str], int, int] | None:
+    """`preview_window` of a PDF whose text is not cached, for event loops.
+
+    Only the pages the window spans are converted, with `extract_pages_async` under
+    the converter limits and timeout. None when the PDF has to be previewed another
+    way, e.g. before a first full conversion recorded its page map.
+    """
+    if not await asyncio.to_thread(_uncached_pdf, path, text_cache):
+        return None
+    pages = await asyncio.to_thread(text_cache.page_map, path)
+    if pages is None:
+        return None
+    first, last, first_page, last_page = _pages_plan(pages, line_number, cursor, direction, limit)
+    if first >= last:
+        return [], first + 1, pages.total_lines
+    text = await extract_pages_async(path, first_page, last_page)
+    if text is None:
+        return None
+    return _pages_slice(text, pages, first, last), first + 1, pages.total_lines
+
+
+def preview_window(
+    path: Path,
+    text_cache: TextCache | None = None,
+    line_number: int | None = None,
+    cursor: int | None = None,
+    direction: Direction = 'after',
+    limit: int | None = None,
+) -> tuple[list[str], int, int]:
+    """A window of a file's preview text: (lines, 1-based number of the first, total lines).
+
+    Plain files and cached extractions are read through a line index and mmap, so
+    only the requested lines are decoded. PDFs evicted from the text cache are
+    converted page by page through their page map.
+    """
+    window = _pages_window(path, text_cache, line_number, cursor, direction, limit)
+    if window is not None:
+        return window
+
+    source: Path | None = path
+    lines: list[str] | None = None
+    if path.suffix.lower() in EXTRACTABLE_SUFFIXES:
+        try:
+            source = text_cache.ensure(path) if text_cache else None
+            if source is None:
+                text = extract_text(path)
+                if text is not None:
+                    lines = _split(text)
+                else:
+                    source = path
+        except Exception:  # noqa: BLE001
+            source, lines = path, None
+
+    if source is not None:
+        try:
+            index = line_index(source, text_cache.index_path(source) if text_cache else None)
+            first, last = line_window(len(index), line_number, cursor, direction, limit)
+            return read_lines(source, index, first, last), first + 1, len(index)
+        except OSError:
+            if source == path:
+                raise
+            # the cached text was evicted in between, convert again
+            lines = _split(extract_text(path) or '')
+
+    assert lines is not None
+    first, last = line_window(len(lines), line_number, cursor, direction, limit)
+    return lines[first:last], first + 1, len(lines)
+
+
+__all__ = [
+    'MAX_PREVIEW_LIMIT',
+    'PERSIST_MIN_BYTES',
+    'PREVIEW_LIMIT',
+    'LineIndex',
+    'line_index',
+    'line_window',
+    'pages_window_async',
+    'preview_window',
+    'read_lines',
+]
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Hashable, Sequence
+from contextlib import suppress
+from typing import Protocol
+
+from core.metrics import Counter, Gauge
+from core.schemas import StreamEvent
+
+RESULT_CACHE_ENTRIES = 256
+RESULT_CACHE_MATCHES = 100_000
+# only used while no watcher publishes a corpus generation
+RESULT_CACHE_TTL = 60.0
+
+CACHE_LOOKUPS = Counter('baheth_result_cache_lookups_total', 'Result cache lookups by outcome.')
+CACHE_ENTRIES = Gauge('baheth_result_cache_entries', 'Searches held in the result cache.')
+FLIGHTS_STARTED = Counter(
+    'baheth_search_flights_total', 'Searches by whether they started a process or joined one.'
+)
+FLIGHTS_ACTIVE = Gauge('baheth_search_flights_active', 'Search processes currently running.')
+
+
+class ResultCache:
+    """Bounded in-memory LRU of finished searches, keyed by the exact tool command.
+
+    Entries are tagged with the corpus generation they were recorded under and only
+    served for that same generation; without a generation they expire after `ttl`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_ENTRIES,
+        max_matches: int = RESULT_CACHE_MATCHES,
+        ttl: float = RESULT_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.max_matches = max_matches
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[int | None, float, tuple[StreamEvent, ...]]] = (
+            OrderedDict()
+        )
+        self._size = 0
+
+    def get(self, key: Hashable, generation: int | None = None) -> tuple[StreamEvent, ...] | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            recorded_under, created, events = entry
+            if recorded_under == generation and (
+                generation is not None or time.monotonic() - created < self.ttl
+            ):
+                self._entries.move_to_end(key)
+                CACHE_LOOKUPS.inc(outcome='hit')
+                return events
+            self._drop(key)
+        CACHE_LOOKUPS.inc(outcome='miss')
+        return None
+
+    def put(
+        self, key: Hashable, events: Sequence[StreamEvent], generation: int | None = None
+    ) -> None:
+        if len(events) > self.max_matches:
+            return
+        self._drop(key)
+        self._entries[key] = (generation, time.monotonic(), tuple(events))
+        self._size += len(events)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._size > self.max_matches
+        ):
+            self._drop(next(iter(self._entries)))
+        CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+        CACHE_ENTRIES.set(0)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[2])
+            CACHE_ENTRIES.set(len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SearchRunner(Protocol):
+    def process(self) -> AsyncIterator[StreamEvent]: ...
+
+    async def cancel(self) -> None: ...
+
+
+class _Flight:
+    def __init__(self, runner: SearchRunner):
+        self.runner = runner
+        self.loop = asyncio.get_running_loop()
+        self.events: list[StreamEvent] = []
+        self.done = False
+        self.subscribers = 0
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump())
+
+    async def _pump(self) -> None:
+        FLIGHTS_ACTIVE.inc()
+        try:
+            async for event in self.runner.process():
+                self.events.append(event)
+                self.notify()
+        finally:
+            self.done = True
+            self.notify()
+            FLIGHTS_ACTIVE.dec()
+
+    def notify(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def replay(self, cancelled: Callable[[], bool]) -> AsyncGenerator[StreamEvent]:
+        index = 0
+        while not cancelled():
+            if index < len(self.events):
+                yield self.events[index]
+                index += 1
+            elif self.done:
+                return
+            else:
+                await self._wakeup.wait()
+
+    async def stop(self) -> None:
+        self.task.cancel()
+        await self.runner.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+
+
+class SearchFlights:
+    """Share one running search between concurrent subscribers of the same key.
+
+    Subscribers joining late first get every event emitted so far. The underlying
+    process is cancelled once its last subscriber leaves.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, _Flight] = {}
+
+    async def subscribe(
+        self,
+        key: Hashable,
+        start: Callable[[], SearchRunner],
+        cancelled: Callable[[], bool] = lambda: False,
+    ) -> AsyncGenerator[StreamEvent]:
+        flight = self._flights.get(key)
+        # asyncio primitives are bound to the loop that created them
+        if flight is None or flight.done or flight.loop is not asyncio.get_running_loop():
+            flight = self._flights[key] = _Flight(start())
+            FLIGHTS_STARTED.inc(outcome='started')
+        else:
+            FLIGHTS_STARTED.inc(outcome='joined')
+
+        flight.subscribers += 1
+        try:
+            async for event in flight.replay(cancelled):
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if not flight.subscribers:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                if not flight.done:
+                    await flight.stop()
+
+    def wake(self, key: Hashable) -> None:
+        """Let subscribers of key re-check their cancellation flag."""
+        if (flight := self._flights.get(key)) is not None:
+            flight.notify()
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+__all__ = [
+    'RESULT_CACHE_ENTRIES',
+    'RESULT_CACHE_MATCHES',
+    'RESULT_CACHE_TTL',
+    'ResultCache',
+    'SearchFlights',
+    'SearchRunner',
+]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from base64 import b64decode
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import orjson
+
+# stdout is read in chunks this large and split into lines in one go
+RG_READ_CHUNK = 256 << 10
+
+# rg writes every event as `{"type":"<kind>","data":...}`, type first
+_PREFIX = b'{"type":"'
+_TYPE_AT = len(_PREFIX)
+# the first three letters tell rg's event types apart
+_KINDS = {kind[:3].encode(): kind for kind in ('begin', 'match', 'context', 'end', 'summary')}
+
+logger = logging.getLogger(__name__)
+
+
+async def read_lines(
+    stream: asyncio.StreamReader, chunk_size: int = RG_READ_CHUNK
+) -> AsyncGenerator[list[bytes]]:
+    """Complete lines of a stream, a chunk's worth at a time.
+
+    Unlike iterating the reader, lines are not limited to the reader's buffer
+    size, and there is one await per chunk rather than per line.
+    """
+    partial: list[bytes] = []
+    while chunk := await stream.read(chunk_size):
+        last = chunk.rfind(b'\n')
+        if last == -1:
+            partial.append(chunk)
+            continue
+        partial.append(chunk[:last])
+        lines = b''.join(partial).split(b'\n')
+        partial = [chunk[last + 1 :]]
+        yield lines
+    if tail := b''.join(partial):
+        yield [tail]
+
+
+def parse_event(line: bytes) -> tuple[str, dict[str, Any]] | None:
+    """Type and data of an rg JSON line; `end` events come back without data."""
+    kind = _KINDS.get(line[_TYPE_AT : _TYPE_AT + 3]) if line.startswith(_PREFIX) else None
+    # rg sends one per file searched, with stats the stream never looks at
+    if kind == 'end':
+        return kind, {}
+    try:
+        try:
+            result = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # tolerate occasional invalid utf-8 in tool output (e.g., truncated multibyte)
+            result = orjson.loads(line.decode('utf-8', errors='replace'))
+    except orjson.JSONDecodeError as exc:
+        logger.error('JSON decode error: %s', exc)
+        return None
+    if not isinstance(result, dict):
+        return None
+    return kind or result.get('type') or '', result.get('data') or {}
+
+
+def text_of(field: dict[str, Any] | None) -> str:
+    """The text of an rg `{"text": ...}` or base64 `{"bytes": ...}` field."""
+    if not field:
+        return ''
+    if 'text' in field:
+        return field['text']
+    return b64decode(field.get('bytes', '')).decode('utf-8', errors='replace')
+
+
+def match_lines(data: dict[str, Any]) -> tuple[str, list[dict[str, Any]]]:
+    """Lines and submatches of a match event as text.
+
+    Lines that are not valid UTF-8 arrive base64-encoded; they are decoded with
+    replacement characters and the submatch byte offsets are moved to match.
+    """
+    lines = data.get('lines') or {}
+    submatches = data.get('submatches') or []
+    if 'text' in lines:
+        for item in submatches:
+            match = item.get('match') or {}
+            if 'text' not in match:
+                # a submatch may end inside a multibyte character
+                item['match'] = {'text': text_of(match)}
+        return lines['text'], submatches
+
+    raw = b64decode(lines.get('bytes', ''))
+    text = raw.decode('utf-8', errors='replace')
+    moved = []
+    for item in submatches:
+        start, end = item.get('start', 0), item.get('end', 0)
+        moved_start = len(raw[:start].decode('utf-8', errors='replace').encode())
+        matched = raw[start:end].decode('utf-8', errors='replace')
+        moved.append(
+            {
+                'match': {'text': matched},
+                'start': moved_start,
+                'end': moved_start + len(matched.encode()),
+            }
+        )
+    return text, moved
+
+
+__all__ = [
+    'RG_READ_CHUNK',
+    'match_lines',
+    'parse_event',
+    'read_lines',
+    'text_of',
+]
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
@@ -30,12 +31,74 @@ class SearchError(BaseModel):
     request_id: str | None = None
 
 
+class SearchStats(BaseModel):
+    """Where a search spent its time; durations are counted from when it got a slot."""
+
+    engine: str = ''
+    mode: str | None = None
+    queued_seconds: float = 0.0
+    spawn_seconds: float | None = None
+    first_match_seconds: float | None = None
+    elapsed_seconds: float = 0.0
+    matches: int = 0
+    # search output read from the process
+    bytes_streamed: int = 0
+    # as reported by the search engine
+    files_searched: int | None = None
+    bytes_searched: int | None = None
+    engine_seconds: float | None = None
+    # replayed from the result cache, the timings are those of the original run
+    cached: bool = False
+
+
 class SearchComplete(BaseModel):
     complete: bool = True
     request_id: str | None = None
+    stats: SearchStats | None = None
+
+
+class SearchQueued(BaseModel):
+    queued: bool = True
+    position: int
+    request_id: str | None = None
+
+
+SearchEvent = SearchMatch | SearchError | SearchComplete | SearchQueued
 
 
-SearchEvent = SearchMatch | SearchError | SearchComplete
+@dataclass(slots=True)
+class MatchRecord:
+    """Internal form of `SearchMatch` passed from the rg parser to the transports.
+
+    Building and serializing a plain slotted dataclass is several times cheaper than
+    a Pydantic model; it is only converted with `to_model` where an API needs one.
+    """
+
+    path: str
+    line_number: int
+    lines: str
+    submatches: list[dict[str, Any]] = field(default_factory=list)
+    context_before: str = ''
+    context_after: str = ''
+    highlighted_text: str = ''
+    mtime: float | None = None
+    request_id: str | None = None
+
+    def to_model(self, request_id: str | None = None) -> SearchMatch:
+        return SearchMatch.model_construct(
+            path=self.path,
+            line_number=self.line_number,
+            lines=self.lines,
+            submatches=self.submatches,
+            context_before=self.context_before,
+            context_after=self.context_after,
+            highlighted_text=self.highlighted_text,
+            mtime=self.mtime,
+            request_id=request_id if request_id is not None else self.request_id,
+        )
+
+
+StreamEvent = MatchRecord | SearchError | SearchComplete | SearchQueued
 
 
 class DirectoriesRequest(BaseModel):
@@ -48,25 +111,60 @@ class DirectoriesResponse(BaseModel):
     directories: list[str]
 
 
+class DirectoryChildrenRequest(BaseModel):
+    parent: str = '.'
+    # name of the last child of the previous page
+    cursor: str | None = None
+    limit: int = 200
+
+
+class DirectoryChild(BaseModel):
+    path: str
+    name: str
+    # subdirectories of this one, so clients know whether it expands
+    children: int = 0
+
+
+class DirectoryChildrenResponse(BaseModel):
+    parent: str
+    children: list[DirectoryChild]
+    next_cursor: str | None = None
+
+
 class FileRequest(BaseModel):
     path: str
     line_number: int | None = None
+    # 1-based line to page from; without cursor and limit the whole file is returned
+    cursor: int | None = None
+    direction: Literal['after', 'before'] = 'after'
+    limit: int | None = None
 
 
 class FileResponse(BaseModel):
     file: str
     lines: list[str]
     line_number: int | None = None
+    start_line: int = 1
+    total_lines: int | None = None
+    prev_cursor: int | None = None
+    next_cursor: int | None = None
 
 
 __all__ = [
     'DirectoriesRequest',
     'DirectoriesResponse',
+    'DirectoryChild',
+    'DirectoryChildrenRequest',
+    'DirectoryChildrenResponse',
     'FileRequest',
     'FileResponse',
+    'MatchRecord',
     'SearchComplete',
     'SearchError',
     'SearchEvent',
     'SearchMatch',
+    'SearchQueued',
     'SearchRequest',
+    'SearchStats',
+    'StreamEvent',
 ]
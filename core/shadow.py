@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from contextlib import AbstractContextManager, suppress
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+
+from core import walk_files
+from core.extract import EXTRACTABLE_SUFFIXES, TextCache, extract_text
+from core.native import mark_ranges
+from core.patterns import ARABIC_RANGES
+from core.store import get_meta, open_store, relative_key, set_meta
+
+# shadow texts are stored as `<relative path><SHADOW_SUFFIX>`, their offset maps
+# as `<relative path><OFFSETS_SUFFIX>`
+SHADOW_SUFFIX = '.shadow'
+OFFSETS_SUFFIX = '.offsets'
+
+_BATCH_FILES = 200
+_READ_CHUNK = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ShadowReport:
+    total: int = 0
+    updated: int = 0
+    removed: int = 0
+    elapsed: float = 0.0
+
+
+@cache
+def _stripped() -> re.Pattern[str]:
+    # what `[\p{M}\x{0640}]*` lets the `ignore` pattern skip after an Arabic letter;
+    # marks after any other character stay, as the pattern does not skip them there
+    letters = ''.join(
+        f'\\u{start:04x}-\\u{stop:04x}' for start, stop in _letter_ranges(ARABIC_RANGES)
+    )
+    return re.compile(f'(?<=[{letters}])[{mark_ranges()}\\u0640]+')
+
+
+def _letter_ranges(ranges: Iterable[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """`ranges` without the marks and tatweel, which cannot precede a stripped run."""
+    for start, stop in ranges:
+        run: int | None = None
+        for cp in range(start, stop + 2):
+            keep = cp <= stop and cp != 0x0640 and unicodedata.category(chr(cp))[0] != 'M'
+            if keep and run is None:
+                run = cp
+            elif not keep and run is not None:
+                yield run, cp - 1
+                run = None
+
+
+class OffsetMap:
+    """Where bytes were stripped from a shadow text, to map its offsets back.
+
+    `positions[i]` is the shadow offset a run of stripped bytes stood in front
+    of, `removed[i]` the number of bytes stripped up to and including that run.
+    """
+
+    def __init__(self, positions: array[int] | None = None, removed: array[int] | None = None):
+        self.positions = array('Q') if positions is None else positions
+        self.removed = array('Q') if removed is None else removed
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def original(self, offset: int, trailing: bool = True) -> int:
+        """Offset in the original text of an offset in the shadow.
+
+        Marks stripped right in front of `offset` belong to the character before
+        it and are skipped; with `trailing=False` they are kept, for line starts.
+        """
+        index = (bisect_right if trailing else bisect_left)(self.positions, offset)
+        return offset + (self.removed[index - 1] if index else 0)
+
+    def to_bytes(self) -> bytes:
+        return self.positions.tobytes() + self.removed.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> OffsetMap:
+        values = array('Q')
+        values.frombytes(data)
+        half = len(values) // 2
+        return cls(values[:half], values[half:])
+
+
+def fold(data: bytes, offsets: OffsetMap, start: int = 0) -> bytes:
+    """Strip marks and tatweel from UTF-8 text, recording where in `offsets`.
+
+    `start` is the shadow offset `data` lands at when a text is folded chunk by
+    chunk. Bytes that are not valid UTF-8 are kept as they are, so every offset
+    outside the stripped runs is preserved.
+    """
+    text = data.decode('utf-8', errors='surrogateescape')
+    parts: list[bytes] = []
+    cursor = 0
+    position = start
+    removed = offsets.removed[-1] if offsets.removed else 0
+    for run in _stripped().finditer(text):
+        kept = text[cursor : run.start()].encode('utf-8', errors='surrogateescape')
+        parts.append(kept)
+        position += len(kept)
+        removed += len(run[0].encode('utf-8'))
+        offsets.positions.append(position)
+        offsets.removed.append(removed)
+        cursor = run.end()
+    if not cursor:
+        return data
+    parts.append(text[cursor:].encode('utf-8', errors='surrogateescape'))
+    return b''.join(parts)
+
+
+def _lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Re-cut chunks at line ends; stripped runs never span one, so each folds on its own."""
+    tail = b''
+    for chunk in chunks:
+        chunk = tail + chunk
+        cut = chunk.rfind(b'\n') + 1
+        tail = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+    if tail:
+        yield tail
+
+
+def _read_chunks(path: Path) -> Iterator[bytes]:
+    with path.open('rb') as fh:
+        while chunk := fh.read(_READ_CHUNK):
+            yield chunk
+
+
+class ShadowCorpus:
+    """Copies of the searchable text with every mark and tatweel stripped.
+
+    `ignore` searches run over it as plain rg regexes instead of wrapping each
+    letter for PCRE. Texts mirror the data directory under `text_dir` like
+    `TextCache` does: plain files are folded as they are, documents from their
+    extracted text. Each keeps an `OffsetMap` so hits are shown and highlighted
+    in the original text. Only consulted once a build completed.
+    """
+
+    def __init__(self, root: Path, data_dir: Path, text_cache: TextCache | None = None):
+        self.root = root.absolute()
+        self.data_dir = data_dir
+        self.text_cache = text_cache
+        self.text_dir = self.root / 'text'
+        self.offsets_dir = self.root / 'offsets'
+        self._db_path = self.root / 'shadow.sqlite3'
+
+    def _connect(self) -> AbstractContextManager[sqlite3.Connection]:
+        return open_store(self._db_path, _SCHEMA)
+
+    def is_complete(self) -> bool:
+        with self._connect() as db:
+            return get_meta(db, 'complete') is not None
+
+    def mark_complete(self, complete: bool = True) -> None:
+        with self._connect() as db:
+            set_meta(db, 'complete', '1' if complete else None)
+
+    def files(self) -> dict[str, tuple[int, int]]:
+        with self._connect() as db:
+            rows = db.execute('SELECT path, size, mtime_ns FROM files').fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def shadow_path(self, key: str) -> Path:
+        return self.text_dir / f'{key}{SHADOW_SUFFIX}'
+
+    def offsets_path(self, key: str) -> Path:
+        return self.offsets_dir / f'{key}{OFFSETS_SUFFIX}'
+
+    def glob(self, pattern: str) -> str:
+        """rg glob selecting the shadows of files matching a file name pattern."""
+        return f'**/{pattern}{SHADOW_SUFFIX}'
+
+    def original_path(self, reported: str) -> str | None:
+        """Map a path printed by ripgrep for a shadow back to its source file."""
+        prefix = f'{self.text_dir}{os.sep}'
+        if not reported.startswith(prefix) or not reported.endswith(SHADOW_SUFFIX):
+            return None
+        return reported[len(prefix) : -len(SHADOW_SUFFIX)].replace(os.sep, '/')
+
+    def origin(self, key: str) -> tuple[Path, OffsetMap] | None:
+        """The text a shadow was folded from with its offset map.
+
+        None when that text is gone, e.g. a document's extraction was evicted.
+        """
+        key = key.removeprefix('./')
+        if Path(key).suffix.lower() in EXTRACTABLE_SUFFIXES:
+            if self.text_cache is None:
+                return None
+            source = self.text_cache.text_path(key)
+        else:
+            source = self.data_dir / key
+        if not source.is_file():
+            return None
+        try:
+            return source, OffsetMap.from_bytes(self.offsets_path(key).read_bytes())
+        except OSError:
+            return None
+
+    def update(self, paths: Iterable[Path]) -> int:
+        rows: list[tuple[str, int, int]] = []
+        missing: list[Path] = []
+        for path in paths:
+            key = relative_key(path, self.data_dir)
+            if key is None:
+                continue
+            try:
+                st = path.stat()
+                self._write(key, self._source(path))
+            except OSError:
+                missing.append(path)
+                continue
+            rows.append((key, st.st_size, st.st_mtime_ns))
+        with self._connect() as db:
+            db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', rows)
+        if missing:
+            self.remove(missing)
+        return len(rows)
+
+    def _source(self, path: Path) -> Iterator[bytes] | None:
+        if path.suffix.lower() not in EXTRACTABLE_SUFFIXES:
+            return _read_chunks(path)
+        try:
+            text = self.text_cache.load(path) if self.text_cache else extract_text(path)
+        except Exception as exc:  # noqa: BLE001
+            logger.error('Extraction failed for %s: %s', path, exc)
+            text = None
+        return iter([text.encode('utf-8')]) if text else None
+
+    def _write(self, key: str, chunks: Iterator[bytes] | None) -> None:
+        target = self.shadow_path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+        offsets = OffsetMap()
+        binary = chunks is None
+        try:
+            with tmp.open('wb') as out:
+                written = 0
+                for lines in _lines(chunks or ()):
+                    # same heuristic rg uses to skip binary files
+                    if b'\0' in lines:
+                        binary = True
+                        break
+                    written += out.write(fold(lines, offsets, written))
+            if binary:
+                self._unlink(key)
+                return
+            os.replace(tmp, target)
+        finally:
+            with suppress(OSError):
+                tmp.unlink()
+
+        offsets_path = self.offsets_path(key)
+        offsets_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = offsets_path.with_name(f'{offsets_path.name}.{os.getpid()}.tmp')
+        tmp.write_bytes(offsets.to_bytes())
+        os.replace(tmp, offsets_path)
+
+    def remove(self, paths: Iterable[Path]) -> None:
+        keys = [key for path in paths if (key := relative_key(path, self.data_dir)) is not None]
+        with self._connect() as db:
+            db.executemany('DELETE FROM files WHERE path = ?', [(key,) for key in keys])
+        for key in keys:
+            self._unlink(key)
+
+    def _unlink(self, key: str) -> None:
+        for stale in (self.shadow_path(key), self.offsets_path(key)):
+            with suppress(OSError):
+                stale.unlink()
+
+    def build(self) -> ShadowReport:
+        """Bring the shadow in line with the data directory, folding only changed files."""
+        started = time.monotonic()
+        report = ShadowReport()
+        known = self.files()
+        seen: set[str] = set()
+        pending: list[Path] = []
+
+        for path in walk_files(self.data_dir):
+            key = relative_key(path, self.data_dir)
+            if key is None:
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen.add(key)
+            report.total += 1
+            if known.get(key) != (st.st_size, st.st_mtime_ns):
+                pending.append(path)
+
+        stale = known.keys() - seen
+        if pending or stale:
+            self.mark_complete(False)
+        self.remove(self.data_dir / key for key in stale)
+        report.removed = len(stale)
+
+        for start in range(0, len(pending), _BATCH_FILES):
+            report.updated += self.update(pending[start : start + _BATCH_FILES])
+            logger.info('folded %d/%d files', report.updated, len(pending))
+
+        self.mark_complete()
+        report.elapsed = time.monotonic() - started
+        return report
+
+
+__all__ = [
+    'OFFSETS_SUFFIX',
+    'SHADOW_SUFFIX',
+    'OffsetMap',
+    'ShadowCorpus',
+    'ShadowReport',
+    'fold',
+]
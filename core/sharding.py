@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import suppress
+from pathlib import Path
+
+from core.schemas import MatchRecord, SearchComplete, SearchError, StreamEvent
+
+# subtree sizes are walked once per directory and reused like directory listings
+SHARD_PLAN_TTL = 60
+# beyond this many search roots a single process is cheaper than a long argv
+MAX_SHARD_ROOTS = 5000
+# a root is split further while it holds more than this share of one shard's bytes
+_SPLIT_RATIO = 0.5
+
+_Tree = dict[str, tuple[int, list[str], list[tuple[str, int]]]]
+_tree_cache: dict[tuple[Path, str], tuple[float, _Tree, int | None]] = {}
+
+
+def _join(parent: str, name: str) -> str:
+    return name if parent == '.' else f'{parent}/{name}'
+
+
+def _walk_tree(data_dir: Path, target_dir: str) -> _Tree:
+    """Per directory under target_dir: (subtree bytes, child dirs, loose files with sizes)."""
+    tree: _Tree = {}
+    order: list[str] = []
+    visited: set[tuple[int, int]] = set()
+    for current, dirnames, filenames in os.walk(data_dir / target_dir, followlinks=True):
+        try:
+            st = os.stat(current)
+        except OSError:
+            dirnames[:] = []
+            continue
+        if (st.st_dev, st.st_ino) in visited:
+            dirnames[:] = []
+            continue
+        visited.add((st.st_dev, st.st_ino))
+
+        relative = Path(current).relative_to(data_dir).as_posix()
+        # hidden entries are skipped by rg as well
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        files: list[tuple[str, int]] = []
+        for name in sorted(filenames):
+            if not name.startswith('.'):
+                with suppress(OSError):
+                    size = os.stat(os.path.join(current, name)).st_size
+                    files.append((_join(relative, name), size))
+        children = [_join(relative, d) for d in dirnames]
+        tree[relative] = (sum(size for _, size in files), children, files)
+        order.append(relative)
+
+    # children are walked after their parents, so sum subtrees in reverse
+    for relative in reversed(order):
+        own, children, files = tree[relative]
+        tree[relative] = (own + sum(tree[c][0] for c in children if c in tree), children, files)
+    return tree
+
+
+def _tree(data_dir: Path, target_dir: str, generation: int | None) -> _Tree:
+    key = (data_dir.resolve(), target_dir)
+    now = time.time()
+    cached = _tree_cache.get(key)
+    if cached and (
+        cached[2] == generation if generation is not None else now - cached[0] < SHARD_PLAN_TTL
+    ):
+        return cached[1]
+    tree = _walk_tree(data_dir, target_dir)
+    _tree_cache[key] = (now, tree, generation)
+    return tree
+
+
+def tree_files(
+    data_dir: Path, target_dir: str, generation: int | None = None
+) -> list[tuple[str, int]]:
+    """Every non-hidden file under target_dir with its size, from the cached walk."""
+    tree = _tree(data_dir, Path(target_dir).as_posix(), generation)
+    return [item for _, _, files in tree.values() for item in files]
+
+
+def plan_shards(
+    data_dir: Path,
+    target_dir: str,
+    shards: int,
+    include: Callable[[str], bool],
+    generation: int | None = None,
+) -> list[list[str]] | None:
+    """Split target_dir into at most `shards` groups of search roots of similar size.
+
+    Roots are subdirectories, split further while one outweighs a shard, plus loose
+    files accepted by `include` (ripgrep ignores `-g` globs for files named on its
+    command line). Returns None when the directory does not split usefully.
+    """
+    start = Path(target_dir).as_posix()
+    tree = _tree(data_dir, start, generation) if shards > 1 else {}
+    if start not in tree or not tree[start][0]:
+        return None
+    limit = tree[start][0] / shards * _SPLIT_RATIO
+
+    roots: list[tuple[int, str]] = []
+    pending = [start]
+    while pending:
+        directory = pending.pop()
+        size, children, files = tree[directory]
+        if directory != start and (size <= limit or not children):
+            roots.append((size, directory))
+            continue
+        pending.extend(child for child in children if child in tree)
+        roots.extend((size, name) for name, size in files if include(name))
+
+    if not 2 <= len(roots) <= MAX_SHARD_ROOTS:
+        return None
+    # longest processing time first: the heaviest root goes to the lightest shard
+    bins: list[tuple[int, list[str]]] = [(0, []) for _ in range(min(shards, len(roots)))]
+    for size, root in sorted(roots, key=lambda item: (-item[0], item[1])):
+        lightest = min(range(len(bins)), key=lambda i: bins[i][0])
+        weight, members = bins[lightest]
+        # rg prints paths the way roots are given, keep the `./` of a whole-corpus search
+        members.append(f'./{root}' if start == '.' else root)
+        bins[lightest] = (weight + size, members)
+    return [sorted(members) for _, members in bins if members]
+
+
+def invalidate_shard_plans() -> None:
+    _tree_cache.clear()
+
+
+async def merge_shards(
+    streams: list[AsyncIterator[StreamEvent]],
+) -> AsyncGenerator[StreamEvent]:
+    """Merge the event streams of concurrent shard searches into one.
+
+    A file's matches are never interleaved with another file's: once a shard
+    starts emitting a file it keeps the stream until it moves on to the next file.
+    One `SearchComplete` follows once every shard completed, and the first error
+    ends the merge.
+    """
+    arrived = asyncio.Event()
+    queues: list[deque[StreamEvent]] = [deque() for _ in streams]
+    finished = [False] * len(streams)
+
+    async def pump(index: int, stream: AsyncIterator[StreamEvent]) -> None:
+        try:
+            async for event in stream:
+                queues[index].append(event)
+                arrived.set()
+        finally:
+            finished[index] = True
+            arrived.set()
+
+    tasks = [asyncio.ensure_future(pump(i, s)) for i, s in enumerate(streams)]
+    owner: int | None = None
+    owner_path = ''
+    completed = 0
+    try:
+        while True:
+            if owner is not None:
+                queue = queues[owner]
+                while queue and isinstance(queue[0], MatchRecord) and queue[0].path == owner_path:
+                    yield queue.popleft()
+                if not queue and not finished[owner]:
+                    arrived.clear()
+                    await arrived.wait()
+                    continue
+                owner = None
+
+            ready = next((i for i, queue in enumerate(queues) if queue), None)
+            if ready is None:
+                if all(finished):
+                    break
+                arrived.clear()
+                await arrived.wait()
+                continue
+
+            event = queues[ready].popleft()
+            if isinstance(event, SearchComplete):
+                completed += 1
+                continue
+            yield event
+            if isinstance(event, SearchError):
+                return
+            if isinstance(event, MatchRecord):
+                owner, owner_path = ready, event.path
+
+        for task in tasks:
+            # surface errors raised by the shards themselves
+            await task
+        # a cancelled shard stops without completing, and so does the merged search
+        if completed == len(streams):
+            yield SearchComplete()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+__all__ = [
+    'MAX_SHARD_ROOTS',
+    'SHARD_PLAN_TTL',
+    'invalidate_shard_plans',
+    'merge_shards',
+    'plan_shards',
+    'tree_files',
+]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+_META_SCHEMA = """
+PRAGMA journal_mode=WAL;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_initialized: set[Path] = set()
+
+
+@contextmanager
+def open_store(db_path: Path, schema: str) -> Iterator[sqlite3.Connection]:
+    """Open a SQLite store shared by all workers, creating it on first use.
+
+    The connection is committed on success and always closed; stores are opened per
+    operation because web views run on arbitrary threads.
+    """
+    if db_path not in _initialized:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path, timeout=30)
+    try:
+        if db_path not in _initialized:
+            db.executescript(_META_SCHEMA + schema)
+            _initialized.add(db_path)
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def get_meta(db: sqlite3.Connection, key: str) -> str | None:
+    row = db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(db: sqlite3.Connection, key: str, value: str | None) -> None:
+    if value is None:
+        db.execute('DELETE FROM meta WHERE key = ?', (key,))
+    else:
+        db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+
+def relative_key(path: Path, data_dir: Path) -> str | None:
+    with suppress(ValueError):
+        return path.relative_to(data_dir).as_posix()
+    with suppress(ValueError, OSError):
+        return path.resolve().relative_to(data_dir.resolve()).as_posix()
+    return None
+
+
+__all__ = ['get_meta', 'open_store', 'relative_key', 'set_meta']
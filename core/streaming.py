@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterable, Iterable
+from contextlib import suppress
+
+import orjson
+
+from core.schemas import MatchRecord, StreamEvent
+
+BATCH_INTERVAL = 0.05
+BATCH_SIZE = 100
+
+
+async def batch_events(
+    events: AsyncIterable[StreamEvent],
+    interval: float = BATCH_INTERVAL,
+    size: int = BATCH_SIZE,
+) -> AsyncGenerator[list[StreamEvent]]:
+    """Group a search's events into batches of at most `size` matches.
+
+    A batch is flushed once it is `interval` seconds old or full. The first match
+    and every other kind of event (queued, error, complete) go out right away.
+    """
+    buffer: list[StreamEvent] = []
+    arrived = asyncio.Event()
+    urgent = asyncio.Event()
+    drained = asyncio.Event()
+    finished = False
+
+    async def pump() -> None:
+        nonlocal finished
+        try:
+            async for event in events:
+                buffer.append(event)
+                arrived.set()
+                if len(buffer) >= size or not isinstance(event, MatchRecord):
+                    urgent.set()
+                # keep backpressure on the search process when the client reads slowly
+                if len(buffer) >= size * 2:
+                    drained.clear()
+                    await drained.wait()
+        finally:
+            finished = True
+            arrived.set()
+            urgent.set()
+
+    task = asyncio.ensure_future(pump())
+    try:
+        # until the first match is out, nothing waits for a batch to fill
+        flush_now = True
+        while True:
+            if not buffer:
+                if finished:
+                    break
+                await arrived.wait()
+                continue
+            if not flush_now and not urgent.is_set():
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(urgent.wait(), interval)
+
+            batch = buffer[:size]
+            del buffer[:size]
+            flush_now = flush_now and not any(isinstance(e, MatchRecord) for e in batch)
+            if not buffer:
+                arrived.clear()
+            if (
+                not finished
+                and len(buffer) < size
+                and all(isinstance(event, MatchRecord) for event in buffer)
+            ):
+                urgent.clear()
+            drained.set()
+            yield batch
+        # surface errors raised by the source
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+def encode_events(events: Iterable[StreamEvent]) -> bytes:
+    """Frame events as server-sent events, one `data:` message per event."""
+    # orjson encodes match records natively and the rare Pydantic events via their field dicts
+    return b''.join(b'data: ' + orjson.dumps(event, default=vars) + b'\n\n' for event in events)
+
+
+__all__ = ['BATCH_INTERVAL', 'BATCH_SIZE', 'batch_events', 'encode_events']
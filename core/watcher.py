@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from contextlib import suppress
+from pathlib import Path
+
+from core import invalidate_directories, invalidate_metadata, walk_files
+from core.extract import EXTRACTABLE_SUFFIXES, TextCache
+from core.ngram import NgramIndex
+from core.shadow import ShadowCorpus
+from core.store import relative_key
+
+DEBOUNCE = 0.5
+MAX_DELAY = 5.0
+HEARTBEAT = 10.0
+POLL_INTERVAL = 30.0
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+_EVENT = struct.Struct('iIII')
+
+logger = logging.getLogger(__name__)
+
+
+class CorpusGeneration:
+    """File-backed counter bumped whenever the corpus changes.
+
+    Every web worker reads it to invalidate per-process caches. The watcher keeps the
+    file's mtime fresh, so a counter left behind by a dead watcher is ignored
+    and callers fall back to their TTLs.
+    """
+
+    def __init__(self, path: Path, stale_after: float = HEARTBEAT * 3):
+        self.path = path
+        self.stale_after = stale_after
+
+    def current(self) -> int | None:
+        try:
+            if time.time() - self.path.stat().st_mtime > self.stale_after:
+                return None
+        except OSError:
+            return None
+        return self._value()
+
+    def _value(self) -> int | None:
+        try:
+            text = self.path.read_text()
+        except OSError:
+            return None
+        with suppress(ValueError):
+            return int(text or 0)
+        return None
+
+    def bump(self) -> int:
+        value = (self._value() or 0) + 1
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        tmp.write_text(str(value))
+        os.replace(tmp, self.path)
+        return value
+
+    def heartbeat(self) -> None:
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            self.bump()
+
+
+class Watcher(ABC):
+    def __init__(self, root: Path):
+        self.root = root
+        self._stopped = threading.Event()
+
+    @abstractmethod
+    def changes(self) -> Iterator[set[Path]]:
+        """Yield batches of changed paths; empty batches mark idle heartbeats."""
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher(Watcher):
+    def __init__(self, root: Path):
+        super().__init__(root)
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._watches: dict[int, Path] = {}
+        self._add_tree(root)
+
+    def _add_tree(self, top: Path) -> None:
+        for directory in walk_files(top, include_dirs=True):
+            if not directory.is_dir():
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(
+                    errno, f'inotify_add_watch failed for {directory}: {os.strerror(errno)}'
+                )
+            self._watches[wd] = directory
+
+    def _drop_tree(self, top: Path) -> None:
+        for wd, directory in list(self._watches.items()):
+            if directory == top or top in directory.parents:
+                self._libc.inotify_rm_watch(self._fd, wd)
+                self._watches.pop(wd, None)
+
+    def changes(self) -> Iterator[set[Path]]:
+        pending: set[Path] = set()
+        first = 0.0
+        while True:
+            ready, _, _ = select.select(
+                [self._fd, self._wakeup_read], [], [], DEBOUNCE if pending else HEARTBEAT
+            )
+            if self._stopped.is_set():
+                return
+            if ready:
+                if not pending:
+                    first = time.monotonic()
+                pending |= self._read()
+                # keep collecting a burst, but never hold changes back for too long
+                if time.monotonic() - first < MAX_DELAY:
+                    continue
+            yield pending
+            pending = set()
+
+    def _read(self) -> set[Path]:
+        changed: set[Path] = set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size : offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, let the consumer reconcile the whole tree
+                changed.add(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name or name.startswith(b'.'):
+                continue
+
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    with suppress(OSError):
+                        self._add_tree(path)
+                elif mask & IN_MOVED_FROM:
+                    self._drop_tree(path)
+            changed.add(path)
+        return changed
+
+    def stop(self) -> None:
+        super().stop()
+        with suppress(OSError):
+            os.write(self._wakeup_write, b'\0')
+
+    def close(self) -> None:
+        for fd in (self._fd, self._wakeup_read, self._wakeup_write):
+            with suppress(OSError):
+                os.close(fd)
+
+
+class PollingWatcher(Watcher):
+    def __init__(self, root: Path, interval: float = POLL_INTERVAL):
+        super().__init__(root)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot: dict[Path, tuple[int, int]] = {}
+        for path in walk_files(self.root, include_dirs=True):
+            with suppress(OSError):
+                st = path.stat()
+                # directories only matter for listings, their own mtime is noise
+                snapshot[path] = (-1, 0) if path.is_dir() else (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def changes(self) -> Iterator[set[Path]]:
+        waited = 0.0
+        while True:
+            step = min(HEARTBEAT, self.interval - waited)
+            if self._stopped.wait(step):
+                return
+            waited += step
+            if waited < self.interval:
+                yield set()
+                continue
+            waited = 0.0
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            yield changed
+
+
+def create_watcher(root: Path, poll: bool = False, interval: float = POLL_INTERVAL) -> Watcher:
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as exc:
+            logger.warning('inotify unavailable (%s), falling back to polling', exc)
+    return PollingWatcher(root, interval)
+
+
+class CorpusUpdater:
+    """Apply watcher batches to the text cache, n-gram index, shadow corpus and listings."""
+
+    def __init__(
+        self,
+        data_dir: Path,
+        text_cache: TextCache | None = None,
+        ngram_index: NgramIndex | None = None,
+        generation: CorpusGeneration | None = None,
+        shadow: ShadowCorpus | None = None,
+    ):
+        self.data_dir = data_dir
+        self.text_cache = text_cache
+        self.ngram_index = ngram_index
+        self.generation = generation
+        self.shadow = shadow
+
+    def apply(self, paths: Iterable[Path]) -> None:
+        changed: set[Path] = set()
+        removed: set[str] = set()
+        # rescanned directories and the files found in them
+        rescanned: dict[str, set[str]] = {}
+        relevant = False
+        for path in paths:
+            key = relative_key(path, self.data_dir)
+            if key is None or any(part.startswith('.') for part in Path(key).parts):
+                continue
+            relevant = True
+            if path.is_dir():
+                # created, moved in or (after an overflow) the whole tree
+                found = [p for p in walk_files(path) if p.is_file()]
+                changed.update(found)
+                rescanned[key] = {relative_key(p, self.data_dir) or '' for p in found}
+            elif path.exists():
+                changed.add(path)
+            else:
+                removed.add(key)
+        if not relevant:
+            return
+
+        if rescanned:
+            known = self._known()
+            changed = {path for path in changed if not self._is_fresh(path, known)}
+            removed |= self._vanished(rescanned)
+        self._remove(removed)
+        self._update(changed)
+
+        invalidate_directories()
+        invalidate_metadata()
+        if self.generation:
+            self.generation.bump()
+
+    def _known(self) -> dict[str, tuple[int, int]]:
+        if self.ngram_index:
+            return self.ngram_index.files()
+        return self.text_cache.entries() if self.text_cache else {}
+
+    def _vanished(self, rescanned: dict[str, set[str]]) -> set[str]:
+        """Stored files under rescanned directories that the rescan no longer found."""
+        stored: set[str] = set()
+        if self.text_cache:
+            stored.update(self.text_cache.entries())
+        if self.ngram_index:
+            stored.update(self.ngram_index.files())
+        if self.shadow:
+            stored.update(self.shadow.files())
+        found = set().union(*rescanned.values())
+        prefixes = tuple(f'{directory}/' for directory in rescanned if directory != '.')
+        everything = '.' in rescanned
+        return {key for key in stored - found if everything or key.startswith(prefixes)}
+
+    def _is_fresh(self, path: Path, known: dict[str, tuple[int, int]]) -> bool:
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        return known.get(relative_key(path, self.data_dir) or '') == (st.st_size, st.st_mtime_ns)
+
+    def _remove(self, keys: set[str]) -> None:
+        if not keys:
+            return
+        # a removed directory takes every file below it along
+        prefixes = tuple(f'{key}/' for key in keys)
+        if self.text_cache:
+            for key in self.text_cache.entries():
+                if key in keys or key.startswith(prefixes):
+                    self.text_cache.discard(self.data_dir / key)
+        if self.ngram_index:
+            self.ngram_index.remove(
+                self.data_dir / key
+                for key in self.ngram_index.files()
+                if key in keys or key.startswith(prefixes)
+            )
+        if self.shadow:
+            self.shadow.remove(
+                self.data_dir / key
+                for key in self.shadow.files()
+                if key in keys or key.startswith(prefixes)
+            )
+
+    def _update(self, paths: set[Path]) -> None:
+        if not paths:
+            return
+        if self.text_cache:
+            for path in paths:
+                if path.suffix.lower() not in EXTRACTABLE_SUFFIXES:
+                    continue
+                try:
+                    text = self.text_cache.load(path)
+                except Exception as exc:  # noqa: BLE001
+                    logger.error('Extraction failed for %s: %s', path, exc)
+                    text = None
+                if text is None:
+                    # searches must go back to rga until this file is cached
+                    self.text_cache.mark_complete(False)
+        if self.ngram_index:
+            self.ngram_index.update(sorted(paths))
+        if self.shadow:
+            self.shadow.update(sorted(paths))
+
+
+def run_watcher(watcher: Watcher, updater: CorpusUpdater) -> None:
+    try:
+        for batch in watcher.changes():
+            if batch:
+                logger.info('applying %d changed paths', len(batch))
+                updater.apply(batch)
+            elif updater.generation:
+                updater.generation.heartbeat()
+    finally:
+        watcher.close()
+
+
+__all__ = [
+    'CorpusGeneration',
+    'CorpusUpdater',
+    'InotifyWatcher',
+    'PollingWatcher',
+    'Watcher',
+    'create_watcher',
+    'run_watcher',
+]
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import sys
+import threading
 from contextlib import suppress
 from os import environ, pathsep
 from pathlib import Path
@@ -35,29 +37,50 @@ with suppress(Exception):
         current = environ.get('PATH', '')
         environ['PATH'] = str(found) + (pathsep + current if current else '')
 
-from core import (  # noqa: E402
+from core import (
     ResultStreamProcessor,
     directories_response,
-    file_response,
+    directory_children,
+    file_response_async,
     stream_search,
 )
-from core.patterns import build_pattern  # noqa: E402
-from core.schemas import (  # noqa: E402
+from core.dirtree import DirectoryTree
+from core.extract import TextCache
+from core.ngram import NgramIndex
+from core.patterns import build_literals, build_pattern
+from core.results import ResultCache
+from core.schemas import (
     DirectoriesRequest,
     DirectoriesResponse,
+    DirectoryChildrenRequest,
+    DirectoryChildrenResponse,
     FileRequest,
     FileResponse,
+    MatchRecord,
     SearchComplete,
     SearchError,
-    SearchMatch,
     SearchRequest,
 )
+from core.watcher import (
+    CorpusGeneration,
+    CorpusUpdater,
+    Watcher,
+    create_watcher,
+    run_watcher,
+)
 
 DATA_ROOT = None
+TEXT_CACHE: TextCache | None = None
+NGRAM_INDEX: NgramIndex | None = None
+GENERATION: CorpusGeneration | None = None
+DIRECTORY_TREE: DirectoryTree | None = None
 RGA_CONFIG_PATH = PROJECT_ROOT / 'rga.config.json'
+RESULT_CACHE = ResultCache()
+CACHE_ROOT = Path(environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'mini-baheth'
 
 _search_lock = asyncio.Lock()
 _active_processor: ResultStreamProcessor | None = None
+_watcher: Watcher | None = None
 
 commands: Commands = Commands()
 
@@ -90,7 +113,8 @@ async def search(body: SearchRequest, app_handle: AppHandle) -> None:
             _active_processor = None
 
         # build pattern + PCRE based on mode; fallback to ignore flag when no mode
-        pattern, need_pcre = build_pattern(getattr(body, 'search_mode', None), body.query)
+        mode = getattr(body, 'search_mode', None)
+        pattern, need_pcre = build_pattern(mode, body.query)
 
         processor = stream_search(
             pattern,
@@ -99,6 +123,13 @@ async def search(body: SearchRequest, app_handle: AppHandle) -> None:
             DATA_ROOT,
             RGA_CONFIG_PATH if RGA_CONFIG_PATH.exists() else None,
             use_pcre=need_pcre,
+            text_cache=TEXT_CACHE,
+            ngram_index=NGRAM_INDEX,
+            literals=build_literals(mode, body.query),
+            result_cache=RESULT_CACHE,
+            generation=GENERATION.current() if GENERATION else None,
+            # ResultsList highlights from the submatch offsets
+            highlight=False,
         )
         _active_processor = processor
 
@@ -114,12 +145,13 @@ async def search(body: SearchRequest, app_handle: AppHandle) -> None:
     )
 
     async for payload in processor.process():
-        enriched = payload.model_copy(update={'request_id': request_id})
-        if isinstance(payload, SearchMatch):
-            Emitter.emit(app_handle, 'search_match', enriched)
+        if isinstance(payload, MatchRecord):
+            Emitter.emit(app_handle, 'search_match', payload.to_model(request_id))
         elif isinstance(payload, SearchError):
+            enriched = payload.model_copy(update={'request_id': request_id})
             Emitter.emit(app_handle, 'search_error', enriched)
         elif isinstance(payload, SearchComplete):
+            enriched = payload.model_copy(update={'request_id': request_id})
             Emitter.emit(app_handle, 'search_complete', enriched)
 
     async with _search_lock:
@@ -132,13 +164,23 @@ async def list_directories(body: DirectoriesRequest | None = None) -> Directorie
     if not DATA_ROOT:
         return DirectoriesResponse(directories=[])
     request = body or DirectoriesRequest()
-    response = directories_response(DATA_ROOT, request)
+    generation = GENERATION.current() if GENERATION else None
+    response = directories_response(DATA_ROOT, request, generation, DIRECTORY_TREE)
     return response
 
 
+@commands.command()
+async def list_directory_children(body: DirectoryChildrenRequest) -> DirectoryChildrenResponse:
+    if not DATA_ROOT:
+        return DirectoryChildrenResponse(parent=body.parent, children=[])
+    # one directory read per expansion, off the loop like file previews
+    return await asyncio.to_thread(directory_children, DATA_ROOT, body)
+
+
 @commands.command()
 async def fetch_file(body: FileRequest) -> FileResponse:
-    response = file_response(DATA_ROOT, body)
+    # conversions run as subprocesses on the loop, so previews never block searches
+    response = await file_response_async(DATA_ROOT, body, TEXT_CACHE)
     return response
 
 
@@ -173,6 +215,19 @@ async def set_data_root(body: dict[str, str]) -> str:
     candidate = Path(path).expanduser()
     if not candidate.exists() or not candidate.is_dir():
         raise FileNotFoundError(path)
-    global DATA_ROOT
+    global DATA_ROOT, TEXT_CACHE, NGRAM_INDEX, GENERATION, DIRECTORY_TREE, _watcher
     DATA_ROOT = candidate.resolve()
+    # one extraction cache per data root so switching folders never mixes texts
+    digest = hashlib.sha1(str(DATA_ROOT).encode()).hexdigest()[:16]
+    TEXT_CACHE = TextCache(CACHE_ROOT / digest / 'extract', DATA_ROOT)
+    NGRAM_INDEX = NgramIndex(CACHE_ROOT / digest / 'index', DATA_ROOT, TEXT_CACHE)
+    GENERATION = CorpusGeneration(CACHE_ROOT / digest / 'generation')
+    DIRECTORY_TREE = DirectoryTree(CACHE_ROOT / digest / 'directories.json', DATA_ROOT)
+
+    if _watcher:
+        _watcher.stop()
+    _watcher = await asyncio.to_thread(create_watcher, DATA_ROOT)
+    updater = CorpusUpdater(DATA_ROOT, TEXT_CACHE, NGRAM_INDEX, GENERATION)
+    GENERATION.bump()
+    threading.Thread(target=run_watcher, args=(_watcher, updater), daemon=True).start()
     return str(DATA_ROOT)
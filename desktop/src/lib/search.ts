@@ -1,5 +1,5 @@
 import { pyInvoke } from 'tauri-plugin-pytauri-api'
-import type { DirectoriesResponse, FileResponse } from '$lib/types'
+import type { DirectoriesResponse, DirectoryChildrenResponse, FileResponse } from '$lib/types'
 
 export function get_data_root() {
   return pyInvoke<string>('get_data_root', {})
@@ -13,6 +13,10 @@ export function list_directories(query: string, limit = 200) {
   return pyInvoke<DirectoriesResponse>('list_directories', { query: query?.trim() ?? '', limit })
 }
 
+export function list_directory_children(parent = '.', cursor: string | null = null, limit = 200) {
+  return pyInvoke<DirectoryChildrenResponse>('list_directory_children', { parent, cursor, limit })
+}
+
 export function search(params: { query: string; directory: string; file_filters: string[]; request_id: string; search_mode?: 'smart'|'regex'|'ignore'|'require' }) {
   return pyInvoke('search', params)
 }
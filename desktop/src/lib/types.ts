@@ -36,6 +36,18 @@ export type DirectoriesResponse = {
   directories: string[]
 }
 
+export type DirectoryChild = {
+  path: string
+  name: string
+  children: number
+}
+
+export type DirectoryChildrenResponse = {
+  parent: string
+  children: DirectoryChild[]
+  next_cursor: string | null
+}
+
 export type FileResponse = {
   file: string
   lines: string[]
@@ -3,13 +3,36 @@ import importlib
 import pytest
 
 import core
+from core.admission import SearchScheduler
+from core.dirtree import DirectoryTree
+from core.extract import TextCache
+from core.ngram import NgramIndex
+from core.results import ResultCache, SearchFlights
+from core.shadow import ShadowCorpus
+from core.watcher import CorpusGeneration
 
 webapp_module = importlib.import_module('webapp.app')
 webapp_module.app._prepare(is_prod=False)
 
 
 @pytest.fixture
-def temp_data_dir(tmp_path, monkeypatch):
+def temp_data_dir(tmp_path, tmp_path_factory, monkeypatch):
     monkeypatch.setattr(webapp_module, 'DATA_DIR', tmp_path)
+    cache_dir = tmp_path_factory.mktemp('cache')
+    text_cache = TextCache(cache_dir / 'extract', tmp_path)
+    monkeypatch.setattr(webapp_module, 'TEXT_CACHE', text_cache)
+    monkeypatch.setattr(
+        webapp_module, 'NGRAM_INDEX', NgramIndex(cache_dir / 'index', tmp_path, text_cache)
+    )
+    monkeypatch.setattr(
+        webapp_module, 'SHADOW_CORPUS', ShadowCorpus(cache_dir / 'shadow', tmp_path, text_cache)
+    )
+    monkeypatch.setattr(webapp_module, 'GENERATION', CorpusGeneration(cache_dir / 'generation'))
+    monkeypatch.setattr(webapp_module, 'RESULT_CACHE', ResultCache())
+    monkeypatch.setattr(webapp_module, 'SEARCH_FLIGHTS', SearchFlights())
+    monkeypatch.setattr(webapp_module, 'SCHEDULER', SearchScheduler())
+    monkeypatch.setattr(
+        webapp_module, 'DIRECTORY_TREE', DirectoryTree(cache_dir / 'directories.json', tmp_path)
+    )
     monkeypatch.setattr(core, '_dir_cache', {})
     return tmp_path
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import sys
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+from core import MatchRecord, ResultStreamProcessor
+from core.admission import QUEUE_WAIT, SearchScheduler, Ticket
+from core.schemas import SearchComplete, SearchError, SearchQueued
+
+
+def _sleep_command(seconds: float) -> list[str]:
+    return [sys.executable, '-c', f'import time; time.sleep({seconds})']
+
+
+def _match_then_sleep_command(seconds: float) -> list[str]:
+    match = {
+        'type': 'match',
+        'data': {
+            'path': {'text': 'a.txt'},
+            'lines': {'text': 'hit\n'},
+            'line_number': 1,
+            'absolute_offset': 0,
+            'submatches': [{'match': {'text': 'hit'}, 'start': 0, 'end': 3}],
+        },
+    }
+    lines = '\n'.join(json.dumps(event) for event in (match, {'type': 'end', 'data': {}}))
+    code = f'import time; print({lines!r}, flush=True); time.sleep({seconds})'
+    return [sys.executable, '-c', code]
+
+
+async def _collect(processor: ResultStreamProcessor) -> list:
+    return [event async for event in processor.process()]
+
+
+def test_searches_beyond_the_limit_are_queued(tmp_path: Path):
+    scheduler = SearchScheduler(max_running=1)
+    waits = QUEUE_WAIT.count()
+
+    async def run() -> list:
+        first = ResultStreamProcessor(_sleep_command(0.3), tmp_path, scheduler=scheduler)
+        second = ResultStreamProcessor(_sleep_command(0), tmp_path, scheduler=scheduler)
+        first_task = asyncio.create_task(_collect(first))
+        await asyncio.sleep(0.1)
+        assert scheduler.running == 1
+        events = await _collect(second)
+        await first_task
+        return events
+
+    events = asyncio.run(run())
+    assert [type(e) for e in events] == [SearchQueued, SearchComplete]
+    assert events[0].position == 1
+    assert events[1].stats.queued_seconds > 0
+    assert scheduler.running == 0
+    assert QUEUE_WAIT.count() == waits + 2
+
+
+def test_queued_search_times_out(tmp_path: Path):
+    scheduler = SearchScheduler(max_running=1, timeout=0.1)
+
+    async def run() -> list:
+        first = ResultStreamProcessor(_sleep_command(0.5), tmp_path, scheduler=scheduler)
+        first_task = asyncio.create_task(_collect(first))
+        await asyncio.sleep(0.05)
+        events = await _collect(
+            ResultStreamProcessor(_sleep_command(0), tmp_path, scheduler=scheduler)
+        )
+        await first.cancel()
+        await first_task
+        return events
+
+    events = asyncio.run(run())
+    assert isinstance(events[0], SearchQueued)
+    assert isinstance(events[-1], SearchError)
+
+
+def test_cancelled_search_leaves_the_queue(tmp_path: Path):
+    scheduler = SearchScheduler(max_running=1)
+
+    async def run() -> list:
+        first = ResultStreamProcessor(_sleep_command(0.5), tmp_path, scheduler=scheduler)
+        second = ResultStreamProcessor(_sleep_command(0), tmp_path, scheduler=scheduler)
+        first_task = asyncio.create_task(_collect(first))
+        await asyncio.sleep(0.05)
+        second_task = asyncio.create_task(_collect(second))
+        await asyncio.sleep(0.05)
+        await second.cancel()
+        events = await asyncio.wait_for(second_task, 0.2)
+        await first.cancel()
+        await first_task
+        return events
+
+    assert asyncio.run(run()) == [SearchQueued(position=1)]
+    assert scheduler.running == 0
+
+
+def test_global_slots_are_shared_between_schedulers(tmp_path: Path):
+    lock_dir = tmp_path / 'slots'
+    worker_a = SearchScheduler(max_running=4, global_limit=1, lock_dir=lock_dir)
+    worker_b = SearchScheduler(max_running=4, global_limit=1, lock_dir=lock_dir)
+
+    async def run() -> list[int]:
+        held = Ticket()
+        async for _ in worker_a.acquire(held):
+            pass
+        assert held.acquired
+
+        waiting = Ticket()
+        positions = []
+
+        async def wait_for_slot() -> None:
+            async for position in worker_b.acquire(waiting):
+                positions.append(position)
+
+        task = asyncio.create_task(wait_for_slot())
+        await asyncio.sleep(0.2)
+        assert not waiting.acquired
+        worker_a.release(held)
+        await asyncio.wait_for(task, 1)
+        assert waiting.acquired
+        worker_b.release(waiting)
+        return positions
+
+    assert asyncio.run(run()) == [1]
+
+
+def test_closing_a_search_terminates_rg_right_away(tmp_path: Path):
+    processor = ResultStreamProcessor(_match_then_sleep_command(30), tmp_path)
+
+    async def run() -> MatchRecord:
+        async with aclosing(processor.process()) as events:
+            async for event in events:
+                return event
+
+    started = time.monotonic()
+    event = asyncio.run(run())
+
+    assert isinstance(event, MatchRecord)
+    assert time.monotonic() - started < 2
+    assert processor.proc.returncode is not None
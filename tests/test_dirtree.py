@@ -0,0 +1,209 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import core.dirtree
+from core.dirtree import (
+    REFRESH_LOCK_TIMEOUT,
+    DirectoryIndex,
+    DirectoryTree,
+    child_names,
+    directory_index,
+    invalidate_children,
+    list_children,
+    scan_directories,
+)
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path) -> Path:
+    root = tmp_path / 'data'
+    for name in ('b/one/x/y', 'a/two', 'a/one', '.hidden'):
+        (root / name).mkdir(parents=True)
+    (root / 'a' / 'file.txt').write_text('not a directory')
+    return root
+
+
+@pytest.fixture
+def walks(monkeypatch) -> list[int]:
+    calls: list[int] = []
+    original = core.dirtree.scan_directories
+
+    def counting(data_dir: Path, max_depth: int = 3, workers: int = 8) -> list[str]:
+        calls.append(max_depth)
+        return original(data_dir, max_depth, workers)
+
+    monkeypatch.setattr(core.dirtree, 'scan_directories', counting)
+    return calls
+
+
+def test_scan_lists_directories_depth_first_by_name(data_dir: Path):
+    assert scan_directories(data_dir) == [
+        '.',
+        '.hidden',
+        'a',
+        'a/one',
+        'a/two',
+        'b',
+        'b/one',
+        'b/one/x',
+    ]
+    assert scan_directories(data_dir, max_depth=1) == ['.', '.hidden', 'a', 'b']
+    assert scan_directories(data_dir, max_depth=0) == ['.']
+    assert scan_directories(data_dir, workers=1) == scan_directories(data_dir)
+
+
+def test_scan_follows_symlinks_but_not_loops(data_dir: Path):
+    os.symlink(data_dir, data_dir / 'b' / 'root', target_is_directory=True)
+    os.symlink(data_dir / 'a', data_dir / 'b' / 'one' / 'back', target_is_directory=True)
+    os.symlink(data_dir / 'b', data_dir / 'link', target_is_directory=True)
+
+    listed = scan_directories(data_dir, max_depth=5)
+    assert len(listed) == len(set(listed))
+    assert 'b/root' not in listed
+    # `a` was reached first, its alias is dropped with everything under it
+    assert not any(item.startswith('b/one/back') for item in listed)
+    assert 'b/one/x/y' in listed
+    # the `b` subtree is only listed once, under its real name
+    assert not any(item.startswith('link') for item in listed)
+
+
+def test_tree_snapshot_is_shared_between_workers(tmp_path: Path, data_dir: Path, walks):
+    snapshot = tmp_path / 'cache' / 'directories.json'
+    first = DirectoryTree(snapshot, data_dir)
+    assert first.listing(max_depth=1) == ['.', '.hidden', 'a', 'b']
+    assert walks == [3]
+
+    second = DirectoryTree(snapshot, data_dir)
+    assert second.listing(max_depth=2) == ['.', '.hidden', 'a', 'a/one', 'a/two', 'b', 'b/one']
+    assert walks == [3]
+
+    # deeper than the snapshot goes: walk right away
+    assert 'b/one/x/y' in second.listing(max_depth=4)
+    assert walks == [3, 4]
+
+
+def test_stale_listing_is_served_while_refreshing(tmp_path: Path, data_dir: Path, walks):
+    tree = DirectoryTree(tmp_path / 'directories.json', data_dir)
+    assert 'c' not in tree.listing(generation=1)
+
+    (data_dir / 'c').mkdir()
+    assert 'c' not in tree.listing(generation=2)
+    tree.wait()
+    assert 'c' in tree.listing(generation=2)
+    assert walks == [3, 3]
+    assert not tree.lock_path.exists()
+
+
+def test_one_worker_refreshes_at_a_time(tmp_path: Path, data_dir: Path, walks):
+    tree = DirectoryTree(tmp_path / 'directories.json', data_dir, ttl=0)
+    tree.listing()
+    tree.lock_path.touch()
+
+    tree.listing()
+    tree.wait()
+    assert walks == [3]
+
+    # a lock left behind by a dead worker does not block refreshes forever
+    stale = time.time() - REFRESH_LOCK_TIMEOUT - 1
+    os.utime(tree.lock_path, (stale, stale))
+    tree.listing()
+    tree.wait()
+    assert walks == [3, 3]
+
+
+DIRECTORIES = [
+    '.',
+    'كتب',
+    'كتب/الفقه',
+    'كتب/الفقه/فقه الحنابلة',
+    'كتب/التفسير',
+    'Books',
+    'Books/Fiqh',
+    'archive/old books',
+    'archive/كُتُب قديمة',
+    'misc/sub/fiqh-notes',
+]
+
+
+def test_index_ranks_exact_then_prefix_then_contained():
+    index = DirectoryIndex(DIRECTORIES)
+    assert index.search('books', 10) == ['Books', 'Books/Fiqh', 'archive/old books']
+    assert index.search('fiqh', 10) == ['Books/Fiqh', 'misc/sub/fiqh-notes']
+    assert index.search('BOOKS', 1) == ['Books']
+
+
+def test_index_folds_arabic_variants_and_diacritics():
+    index = DirectoryIndex(DIRECTORIES)
+    # exact names first, then a name that starts with the term, then the subtree
+    assert index.search('كتب', 10) == [
+        'كتب',
+        'archive/كُتُب قديمة',
+        'كتب/التفسير',
+        'كتب/الفقه',
+        'كتب/الفقه/فقه الحنابلة',
+    ]
+    assert index.search('الفقة', 10) == ['كتب/الفقه', 'كتب/الفقه/فقه الحنابلة']
+    assert index.search('ف', 3) == ['كتب/الفقه/فقه الحنابلة', 'كتب/التفسير', 'كتب/الفقه']
+
+
+def test_index_matches_across_names_and_short_terms():
+    index = DirectoryIndex(DIRECTORIES)
+    assert index.search('books/fi', 10) == ['Books/Fiqh']
+    assert index.search('old boo', 10) == ['archive/old books']
+    assert index.search('k', 10) == ['Books', 'Books/Fiqh', 'archive/old books']
+    assert index.search('...', 2) == ['.', 'Books']
+    assert index.search('missing', 10) == []
+
+
+def test_index_agrees_with_a_plain_substring_filter(data_dir: Path):
+    listing = scan_directories(data_dir, max_depth=5)
+    index = DirectoryIndex(listing)
+    for term in ('a', 'on', 'one', 'b/one', 'x', 'tw', 'zz'):
+        expected = {item for item in listing if term in item}
+        assert set(index.search(term, len(listing))) == expected
+
+
+def test_index_is_built_once_per_listing(tmp_path: Path, data_dir: Path):
+    tree = DirectoryTree(tmp_path / 'directories.json', data_dir)
+    listing = tree.listing(max_depth=2)
+    assert tree.listing(max_depth=2) is listing
+    assert directory_index(listing) is directory_index(tree.listing(max_depth=2))
+
+
+def test_children_are_paged_by_name_with_counts(data_dir: Path):
+    (data_dir / 'a' / 'three').mkdir()
+    first, cursor = list_children(data_dir, 'a', None, 2)
+    assert first == [('a/one', 'one', 0), ('a/three', 'three', 0)]
+    assert cursor == 'three'
+
+    # a folder added before the cursor does not shift the next page
+    (data_dir / 'a' / 'first').mkdir()
+    rest, cursor = list_children(data_dir, 'a', cursor, 2)
+    assert rest == [('a/two', 'two', 0)]
+    assert cursor is None
+
+    top, _ = list_children(data_dir, '.', None, 10)
+    assert top == [('.hidden', '.hidden', 0), ('a', 'a', 4), ('b', 'b', 1)]
+
+
+def test_child_names_are_read_again_once_the_directory_changes(data_dir: Path, monkeypatch):
+    invalidate_children()
+    reads = []
+    original = os.scandir
+
+    def counting(path):
+        reads.append(Path(path).name)
+        return original(path)
+
+    monkeypatch.setattr(core.dirtree.os, 'scandir', counting)
+    assert child_names(data_dir / 'b') == ['one']
+    assert child_names(data_dir / 'b') == ['one']
+    assert reads == ['b']
+
+    (data_dir / 'b' / 'two').mkdir()
+    os.utime(data_dir / 'b', ns=(0, 1))
+    assert child_names(data_dir / 'b') == ['one', 'two']
+    assert reads == ['b', 'b']
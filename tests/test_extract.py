@@ -0,0 +1,235 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import core.extract
+from core import (
+    FileRequest,
+    MatchRecord,
+    build_search_command,
+    file_response_async,
+    read_file_lines,
+    stream_search,
+)
+from core.extract import CONVERTER_LIMITS, TEXT_SUFFIX, ConversionTimeout, PageMap, TextCache
+
+
+def make_cache(tmp_path: Path, **kwargs) -> tuple[Path, TextCache]:
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    return data_dir, TextCache(tmp_path / 'cache', data_dir, **kwargs)
+
+
+def test_text_cache_roundtrip_and_mirror_layout(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path)
+    (data_dir / 'books').mkdir()
+    source = data_dir / 'books' / 'a.pdf'
+    source.write_bytes(b'%PDF')
+
+    assert cache.get(source) is None
+    cache.put(source, 'نص مستخرج')
+
+    assert cache.get(source) == 'نص مستخرج'
+    assert (cache.text_dir / 'books' / f'a.pdf{TEXT_SUFFIX}').exists()
+
+
+def test_text_cache_invalidates_on_change(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path)
+    source = data_dir / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    cache.put(source, 'old')
+
+    source.write_bytes(b'%PDF-changed')
+    os.utime(source, ns=(0, 1))
+
+    assert cache.get(source) is None
+
+
+def test_text_cache_evicts_least_recently_used(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path, max_bytes=10)
+    first, second = data_dir / 'a.pdf', data_dir / 'b.pdf'
+    first.write_bytes(b'1')
+    second.write_bytes(b'2')
+    cache.put(first, 'x' * 6)
+    cache.mark_complete()
+    cache.put(second, 'y' * 6)
+
+    assert cache.get(first) is None
+    assert cache.get(second) == 'y' * 6
+    assert not cache.text_path('a.pdf').exists()
+    assert cache.is_complete() is False
+
+
+def test_text_cache_keeps_running_byte_total(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path, max_bytes=10)
+    first, second = data_dir / 'a.pdf', data_dir / 'b.pdf'
+    first.write_bytes(b'1')
+    second.write_bytes(b'2')
+    cache.put(first, 'x' * 6)
+    cache.put(first, 'x' * 4)
+    cache.put(second, 'y' * 6)
+
+    # replacing an entry counts only its new size, so nothing was evicted
+    assert cache.get(first) == 'x' * 4
+    cache.discard(first)
+    cache.put(first, 'x' * 4)
+    assert cache.get(second) == 'y' * 6
+    cache.put(first, 'x' * 5)
+    assert cache.get(second) is None
+
+
+def test_original_path_maps_cached_text_back(tmp_path: Path):
+    _, cache = make_cache(tmp_path)
+    reported = str(cache.text_path('books/a.pdf'))
+
+    assert cache.original_path(reported) == 'books/a.pdf'
+    assert cache.original_path('books/a.pdf') is None
+
+
+def test_read_file_lines_prefers_cached_text(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path)
+    source = data_dir / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    cache.put(source, 'first\nsecond')
+
+    assert read_file_lines(source, cache) == ['first', 'second']
+
+
+def test_build_search_command_uses_complete_cache(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path)
+    (data_dir / 'books').mkdir()
+    source = data_dir / 'books' / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    cache.put(source, 'text')
+
+    cmd = build_search_command('pat', 'books', ['*.pdf'], data_dir, None, text_cache=cache)
+    assert f'**/*.pdf{TEXT_SUFFIX}' not in cmd
+
+    cache.mark_complete()
+    cmd = build_search_command('pat', 'books', ['*.pdf'], data_dir, None, text_cache=cache)
+    assert Path(cmd[0]).name == 'rg'
+    assert f'**/*.pdf{TEXT_SUFFIX}' in cmd
+    assert cmd[-3:] == ['pat', 'books', str(cache.text_dir / 'books')]
+
+
+@pytest.mark.parametrize('directory', ['.', 'books'])
+def test_search_over_cache_reports_original_paths(tmp_path: Path, directory: str):
+    data_dir, cache = make_cache(tmp_path)
+    (data_dir / 'books').mkdir()
+    source = data_dir / 'books' / 'a.pdf'
+    source.write_bytes(b'%PDF')
+    (data_dir / 'books' / 'b.txt').write_text('needle too\n')
+    cache.put(source, 'before\nneedle here\nafter\n')
+    cache.mark_complete()
+
+    async def collect():
+        processor = stream_search('needle', directory, ['all'], data_dir, None, text_cache=cache)
+        return [event async for event in processor.process()]
+
+    matches = sorted(
+        (e for e in asyncio.run(collect()) if isinstance(e, MatchRecord)), key=lambda m: m.path
+    )
+    # cached texts are reported under the same prefix rg gives the files next to them
+    prefix = './' if directory == '.' else ''
+    assert [(m.path, m.line_number) for m in matches] == [
+        (f'{prefix}books/a.pdf', 2),
+        (f'{prefix}books/b.txt', 1),
+    ]
+    assert matches[0].mtime == source.stat().st_mtime
+
+
+def _fake_converter(monkeypatch, code: str) -> None:
+    monkeypatch.setattr(core.extract, 'extract_command', lambda _path: [sys.executable, '-c', code])
+
+
+def test_async_conversion_is_capped_per_converter(tmp_path: Path, monkeypatch):
+    data_dir, cache = make_cache(tmp_path)
+    _fake_converter(monkeypatch, 'import time; time.sleep(0.3); print("converted")')
+    monkeypatch.setitem(CONVERTER_LIMITS, sys.executable, 1)
+    for name in ('a.pdf', 'b.pdf'):
+        (data_dir / name).write_bytes(b'%PDF')
+
+    async def run():
+        return await asyncio.gather(
+            *(cache.ensure_async(data_dir / name) for name in ('a.pdf', 'b.pdf'))
+        )
+
+    started = time.monotonic()
+    paths = asyncio.run(run())
+
+    assert time.monotonic() - started >= 0.6
+    assert [path.read_text() for path in paths] == ['converted\n', 'converted\n']
+
+
+def test_failed_conversion_is_not_cached(tmp_path: Path, monkeypatch):
+    data_dir, cache = make_cache(tmp_path)
+    _fake_converter(monkeypatch, 'import sys; print("partial"); sys.exit(1)')
+    source = data_dir / 'broken.pdf'
+    source.write_bytes(b'%PDF')
+
+    assert cache.load(source) is None
+    assert cache.ensure(source) is None
+    assert asyncio.run(cache.ensure_async(source)) is None
+    assert cache.entries() == {}
+
+
+def test_async_conversion_times_out_without_blocking_loop(tmp_path: Path, monkeypatch):
+    data_dir, cache = make_cache(tmp_path)
+    _fake_converter(monkeypatch, 'import time; time.sleep(30)')
+    (data_dir / 'slow.epub').write_bytes(b'PK')
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def run():
+        ticker = asyncio.create_task(tick())
+        try:
+            await cache.ensure_async(data_dir / 'slow.epub', timeout=0.2)
+        finally:
+            ticker.cancel()
+
+    with pytest.raises(ConversionTimeout):
+        asyncio.run(run())
+    assert len(ticks) > 5
+    assert cache.get(data_dir / 'slow.epub') is None
+
+
+def test_file_response_async_previews_converted_text(tmp_path: Path, monkeypatch):
+    data_dir, cache = make_cache(tmp_path)
+    _fake_converter(monkeypatch, 'print("\\n".join(f"page {i}" for i in range(1, 51)))')
+    (data_dir / 'book.docx').write_bytes(b'PK')
+
+    response = asyncio.run(
+        file_response_async(data_dir, FileRequest(path='book.docx', cursor=11, limit=5), cache)
+    )
+
+    assert response.lines == ['page 11', 'page 12', 'page 13', 'page 14', 'page 15']
+    assert response.total_lines == 50
+
+
+def test_page_map_follows_pdftotext_form_feeds():
+    pages = PageMap.from_text('a\nb\n\fc\nd\ne\n\ff\n\f')
+
+    assert list(pages.starts) == [1, 3, 6]
+    assert pages.total_lines == 6
+    assert [pages.page_of(line) for line in range(1, 7)] == [1, 1, 2, 2, 2, 3]
+
+
+def test_page_map_outlives_evicted_text_but_not_changes(tmp_path: Path):
+    data_dir, cache = make_cache(tmp_path, max_bytes=1)
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    cache.put(source, 'one\n\ftwo\n\f')
+
+    assert cache.get(source) is None
+    assert list(cache.page_map(source).starts) == [1, 2]
+
+    source.write_bytes(b'%PDF changed')
+    assert cache.page_map(source) is None
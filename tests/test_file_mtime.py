@@ -0,0 +1,72 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import orjson
+
+import core
+from core import MatchRecord, ResultStreamProcessor, file_mtime
+
+
+def _rg_command(events: list[dict]) -> list[str]:
+    lines = '\n'.join(orjson.dumps(event).decode() for event in events)
+    return [sys.executable, '-c', f'print({lines!r})']
+
+
+def _match(path: str, line: int) -> dict:
+    return {
+        'type': 'match',
+        'data': {'path': {'text': path}, 'lines': {'text': f'hit {line}\n'}, 'line_number': line},
+    }
+
+
+def test_each_file_is_stat_once_per_search(tmp_path: Path, monkeypatch):
+    (tmp_path / 'a.txt').write_text('hit\n')
+    monkeypatch.setattr(core, '_mtime_cache', {})
+    resolved = []
+    original = core.resolve_data_path
+
+    def counting(data_dir: Path, relative: str) -> Path:
+        resolved.append(relative)
+        return original(data_dir, relative)
+
+    monkeypatch.setattr(core, 'resolve_data_path', counting)
+    events = [{'type': 'begin', 'data': {'path': {'text': 'a.txt'}}}]
+    events += [_match('a.txt', line) for line in range(1, 6)]
+    events += [_match('missing.txt', 9)]
+
+    async def collect() -> list:
+        return [e async for e in ResultStreamProcessor(_rg_command(events), tmp_path).process()]
+
+    matches = [e for e in asyncio.run(collect()) if isinstance(e, MatchRecord)]
+    assert [m.mtime for m in matches[:5]] == [(tmp_path / 'a.txt').stat().st_mtime] * 5
+    assert matches[5].mtime is None
+    assert resolved == ['a.txt', 'missing.txt']
+
+    # a second search within the TTL reuses the process-wide cache
+    asyncio.run(collect())
+    assert resolved == ['a.txt', 'missing.txt']
+
+
+def test_file_mtime_expires(tmp_path: Path, monkeypatch):
+    target = tmp_path / 'a.txt'
+    target.write_text('x')
+    monkeypatch.setattr(core, '_mtime_cache', {})
+    assert file_mtime(tmp_path, 'a.txt') == target.stat().st_mtime
+
+    target.unlink()
+    assert file_mtime(tmp_path, 'a.txt') is not None
+    monkeypatch.setattr(core, 'MTIME_CACHE_TTL', 0)
+    assert file_mtime(tmp_path, 'a.txt') is None
+
+
+def test_file_mtime_expires_with_the_generation(tmp_path: Path, monkeypatch):
+    target = tmp_path / 'a.txt'
+    target.write_text('x')
+    monkeypatch.setattr(core, '_mtime_cache', {})
+    assert file_mtime(tmp_path, 'a.txt', 1) == target.stat().st_mtime
+
+    target.unlink()
+    assert file_mtime(tmp_path, 'a.txt', 1) is not None
+    # another worker's watcher bumped the generation, no need to wait for the TTL
+    assert file_mtime(tmp_path, 'a.txt', 2) is None
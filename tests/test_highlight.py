@@ -0,0 +1,38 @@
+from core import highlight_matches
+
+OPEN = '<span class="bg-yellow-200">'
+
+
+def _submatch(line: str, text: str, occurrence: int = 0) -> dict:
+    data = line.encode()
+    start = -1
+    for _ in range(occurrence + 1):
+        start = data.index(text.encode(), start + 1)
+    return {'match': {'text': text}, 'start': start, 'end': start + len(text.encode())}
+
+
+def test_highlight_maps_utf8_offsets_for_arabic():
+    line = 'قال الإمام: العلم قبل العمل\n'
+    assert highlight_matches(line, [_submatch(line, 'العلم')]) == (
+        f'قال الإمام: {OPEN}العلم</span> قبل العمل'
+    )
+
+
+def test_highlight_only_marks_reported_occurrences():
+    line = 'abc abc abc'
+    result = highlight_matches(line, [_submatch(line, 'abc', 1)])
+    assert result == f'abc {OPEN}abc</span> abc'
+
+
+def test_highlight_escapes_html_and_merges_overlaps():
+    line = '<b>x & y</b>'
+    submatches = [_submatch(line, 'x & y'), _submatch(line, '& y</b>')]
+    assert (
+        highlight_matches(line, submatches)
+        == f'&lt;b&gt;{OPEN}x &amp; y</span>{OPEN}&lt;/b&gt;</span>'
+    )
+
+
+def test_highlight_falls_back_to_text_without_offsets():
+    assert highlight_matches('one two', [{'match': {'text': 'two'}}]) == f'one {OPEN}two</span>'
+    assert highlight_matches('one two', []) == 'one two'
@@ -0,0 +1,157 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from core import NativeStreamProcessor, SearchComplete, stream_search
+from core.extract import TextCache
+from core.native import compile_pattern, scan_file
+from core.ngram import NgramIndex
+from core.patterns import build_literals, build_pattern
+
+CORPUS = {
+    'books/a.txt': 'مقدمة\nقال الشَّيخُ رحمه الله\nسطر\nوقال الشيخ أيضا\nالشيخ مرة ثالثة\nخاتمة\n',
+    'books/b.md': 'الشيـخ بالتطويل\n\nلا شيء هنا',
+    'books/deep/c.txt': 'first\nالشيخ والشيخ في سطر\n',
+    'other/d.txt': 'الشيخ خارج المجلد\r\nبعده\r\n',
+    'binary.dat': 'الشيخ\0',
+}
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> Path:
+    for name, text in CORPUS.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(text.encode())
+    return tmp_path
+
+
+def _search(data_dir: Path, mode: str, engine: str, directory: str = '.', **kwargs):
+    pattern, use_pcre = build_pattern(mode, 'الشيخ')
+
+    async def run():
+        processor = stream_search(
+            pattern, directory, [], data_dir, use_pcre=use_pcre, engine=engine, **kwargs
+        )
+        return processor, [event async for event in processor.process()]
+
+    return asyncio.run(run())
+
+
+def _fields(events):
+    return sorted(
+        (
+            e.path,
+            e.line_number,
+            e.lines,
+            [(m['start'], m['end'], m['match']['text']) for m in e.submatches],
+            e.context_before,
+            e.context_after,
+            e.highlighted_text,
+        )
+        for e in events
+        if not isinstance(e, SearchComplete)
+    )
+
+
+@pytest.mark.parametrize('mode', ['smart', 'ignore', 'require'])
+@pytest.mark.parametrize('directory', ['.', 'books'])
+def test_native_engine_matches_rg(corpus: Path, mode: str, directory: str):
+    _, expected = _search(corpus, mode, 'rg', directory)
+    processor, events = _search(corpus, mode, 'native', directory)
+
+    assert isinstance(processor, NativeStreamProcessor)
+    assert _fields(events) == _fields(expected)
+    assert isinstance(events[-1], SearchComplete)
+
+
+@pytest.mark.parametrize('pattern', ['^الشيخ', 'سطر$', 'هنا$', '^$'])
+def test_native_engine_matches_rg_on_anchored_patterns(corpus: Path, pattern: str):
+    async def run(engine: str):
+        processor = stream_search(pattern, '.', [], corpus, engine=engine)
+        return [event async for event in processor.process()]
+
+    expected = asyncio.run(run('rg'))
+    if pattern != '^$':
+        assert len(expected) > 1
+    assert _fields(asyncio.run(run('native'))) == _fields(expected)
+
+
+@pytest.mark.parametrize('pattern', [r'ش\w+خ', r'\bالشيخ\b', r'الش\W'])
+def test_native_engine_matches_rg_on_word_classes(corpus: Path, pattern: str):
+    async def run(engine: str):
+        processor = stream_search(pattern, '.', [], corpus, engine=engine)
+        return [event async for event in processor.process()]
+
+    expected = asyncio.run(run('rg'))
+    assert compile_pattern(pattern) is None
+    assert _fields(asyncio.run(run('native'))) == _fields(expected)
+    if pattern == r'ش\w+خ':
+        # rg counts the marks in الشَّيخُ as word characters
+        assert any('الشَّيخُ' in fields[2] for fields in _fields(expected))
+
+
+def test_native_engine_searches_cached_text(corpus: Path, tmp_path_factory):
+    cache = TextCache(tmp_path_factory.mktemp('cache'), corpus)
+    source = corpus / 'books' / 'e.pdf'
+    source.write_bytes(b'%PDF\0')
+    cache.put(source, 'صفحة\nفيها الشيخ\n')
+    cache.mark_complete()
+    pattern, _ = build_pattern('smart', 'الشيخ')
+
+    async def run(engine: str):
+        processor = stream_search(
+            pattern, 'books', ['*.pdf'], corpus, text_cache=cache, engine=engine
+        )
+        return [event async for event in processor.process()]
+
+    native = asyncio.run(run('native'))
+
+    assert [(e.path, e.line_number, e.context_before) for e in native[:-1]] == [
+        ('books/e.pdf', 2, 'صفحة')
+    ]
+    assert _fields(native) == _fields(asyncio.run(run('rg')))
+
+
+def test_auto_engine_falls_back_to_rg(corpus: Path, monkeypatch):
+    monkeypatch.setattr('core.NATIVE_MAX_BYTES', 10)
+    processor, _ = _search(corpus, 'smart', 'auto')
+    assert not isinstance(processor, NativeStreamProcessor)
+
+    processor = stream_search(r'a\sb', '.', [], corpus, engine='native')
+    assert not isinstance(processor, NativeStreamProcessor)
+
+
+def test_auto_engine_weighs_index_candidates_by_size(corpus: Path, tmp_path_factory, monkeypatch):
+    index = NgramIndex(tmp_path_factory.mktemp('index'), corpus)
+    index.build()
+    literals = build_literals('smart', 'الشيخ')
+
+    processor, events = _search(corpus, 'smart', 'auto', ngram_index=index, literals=literals)
+    assert isinstance(processor, NativeStreamProcessor)
+    assert events[-1].stats.bytes_searched == sum(size for _, _, size in processor.files)
+    assert events[-1].stats.bytes_searched > 0
+
+    monkeypatch.setattr('core.NATIVE_MAX_BYTES', 10)
+    processor, _ = _search(corpus, 'smart', 'auto', ngram_index=index, literals=literals)
+    assert not isinstance(processor, NativeStreamProcessor)
+
+
+def test_compile_pattern_translates_pcre_marks():
+    regex = compile_pattern(build_pattern('ignore', 'شيخ')[0])
+
+    assert regex is not None
+    assert regex.search('الشَّيْـخ')
+    assert compile_pattern(r'\p{Arabic}') is None
+    assert compile_pattern('a*') is None
+
+
+def test_scan_file_caps_matches_per_file(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr('core.native.MAX_MATCHES_PER_FILE', 3)
+    path = tmp_path / 'many.txt'
+    path.write_text('hit\n' * 10)
+
+    records = scan_file(path, compile_pattern('hit'))
+
+    assert [record.line_number for record in records] == [1, 2, 3]
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from pathlib import Path
+
+from core import MatchRecord, SearchComplete, stream_search
+from core.ngram import NgramIndex
+from core.patterns import build_literals
+
+
+def make_index(tmp_path: Path) -> tuple[Path, NgramIndex]:
+    data_dir = tmp_path / 'data'
+    (data_dir / 'fiqh').mkdir(parents=True)
+    (data_dir / 'fiqh' / 'salah.txt').write_text('بابُ الصَّلاةِ وأحكامها\n')
+    (data_dir / 'fiqh' / 'zakah.txt').write_text('كتاب الزكاة\n')
+    (data_dir / 'notes.md').write_text('English notes about prayer\n')
+    (data_dir / 'image.bin').write_bytes(b'\0\1\2')
+    index = NgramIndex(tmp_path / 'index', data_dir)
+    index.build()
+    return data_dir, index
+
+
+def search(data_dir: Path, index: NgramIndex, query: str, filters=None):
+    async def collect():
+        processor = stream_search(
+            query,
+            '.',
+            filters or [],
+            data_dir,
+            ngram_index=index,
+            literals=build_literals('smart', query),
+        )
+        return processor, [event async for event in processor.process()]
+
+    return asyncio.run(collect())
+
+
+def test_candidates_fold_diacritics_and_letter_variants(tmp_path: Path):
+    _, index = make_index(tmp_path)
+
+    assert index.candidates(build_literals('smart', 'الصلاة')) == ['fiqh/salah.txt', 'image.bin']
+    assert index.candidates(build_literals('ignore', 'احكام'), include_opaque=False) == [
+        'fiqh/salah.txt'
+    ]
+    assert index.candidates(build_literals('smart', 'PRAYER'), include_opaque=False) == ['notes.md']
+
+
+def test_candidates_unprunable_and_missing(tmp_path: Path):
+    _, index = make_index(tmp_path)
+
+    assert index.candidates(build_literals('smart', 'في')) is None
+    assert index.candidates(build_literals('smart', 'الحج'), include_opaque=False) == []
+    assert index.candidates(build_literals('smart', 'الحج')) == ['image.bin']
+
+
+def test_update_and_remove_keep_index_current(tmp_path: Path):
+    data_dir, index = make_index(tmp_path)
+    changed = data_dir / 'fiqh' / 'zakah.txt'
+    changed.write_text('كتاب الصيام\n')
+    index.update([changed])
+    (data_dir / 'notes.md').unlink()
+    index.remove([data_dir / 'notes.md'])
+
+    assert index.candidates(build_literals('smart', 'الزكاة'), include_opaque=False) == []
+    assert index.candidates(build_literals('smart', 'الصيام')) == ['fiqh/zakah.txt', 'image.bin']
+    assert index.candidates(build_literals('smart', 'prayer'), include_opaque=False) == []
+
+    index.compact(force=True)
+    assert index.candidates(build_literals('smart', 'الصيام'), include_opaque=False) == [
+        'fiqh/zakah.txt'
+    ]
+
+
+def test_build_is_incremental(tmp_path: Path):
+    data_dir, index = make_index(tmp_path)
+    assert index.build().indexed == 0
+
+    touched = data_dir / 'notes.md'
+    os.utime(touched, ns=(0, 1))
+    report = index.build()
+
+    assert (report.indexed, report.total) == (1, 4)
+    assert index.is_complete()
+
+
+def test_stream_search_scans_only_candidates(tmp_path: Path):
+    data_dir, index = make_index(tmp_path)
+
+    processor, events = search(data_dir, index, 'الزكاة')
+    assert processor.command[-1] == 'fiqh/zakah.txt'
+    assert [e.path for e in events if isinstance(e, MatchRecord)] == ['fiqh/zakah.txt']
+
+    processor, events = search(data_dir, index, 'الحج', ['*.txt'])
+    assert processor.command == []
+    assert events == [SearchComplete()]
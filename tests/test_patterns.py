@@ -1,4 +1,11 @@
-from core.patterns import build_pattern, build_plain, build_ignore, build_require
+from core.patterns import (
+    build_ignore,
+    build_literals,
+    build_pattern,
+    build_plain,
+    build_require,
+    build_shadow,
+)
 
 
 def test_build_pattern_smart_no_pcre():
@@ -44,3 +51,31 @@ def test_build_ignore_contains_optional_marks():
 def test_build_require_contains_plus_only_if_typed():
     assert '[\\p{M}]+' in build_require('العَر')
     assert '\\p{M}' not in build_require('العربية')
+
+
+def test_build_literals_fold_marks_and_variants():
+    assert build_literals('smart', 'الصَّلاة') == build_literals('ignore', 'إلصلـاه')
+    assert build_literals('require', 'Hello World') == ['hello', 'world']
+    assert build_literals('regex', 'a.*b') == []
+
+
+def test_build_ignore_letters_take_marks_and_tatweel():
+    assert build_ignore('عَلِم a') == (
+        '(?:ع[\\p{M}\\x{0640}]*)(?:ل[\\p{M}\\x{0640}]*)(?:م[\\p{M}\\x{0640}]*).*?a'
+    )
+
+
+def test_build_require_only_marked_letters_need_marks():
+    assert build_require('عَلم') == '(?:ع[\\p{M}]+)لم'
+    # a mark after a non-Arabic letter is dropped
+    assert build_require('e\u0301') == 'e'
+
+
+def test_build_pattern_drops_punctuation_and_caches():
+    assert build_pattern('smart', '  «تة»!  ') == ('[تة][ةته]', False)
+    assert build_pattern('smart', 'تة') is build_pattern('smart', 'تة')
+
+
+def test_build_shadow_drops_marks_and_tatweel():
+    assert build_shadow('الصَّلـاة') == build_plain('الصلاة')
+    assert '\\p{M}' not in build_shadow('عَلَى')
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+from core.extract import TextCache
+from core.preextract import iter_extractable, preextract
+
+
+def make_corpus(tmp_path: Path) -> tuple[Path, TextCache]:
+    data_dir = tmp_path / 'data'
+    (data_dir / 'books').mkdir(parents=True)
+    (data_dir / '.hidden').mkdir()
+    (data_dir / 'books' / 'a.pdf').write_bytes(b'%PDF')
+    (data_dir / 'books' / 'b.docx').write_bytes(b'PK')
+    (data_dir / 'notes.txt').write_text('plain')
+    (data_dir / '.hidden' / 'c.pdf').write_bytes(b'%PDF')
+    return data_dir, TextCache(tmp_path / 'cache', data_dir)
+
+
+def test_iter_extractable_skips_plain_and_hidden_files(tmp_path: Path):
+    data_dir, _ = make_corpus(tmp_path)
+
+    found = sorted(p.relative_to(data_dir).as_posix() for p in iter_extractable(data_dir))
+
+    assert found == ['books/a.pdf', 'books/b.docx']
+
+
+def test_preextract_skips_fresh_entries_and_marks_complete(tmp_path: Path):
+    data_dir, cache = make_corpus(tmp_path)
+    cache.put(data_dir / 'books' / 'a.pdf', 'a')
+    cache.put(data_dir / 'books' / 'b.docx', 'b')
+
+    report = preextract(cache, workers=1)
+
+    assert (report.total, report.skipped, report.extracted) == (2, 2, 0)
+    assert cache.is_complete()
+
+
+def test_preextract_removes_entries_of_deleted_files(tmp_path: Path):
+    data_dir, cache = make_corpus(tmp_path)
+    cache.put(data_dir / 'books' / 'a.pdf', 'a')
+    cache.put(data_dir / 'books' / 'b.docx', 'b')
+    (data_dir / 'books' / 'b.docx').unlink()
+
+    report = preextract(cache, workers=1)
+
+    assert report.removed == 1
+    assert set(cache.entries()) == {'books/a.pdf'}
+    assert cache.is_complete()
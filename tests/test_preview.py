@@ -0,0 +1,287 @@
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import core.extract
+from core import FileRequest, file_response, file_response_async, preview
+from core.extract import CONVERTER_LIMITS, TextCache
+from core.preview import LineIndex, line_window, preview_window
+
+
+def _numbered(path: Path, count: int, newline: str = '\n') -> Path:
+    path.write_text(''.join(f'line {i}{newline}' for i in range(1, count + 1)), newline='')
+    return path
+
+
+@pytest.mark.parametrize('content', [b'', b'a', b'a\n', b'a\nb', b'a\nb\n', b'\n\n', b'a\r\nb\r\n'])
+def test_line_index_counts_lines_like_splitlines(tmp_path: Path, content: bytes):
+    path = tmp_path / 'f.txt'
+    path.write_bytes(content)
+
+    index = LineIndex.build(path)
+
+    assert len(index) == len(content.decode().splitlines())
+    assert (
+        list(index.offsets[: len(index)])
+        == [0, *(i + 1 for i, byte in enumerate(content) if byte == ord('\n'))][: len(index)]
+    )
+
+
+def test_line_index_spans_read_chunks(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr('core.preview._READ_CHUNK', 7)
+    path = _numbered(tmp_path / 'f.txt', 50)
+
+    lines, start, total = preview_window(path, cursor=20, limit=3)
+
+    assert total == 50
+    assert start == 20
+    assert lines == ['line 20', 'line 21', 'line 22']
+
+
+def test_line_window_centers_and_pages():
+    assert line_window(1000, line_number=500, limit=10) == (494, 504)
+    assert line_window(1000, line_number=2, limit=10) == (0, 10)
+    assert line_window(1000, line_number=999, limit=10) == (990, 1000)
+    assert line_window(1000, cursor=11, limit=10) == (10, 20)
+    assert line_window(1000, cursor=11, direction='before', limit=10) == (0, 10)
+    assert line_window(1000, cursor=5, direction='before', limit=10) == (0, 4)
+    assert line_window(5, limit=10) == (0, 5)
+
+
+def test_preview_window_strips_carriage_returns(tmp_path: Path):
+    path = _numbered(tmp_path / 'f.txt', 5, newline='\r\n')
+
+    lines, start, total = preview_window(path, line_number=3, limit=3)
+
+    assert (lines, start, total) == (['line 2', 'line 3', 'line 4'], 2, 5)
+
+
+def test_preview_window_reads_cached_extraction(tmp_path: Path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    cache = TextCache(tmp_path / 'cache', data_dir)
+    cache.put(source, 'one\ntwo\nthree\n')
+
+    lines, start, total = preview_window(source, cache, cursor=2, limit=5)
+
+    assert (lines, start, total) == (['two', 'three'], 2, 3)
+
+
+def test_file_response_pages_in_both_directions(tmp_path: Path):
+    _numbered(tmp_path / 'big.txt', 1000)
+
+    page = file_response(tmp_path, FileRequest(path='big.txt', line_number=500, limit=100))
+    assert page.start_line == 450
+    assert page.lines[50] == 'line 500'
+    assert page.total_lines == 1000
+    assert (page.prev_cursor, page.next_cursor) == (450, 550)
+
+    after = file_response(tmp_path, FileRequest(path='big.txt', cursor=page.next_cursor, limit=100))
+    assert after.lines[0] == 'line 550'
+    before = file_response(
+        tmp_path,
+        FileRequest(path='big.txt', cursor=page.prev_cursor, direction='before', limit=500),
+    )
+    assert (before.start_line, before.lines[-1]) == (1, 'line 449')
+    assert before.prev_cursor is None
+
+    last = file_response(tmp_path, FileRequest(path='big.txt', cursor=901, limit=100))
+    assert last.next_cursor is None
+
+
+def test_file_response_without_window_returns_whole_file(tmp_path: Path):
+    _numbered(tmp_path / 'small.txt', 3)
+
+    response = file_response(tmp_path, FileRequest(path='small.txt'))
+
+    assert response.lines == ['line 1', 'line 2', 'line 3']
+    assert response.total_lines is None
+
+
+def _indexed_cache(tmp_path: Path, monkeypatch) -> tuple[Path, TextCache]:
+    monkeypatch.setattr('core.preview.PERSIST_MIN_BYTES', 0)
+    monkeypatch.setattr('core.preview._indexes', type(preview._indexes)())
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    return data_dir, TextCache(tmp_path / 'cache', data_dir)
+
+
+def test_line_index_is_persisted_and_reused(tmp_path: Path, monkeypatch):
+    data_dir, cache = _indexed_cache(tmp_path, monkeypatch)
+    path = _numbered(data_dir / 'log.txt', 100)
+
+    first = preview_window(path, cache, line_number=60, limit=5)
+    sidecar = cache.index_path(path)
+    assert sidecar is not None and sidecar.exists()
+
+    preview._indexes.clear()
+    monkeypatch.setattr(LineIndex, 'build', None)
+    assert preview_window(path, cache, line_number=60, limit=5) == first
+
+
+def test_truncated_line_index_sidecar_is_ignored(tmp_path: Path):
+    path = _numbered(tmp_path / 'log.txt', 10)
+    sidecar = tmp_path / 'log.lines'
+    LineIndex.build(path).save(sidecar, path.stat())
+    sidecar.write_bytes(sidecar.read_bytes()[:-3])
+
+    assert LineIndex.load(sidecar, path.stat()) is None
+
+
+def test_persisted_line_index_is_rebuilt_when_file_changes(tmp_path: Path, monkeypatch):
+    data_dir, cache = _indexed_cache(tmp_path, monkeypatch)
+    path = _numbered(data_dir / 'log.txt', 100)
+    preview_window(path, cache, limit=5)
+
+    _numbered(path, 10)
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000_000))
+
+    lines, _, total = preview_window(path, cache, cursor=9, limit=5)
+    assert (lines, total) == (['line 9', 'line 10'], 10)
+
+
+def test_discard_removes_persisted_indexes(tmp_path: Path, monkeypatch):
+    data_dir, cache = _indexed_cache(tmp_path, monkeypatch)
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    cache.put(source, 'one\ntwo\n')
+    preview_window(source, cache, limit=5)
+    text_index = cache.index_path(cache.text_path('book.pdf'))
+    assert text_index is not None and text_index.exists()
+
+    cache.discard(source)
+
+    assert not text_index.exists()
+
+
+def test_evicted_pdf_is_previewed_from_its_pages(tmp_path: Path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    pages = [''.join(f'p{page} l{i}\n' for i in range(1, 11)) + '\f' for page in range(1, 31)]
+    # too small to keep the text: only the page map survives the put
+    cache = TextCache(tmp_path / 'cache', data_dir, max_bytes=1)
+    cache.put(source, ''.join(pages))
+    assert cache.fresh_path(source) is None
+    converted = []
+
+    def fake_extract_pages(path: Path, first: int, last: int) -> str:
+        converted.append((first, last))
+        return ''.join(pages[first - 1 : last])
+
+    monkeypatch.setattr(preview, 'extract_pages', fake_extract_pages)
+    monkeypatch.setattr(preview, 'extract_text', None)
+
+    lines, start, total = preview_window(source, cache, line_number=155, limit=6)
+
+    assert converted == [(16, 16)]
+    assert (start, total) == (152, 300)
+    assert lines == ['p16 l2', 'p16 l3', 'p16 l4', 'p16 l5', 'p16 l6', 'p16 l7']
+
+    lines, start, _ = preview_window(source, cache, cursor=159, limit=4)
+
+    assert converted[-1] == (16, 17)
+    assert lines == ['p16 l9', 'p16 l10', 'p17 l1', 'p17 l2']
+
+
+def test_async_preview_converts_pages_under_converter_limits(tmp_path: Path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    cache = TextCache(tmp_path / 'cache', data_dir, max_bytes=1)
+    cache.put(source, ''.join(f'page {page}\n\f' for page in range(1, 11)))
+    converted = []
+
+    def fake_command(path: Path, first: int, last: int) -> list[str]:
+        converted.append((first, last))
+        code = f'import time; time.sleep(0.3); print("page {first}", end="\\n\\f")'
+        return [sys.executable, '-c', code]
+
+    monkeypatch.setattr(core.extract, 'pages_command', fake_command)
+    monkeypatch.setattr(preview, 'extract_pages', None)
+    monkeypatch.setitem(CONVERTER_LIMITS, sys.executable, 1)
+
+    async def run():
+        requests = [FileRequest(path='book.pdf', line_number=n, limit=1) for n in (3, 7)]
+        return await asyncio.gather(*(file_response_async(data_dir, r, cache) for r in requests))
+
+    started = time.monotonic()
+    first, second = asyncio.run(run())
+
+    # one conversion at a time: the second waits for the first one's slot
+    assert time.monotonic() - started >= 0.6
+    assert sorted(converted) == [(3, 3), (7, 7)]
+    assert (first.lines, first.start_line, second.lines) == (['page 3'], 3, ['page 7'])
+
+
+def test_pdf_windows_match_the_cached_text_on_every_page(tmp_path: Path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    # pages of as many lines, blank ones among them and last, as pdftotext lays them out
+    sizes = [3, 1, 0, 4, 2] * 3 + [0]
+    pages = [
+        ''.join(f'p{page} l{i}\n' for i in range(size)) + '\f' for page, size in enumerate(sizes, 1)
+    ]
+
+    async def fake_extract_pages(path: Path, first: int, last: int) -> str | None:
+        return ''.join(pages[first - 1 : last]) if first <= len(pages) else None
+
+    monkeypatch.setattr(preview, 'extract_pages_async', fake_extract_pages)
+    cached = TextCache(tmp_path / 'cached', data_dir)
+    cached.put(source, ''.join(pages))
+    evicted = TextCache(tmp_path / 'evicted', data_dir, max_bytes=1)
+    evicted.put(source, ''.join(pages))
+
+    total = sum(sizes)
+    assert preview_window(source, cached, limit=total + 5) == (
+        [f'p{page} l{i}' for page, size in enumerate(sizes, 1) for i in range(size)],
+        1,
+        total,
+    )
+    for line in range(1, total + 1):
+        expected = preview_window(source, cached, line_number=line, limit=5)
+        paged = asyncio.run(preview.pages_window_async(source, evicted, line_number=line, limit=5))
+
+        assert paged == expected
+
+
+def test_async_preview_without_page_map_converts_once_into_cache(tmp_path: Path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    source = data_dir / 'book.pdf'
+    source.write_bytes(b'%PDF')
+    text = ''.join(f'page {page}\n\f' for page in range(1, 601))
+    converted = []
+
+    async def fake_extract_text(path: Path, timeout: float) -> str:
+        converted.append(path)
+        return text
+
+    monkeypatch.setattr(core.extract, 'extract_text_async', fake_extract_text)
+    monkeypatch.setattr(preview, 'extract_pages_async', None)
+    cache = TextCache(tmp_path / 'cache', data_dir)
+
+    async def run():
+        request = FileRequest(path='book.pdf', line_number=600, limit=3)
+        return [await file_response_async(data_dir, request, cache) for _ in range(2)]
+
+    first, second = asyncio.run(run())
+
+    assert converted == [source]
+    assert first == second
+    assert (first.lines, first.start_line, first.total_lines) == (
+        ['page 598', 'page 599', 'page 600'],
+        598,
+        600,
+    )
+    assert cache.page_map(source) is not None
@@ -0,0 +1,139 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import orjson
+
+from core import ResultStreamProcessor
+from core.results import CACHE_LOOKUPS, ResultCache, SearchFlights
+from core.schemas import MatchRecord, SearchComplete
+
+
+def _match(path: str = 'a.txt') -> MatchRecord:
+    return MatchRecord(path=path, line_number=1, lines='x')
+
+
+def _rg_command(tmp_path: Path) -> list[str]:
+    # stands in for rg: prints one match and counts its runs
+    event = orjson.dumps(
+        {
+            'type': 'match',
+            'data': {'path': {'text': 'a.txt'}, 'lines': {'text': 'hit\n'}, 'line_number': 3},
+        }
+    ).decode()
+    script = f"open({str(tmp_path / 'runs')!r}, 'a').write('.'); print({event!r})"
+    return [sys.executable, '-c', script]
+
+
+async def _collect(processor: ResultStreamProcessor) -> list:
+    return [event async for event in processor.process()]
+
+
+def test_result_cache_respects_generation_and_ttl():
+    cache = ResultCache(ttl=60)
+    events = [_match(), SearchComplete()]
+    cache.put('k', events, generation=1)
+    assert cache.get('k', 1) == tuple(events)
+    assert cache.get('k', 2) is None
+    assert len(cache) == 0
+
+    cache.put('k', events)
+    assert cache.get('k') == tuple(events)
+    cache.ttl = 0
+    assert cache.get('k') is None
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=10, max_matches=4)
+    cache.put('a', [_match(), _match()])
+    cache.put('b', [_match(), _match()])
+    assert cache.get('a') is not None
+    cache.put('c', [_match()])
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+    cache.put('huge', [_match()] * 5)
+    assert cache.get('huge') is None
+
+
+def test_processor_replays_cached_results(tmp_path: Path):
+    cache = ResultCache()
+    command = _rg_command(tmp_path)
+    hits = CACHE_LOOKUPS.get(outcome='hit')
+
+    first = asyncio.run(
+        _collect(ResultStreamProcessor(command, tmp_path, result_cache=cache, generation=7))
+    )
+    second = asyncio.run(
+        _collect(ResultStreamProcessor(command, tmp_path, result_cache=cache, generation=7))
+    )
+    assert [type(e) for e in first] == [MatchRecord, SearchComplete]
+    assert first[0] == second[0]
+    # replays keep the timings of the run they recorded
+    assert second[1].stats == first[1].stats.model_copy(update={'cached': True})
+    assert (tmp_path / 'runs').read_text() == '.'
+    assert CACHE_LOOKUPS.get(outcome='hit') == hits + 1
+
+    asyncio.run(
+        _collect(ResultStreamProcessor(command, tmp_path, result_cache=cache, generation=8))
+    )
+    assert (tmp_path / 'runs').read_text() == '..'
+
+
+def _slow_command(tmp_path: Path) -> list[str]:
+    event = orjson.dumps(
+        {'type': 'match', 'data': {'path': {'text': 'a.txt'}, 'lines': {'text': 'hit\n'}}}
+    ).decode()
+    script = (
+        'import sys, time\n'
+        f"open({str(tmp_path / 'runs')!r}, 'a').write('.')\n"
+        f'print({event!r}, flush=True)\n'
+        'time.sleep(0.3)\n'
+        f'print({event!r})\n'
+    )
+    return [sys.executable, '-c', script]
+
+
+def test_identical_searches_share_one_process(tmp_path: Path):
+    flights = SearchFlights()
+    command = _slow_command(tmp_path)
+
+    async def run() -> tuple[list, list]:
+        first = ResultStreamProcessor(command, tmp_path, flights=flights)
+        late = ResultStreamProcessor(command, tmp_path, flights=flights)
+        first_task = asyncio.create_task(_collect(first))
+        await asyncio.sleep(0.2)
+        late_events = await _collect(late)
+        return await first_task, late_events
+
+    first, late = asyncio.run(run())
+    assert [type(e) for e in first] == [MatchRecord, MatchRecord, SearchComplete]
+    assert late == first
+    assert (tmp_path / 'runs').read_text() == '.'
+    assert len(flights) == 0
+
+
+def test_shared_search_stops_with_last_subscriber(tmp_path: Path):
+    flights = SearchFlights()
+    command = _slow_command(tmp_path)
+
+    async def run() -> list:
+        leaving = ResultStreamProcessor(command, tmp_path, flights=flights)
+        staying = ResultStreamProcessor(command, tmp_path, flights=flights)
+        leaving_task = asyncio.create_task(_collect(leaving))
+        staying_task = asyncio.create_task(_collect(staying))
+        await asyncio.sleep(0.1)
+        await leaving.cancel()
+        await leaving_task
+        events = await staying_task
+
+        abandoned = ResultStreamProcessor(command, tmp_path, flights=flights)
+        abandoned_task = asyncio.create_task(_collect(abandoned))
+        await asyncio.sleep(0.1)
+        await abandoned.cancel()
+        assert await abandoned_task == []
+        return events
+
+    events = asyncio.run(run())
+    assert [type(e) for e in events] == [MatchRecord, MatchRecord, SearchComplete]
+    assert len(flights) == 0
@@ -0,0 +1,86 @@
+import asyncio
+import sys
+from base64 import b64encode
+from pathlib import Path
+
+import orjson
+
+from core import ResultStreamProcessor, SearchComplete
+from core.rgjson import match_lines, parse_event, read_lines, text_of
+
+
+def _reader(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def test_parse_event_skips_decoding_unused_events():
+    # not even valid JSON: `end` events are never decoded
+    assert parse_event(b'{"type":"end","data":{broken') == ('end', {})
+    assert parse_event(b'{"type":"summary","data":{"stats":{}}}') == ('summary', {'stats': {}})
+    assert parse_event(b'{"data":{"x":1},"type":"begin"}') == ('begin', {'x': 1})
+    assert parse_event(b'{"type":"match","data":{"line_number":3}}') == (
+        'match',
+        {'line_number': 3},
+    )
+    assert parse_event(b'not json') is None
+
+
+def test_bytes_fields_are_decoded_and_offsets_moved():
+    raw = b'\xff\xfe ' + 'كلمة'.encode() + b'\n'
+    data = {
+        'lines': {'bytes': b64encode(raw).decode()},
+        'submatches': [
+            {'match': {'bytes': b64encode('كلمة'.encode()).decode()}, 'start': 3, 'end': 11}
+        ],
+    }
+    lines, submatches = match_lines(data)
+    assert lines == '�� كلمة\n'
+    [item] = submatches
+    assert item['match'] == {'text': 'كلمة'}
+    assert lines.encode()[item['start'] : item['end']].decode() == 'كلمة'
+    assert text_of({'bytes': b64encode(b'a\xffb').decode()}) == 'a�b'
+
+
+def test_read_lines_joins_lines_across_chunks():
+    long_line = b'x' * 300_000
+
+    async def collect() -> list[bytes]:
+        reader = _reader(b'one\n' + long_line + b'\ntwo\nthree')
+        return [line async for lines in read_lines(reader, chunk_size=1000) for line in lines]
+
+    assert asyncio.run(collect()) == [b'one', long_line, b'two', b'three']
+
+
+def test_processor_handles_non_utf8_lines_and_long_output(tmp_path: Path):
+    raw = b'\xff ' + 'الإبرة'.encode() + b'\n'
+    events = [
+        {'type': 'begin', 'data': {'path': {'text': 'a.txt'}}},
+        {
+            'type': 'match',
+            'data': {
+                'path': {'text': 'a.txt'},
+                'lines': {'bytes': b64encode(raw).decode()},
+                'line_number': 1,
+                'submatches': [{'match': {'text': 'الإبرة'}, 'start': 2, 'end': 14}],
+            },
+        },
+        {'type': 'context', 'data': {'path': {'text': 'a.txt'}, 'lines': {'text': 'y' * 100_000}}},
+        {'type': 'end', 'data': {'path': {'text': 'a.txt'}}},
+        {'type': 'summary', 'data': {}},
+    ]
+    script = tmp_path / 'rg.py'
+    output = b'\n'.join(orjson.dumps(event) for event in events)
+    script.write_text(f'import sys\nsys.stdout.buffer.write({output!r})\n')
+
+    async def collect() -> list:
+        processor = ResultStreamProcessor([sys.executable, str(script)], tmp_path, highlight=True)
+        return [e async for e in processor.process()]
+
+    match, complete = asyncio.run(collect())
+    assert isinstance(complete, SearchComplete)
+    assert match.lines == '� الإبرة\n'
+    assert match.context_after == 'y' * 100_000
+    assert match.highlighted_text == '� <span class="bg-yellow-200">الإبرة</span>'
@@ -0,0 +1,84 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from core import (
+    SEARCH_SECONDS,
+    SEARCH_SPAWN,
+    MatchRecord,
+    SearchComplete,
+    ShardedStreamProcessor,
+    stream_search,
+)
+from core.metrics import render
+from core.patterns import build_pattern
+from core.sharding import invalidate_shard_plans
+
+
+@pytest.fixture
+def corpus(tmp_path: Path) -> Path:
+    for shelf in ('a', 'b'):
+        for book in range(3):
+            path = tmp_path / shelf / f'{book}.txt'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('مقدمة\nقال الشيخ\nخاتمة\n' * (book + 1))
+    invalidate_shard_plans()
+    return tmp_path
+
+
+def _search(data_dir: Path, mode: str | None, **kwargs) -> list:
+    pattern, use_pcre = build_pattern(mode or 'smart', 'الشيخ')
+    processor = stream_search(pattern, '.', [], data_dir, use_pcre=use_pcre, mode=mode, **kwargs)
+    if kwargs.get('shards', 1) > 1:
+        assert isinstance(processor, ShardedStreamProcessor)
+
+    async def run() -> list:
+        return [event async for event in processor.process()]
+
+    return asyncio.run(run())
+
+
+def test_rg_search_reports_its_stats(corpus: Path):
+    recorded = SEARCH_SECONDS.count(mode='ignore', engine='rg')
+    spawned = SEARCH_SPAWN.count(mode='ignore', engine='rg')
+
+    *matches, complete = _search(corpus, 'ignore')
+    stats = complete.stats
+    assert isinstance(complete, SearchComplete)
+    assert (stats.engine, stats.mode) == ('rg', 'ignore')
+    assert stats.matches == len(matches) == 12
+    assert stats.files_searched == 6
+    assert stats.bytes_searched == sum(p.stat().st_size for p in corpus.rglob('*.txt'))
+    assert stats.bytes_streamed > 0 and stats.engine_seconds is not None
+    assert 0 < stats.spawn_seconds <= stats.first_match_seconds <= stats.elapsed_seconds
+    assert SEARCH_SECONDS.count(mode='ignore', engine='rg') == recorded + 1
+    assert SEARCH_SPAWN.count(mode='ignore', engine='rg') == spawned + 1
+    assert 'baheth_search_duration_seconds_count{engine="rg",mode="ignore"}' in render()
+
+
+def test_searches_without_a_mode_are_not_recorded(corpus: Path):
+    total = sum(sum(counts) for counts in SEARCH_SECONDS.counts.values())
+
+    *_, complete = _search(corpus, None)
+    assert complete.stats.matches == 12
+    assert sum(sum(counts) for counts in SEARCH_SECONDS.counts.values()) == total
+
+
+def test_native_search_counts_the_files_it_scanned(corpus: Path):
+    *matches, complete = _search(corpus, 'smart', engine='native')
+    assert complete.stats.engine == 'native'
+    assert complete.stats.spawn_seconds is None
+    assert complete.stats.matches == len(matches) == 12
+    assert complete.stats.files_searched == 6
+
+
+def test_sharded_search_merges_shard_stats(corpus: Path):
+    recorded = SEARCH_SECONDS.count(mode='require', engine='rg')
+
+    *matches, complete = _search(corpus, 'require', shards=2)
+    assert all(isinstance(event, MatchRecord) for event in matches)
+    assert complete.stats.matches == len(matches) == 12
+    assert complete.stats.files_searched == 6
+    # one observation for the search, none for its shards
+    assert SEARCH_SECONDS.count(mode='require', engine='rg') == recorded + 1
@@ -0,0 +1,171 @@
+import asyncio
+from pathlib import Path
+
+from core import MatchRecord, stream_search
+from core.extract import TextCache
+from core.ngram import NgramIndex
+from core.patterns import build_literals, build_pattern, build_shadow
+from core.shadow import OffsetMap, ShadowCorpus, fold
+from core.watcher import CorpusUpdater
+
+
+def make_corpus(tmp_path: Path) -> tuple[Path, ShadowCorpus]:
+    data_dir = tmp_path / 'data'
+    (data_dir / 'fiqh').mkdir(parents=True)
+    (data_dir / 'fiqh' / 'salah.txt').write_text(
+        'مقدمة\nبابُ الصَّلاةِ وأحكامها\nكتابُ الصَّـــلاة في السفر\nلا شيء\nَالصلاة أولا\n'
+    )
+    # invalid UTF-8 ahead of the match
+    (data_dir / 'notes.md').write_bytes(b'bad \xff byte ' + 'الصَّلاة here\n'.encode())
+    (data_dir / 'image.bin').write_bytes(b'\0\1\2')
+    shadow = ShadowCorpus(tmp_path / 'shadow', data_dir, TextCache(tmp_path / 'extract', data_dir))
+    shadow.build()
+    return data_dir, shadow
+
+
+def search(data_dir: Path, query: str, shadow: ShadowCorpus | None = None, **kwargs):
+    if shadow is not None:
+        pattern, pcre = build_shadow(query), False
+    else:
+        pattern, pcre = build_pattern('ignore', query)
+
+    async def collect():
+        processor = stream_search(
+            pattern, '.', [], data_dir, use_pcre=pcre, shadow=shadow, **kwargs
+        )
+        return [event async for event in processor.process() if isinstance(event, MatchRecord)]
+
+    return sorted(
+        (
+            record.path,
+            record.line_number,
+            record.lines,
+            record.submatches,
+            record.highlighted_text,
+            record.context_before,
+            record.context_after,
+        )
+        for record in asyncio.run(collect())
+    )
+
+
+def test_fold_strips_marks_and_maps_offsets_back():
+    original = 'بابُ الصَّلاةِ\n'.encode()
+    offsets = OffsetMap()
+    folded = fold(original, offsets)
+
+    assert folded == 'باب الصلاة\n'.encode()
+    start = folded.index('الصلاة'.encode())
+    end = start + len('الصلاة'.encode())
+    # the marks after the last letter go with the match, the ones before it do not
+    assert original[offsets.original(start) : offsets.original(end)] == 'الصَّلاةِ'.encode()
+    assert OffsetMap.from_bytes(offsets.to_bytes()).removed == offsets.removed
+
+
+def test_fold_keeps_unmarked_text_and_invalid_bytes():
+    offsets = OffsetMap()
+    assert fold(b'plain \xff text\n', offsets, start=10) == b'plain \xff text\n'
+    assert not offsets
+    assert (
+        fold('\xff'.encode('latin-1') + 'عَ'.encode(), offsets, start=10) == b'\xff' + 'ع'.encode()
+    )
+    assert list(offsets.positions) == [13]
+
+
+def test_fold_keeps_marks_after_non_arabic_characters():
+    offsets = OffsetMap()
+    text = 'cafe\u0301 ـَ بَـاب'
+
+    assert fold(text.encode(), offsets).decode() == 'cafe\u0301 ـَ باب'
+    assert len(offsets) == 1
+
+
+def test_build_folds_text_and_skips_binary(tmp_path: Path):
+    _, shadow = make_corpus(tmp_path)
+
+    assert shadow.is_complete()
+    assert shadow.shadow_path('fiqh/salah.txt').read_text().splitlines()[1] == 'باب الصلاة وأحكامها'
+    assert not shadow.shadow_path('image.bin').exists()
+    assert shadow.build().updated == 0
+
+
+def test_shadow_search_matches_pcre_ignore_search(tmp_path: Path):
+    data_dir, shadow = make_corpus(tmp_path)
+
+    (data_dir / 'latin.txt').write_text('cafe\u0301s الصَّلاة\n')
+    shadow.build()
+
+    for query in ('الصلاة', 'صلاه في', 'احكام', 'here'):
+        expected = search(data_dir, query)
+        assert expected
+        assert search(data_dir, query, shadow) == expected
+    # the pattern only skips marks after Arabic letters
+    assert search(data_dir, 'cafes', shadow) == search(data_dir, 'cafes') == []
+
+
+def test_shadow_search_reads_documents_through_extracted_text(tmp_path: Path):
+    data_dir, shadow = make_corpus(tmp_path)
+    document = data_dir / 'book.html'
+    document.write_text('<p>ignored</p>')
+    shadow.text_cache.put(document, 'عنوان\nفي فضلِ الصَّلاةِ\n')
+    shadow.build()
+
+    async def collect():
+        processor = stream_search(
+            build_shadow('فضل الصلاة'), '.', ['*.html'], data_dir, shadow=shadow
+        )
+        return [event async for event in processor.process() if isinstance(event, MatchRecord)]
+
+    (record,) = asyncio.run(collect())
+    assert (record.path, record.line_number) == ('./book.html', 2)
+    assert record.highlighted_text == 'في <span class="bg-yellow-200">فضلِ الصَّلاةِ</span>'
+
+
+def test_shadow_search_falls_back_to_folded_line_without_original(tmp_path: Path):
+    data_dir, shadow = make_corpus(tmp_path)
+    (data_dir / 'fiqh' / 'salah.txt').unlink()
+
+    found = search(data_dir, 'احكام', shadow)
+    assert [record[2] for record in found] == ['باب الصلاة وأحكامها\n']
+
+
+def test_shadow_search_empty_for_directory_without_shadows(tmp_path: Path):
+    data_dir, shadow = make_corpus(tmp_path)
+    (data_dir / 'empty').mkdir()
+
+    async def collect():
+        processor = stream_search(build_shadow('الصلاة'), 'empty', [], data_dir, shadow=shadow)
+        return processor.command, [event async for event in processor.process()]
+
+    command, events = asyncio.run(collect())
+    assert command == []
+    assert not any(isinstance(event, MatchRecord) for event in events)
+
+
+def test_shadow_search_with_index_candidates(tmp_path: Path):
+    data_dir, shadow = make_corpus(tmp_path)
+    index = NgramIndex(tmp_path / 'index', data_dir)
+    index.build()
+
+    found = search(
+        data_dir,
+        'احكام',
+        shadow,
+        ngram_index=index,
+        literals=build_literals('ignore', 'احكام'),
+    )
+    assert [(path, line) for path, line, *_ in found] == [('fiqh/salah.txt', 2)]
+
+
+def test_watcher_keeps_shadow_current(tmp_path: Path):
+    data_dir, shadow = make_corpus(tmp_path)
+    updater = CorpusUpdater(data_dir, shadow=shadow)
+    changed = data_dir / 'fiqh' / 'salah.txt'
+    changed.write_text('كتاب الصِّيام\n')
+    updater.apply([changed, data_dir / 'notes.md'])
+    (data_dir / 'notes.md').unlink()
+    updater.apply([data_dir / 'notes.md'])
+
+    assert shadow.shadow_path('fiqh/salah.txt').read_text() == 'كتاب الصيام\n'
+    assert not shadow.shadow_path('notes.md').exists()
+    assert 'notes.md' not in shadow.files()
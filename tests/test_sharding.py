@@ -0,0 +1,126 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from core import MatchRecord, SearchComplete, SearchError, ShardedStreamProcessor, stream_search
+from core.sharding import merge_shards, plan_shards
+
+
+def _write(path: Path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+
+
+def test_plan_shards_balances_and_splits_heavy_subtrees(tmp_path: Path):
+    _write(tmp_path / 'heavy' / 'a' / 'one.txt', 200)
+    _write(tmp_path / 'heavy' / 'b' / 'two.txt', 200)
+    for name in ('c', 'd', 'e'):
+        _write(tmp_path / name / 'three.txt', 100)
+    _write(tmp_path / 'loose.txt', 100)
+    _write(tmp_path / 'skipped.pdf', 100)
+    _write(tmp_path / '.hidden' / 'four.txt', 1000)
+
+    plan = plan_shards(tmp_path, '.', 2, lambda path: path.endswith('.txt'))
+
+    weights = {'heavy/a': 200, 'heavy/b': 200, 'c': 100, 'd': 100, 'e': 100, 'loose.txt': 100}
+    roots = [root.removeprefix('./') for shard in plan for root in shard]
+    assert sorted(roots) == sorted(weights)
+    assert [sum(weights[root.removeprefix('./')] for root in shard) for shard in plan] == [400, 400]
+
+
+def test_plan_shards_within_a_directory(tmp_path: Path):
+    for name in ('a', 'b', 'c'):
+        _write(tmp_path / 'books' / name / 'one.txt', 100)
+
+    plan = plan_shards(tmp_path, 'books', 3, lambda _path: True)
+
+    assert sorted(plan) == [['books/a'], ['books/b'], ['books/c']]
+
+
+def test_plan_shards_skips_unsplittable_directories(tmp_path: Path):
+    _write(tmp_path / 'only.txt', 10)
+
+    assert plan_shards(tmp_path, '.', 4, lambda _path: True) is None
+    assert plan_shards(tmp_path, '.', 1, lambda _path: True) is None
+
+
+async def _events(*events, delay: float = 0):
+    for event in events:
+        await asyncio.sleep(delay)
+        yield event
+
+
+def _match(path: str, line: int) -> MatchRecord:
+    return MatchRecord(path=path, line_number=line, lines='', submatches=[])
+
+
+def test_merge_shards_keeps_each_file_contiguous():
+    async def run():
+        first = _events(
+            _match('a', 1), _match('a', 2), _match('a', 3), SearchComplete(), delay=0.01
+        )
+        second = _events(_match('b', 1), _match('b', 2), SearchComplete())
+        return [event async for event in merge_shards([first, second])]
+
+    events = asyncio.run(run())
+
+    paths = [event.path for event in events[:-1]]
+    assert sorted(paths) == ['a', 'a', 'a', 'b', 'b']
+    assert paths in (['a', 'a', 'a', 'b', 'b'], ['b', 'b', 'a', 'a', 'a'])
+    assert isinstance(events[-1], SearchComplete)
+
+
+def test_merge_shards_stops_at_first_error_without_completing():
+    async def run():
+        failing = _events(SearchError(error='boom'))
+        slow = _events(_match('a', 1), SearchComplete(), delay=1)
+        return [event async for event in merge_shards([failing, slow])]
+
+    assert [type(event) for event in asyncio.run(run())] == [SearchError]
+
+
+@pytest.mark.parametrize('directory', ['.', 'books'])
+def test_sharded_search_matches_single_search(tmp_path: Path, directory: str):
+    for book in range(6):
+        lines = [f'line {i}' for i in range(40)]
+        lines[5] = lines[25] = 'the needle is here'
+        target = tmp_path / 'books' / f'shelf{book % 3}' / f'book{book}.txt'
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text('\n'.join(lines) + '\n')
+    (tmp_path / 'books' / 'notes.md').write_text('a needle\n')
+
+    async def collect(shards: int):
+        processor = stream_search('needle', directory, [], tmp_path, shards=shards)
+        events = [event async for event in processor.process()]
+        return processor, events
+
+    single, single_events = asyncio.run(collect(1))
+    sharded, sharded_events = asyncio.run(collect(3))
+
+    assert isinstance(sharded, ShardedStreamProcessor)
+    assert len(sharded.shard_commands) > 1
+    assert not isinstance(single, ShardedStreamProcessor)
+
+    def key(event: MatchRecord):
+        return (event.path, event.line_number, event.context_before, event.context_after)
+
+    assert sorted(map(key, sharded_events[:-1])) == sorted(map(key, single_events[:-1]))
+    assert len(sharded_events) == 14
+    assert isinstance(sharded_events[-1], SearchComplete)
+
+
+def test_context_lines_do_not_cross_files(tmp_path: Path):
+    (tmp_path / 'a.txt').write_text('before a\nneedle a\n')
+    (tmp_path / 'b.txt').write_text('before b\nneedle b\nafter b\n')
+
+    async def run():
+        processor = stream_search('needle', '.', [], tmp_path)
+        return [event async for event in processor.process()]
+
+    matches = {event.path: event for event in asyncio.run(run())[:-1]}
+
+    assert matches['./a.txt'].context_before == 'before a'
+    assert matches['./a.txt'].context_after == ''
+    assert matches['./b.txt'].context_before == 'before b'
+    assert matches['./b.txt'].context_after == 'after b'
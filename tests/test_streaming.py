@@ -0,0 +1,89 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import orjson
+
+from core import ResultStreamProcessor
+from core.schemas import MatchRecord, SearchComplete, SearchMatch, SearchQueued
+from core.streaming import batch_events, encode_events
+
+
+def _match(line: int) -> MatchRecord:
+    return MatchRecord(path='a.txt', line_number=line, lines='x', submatches=[{'start': 0}])
+
+
+async def _batches(events, **kwargs) -> list[list]:
+    return [batch async for batch in batch_events(events, **kwargs)]
+
+
+def test_batches_flush_first_match_then_by_size():
+    async def source():
+        yield SearchQueued(position=1)
+        yield _match(0)
+        await asyncio.sleep(0.02)
+        for line in range(1, 20):
+            yield _match(line)
+        yield SearchComplete()
+
+    batches = asyncio.run(_batches(source(), size=3, interval=10))
+    flat = [event for batch in batches for event in batch]
+    assert batches[0] == flat[:2]
+    assert isinstance(flat[0], SearchQueued) and isinstance(flat[-1], SearchComplete)
+    assert [e.line_number for e in flat[1:-1]] == list(range(20))
+    assert max(len(batch) for batch in batches) == 3
+
+
+def test_batches_flush_after_interval():
+    async def source():
+        for line in range(4):
+            yield _match(line)
+            await asyncio.sleep(0.03)
+        yield SearchComplete()
+
+    batches = asyncio.run(_batches(source(), size=100, interval=0.05))
+    flat = [event for batch in batches for event in batch]
+    assert len(batches[0]) == 1
+    assert 2 < len(batches) < 6
+    assert [e.line_number for e in flat[:-1]] == [0, 1, 2, 3]
+
+
+def test_encode_events_matches_model_dump():
+    events = [_match(3), SearchComplete()]
+    frame = encode_events(events)
+    messages = frame.decode().split('\n\n')
+    assert messages[-1] == ''
+    assert [orjson.loads(m.removeprefix('data: ')) for m in messages[:-1]] == [
+        events[0].to_model().model_dump(),
+        events[1].model_dump(),
+    ]
+
+
+def test_parser_emits_slotted_records_that_convert_to_models(tmp_path: Path):
+    match = {
+        'type': 'match',
+        'data': {
+            'path': {'text': 'a.txt'},
+            'lines': {'text': 'a hit\n'},
+            'line_number': 2,
+            'submatches': [{'match': {'text': 'hit'}, 'start': 2, 'end': 5}],
+        },
+    }
+    events = [match, {'type': 'end', 'data': {}}]
+    lines = '\n'.join(orjson.dumps(event).decode() for event in events)
+    processor = ResultStreamProcessor([sys.executable, '-c', f'print({lines!r})'], tmp_path)
+
+    async def collect() -> list:
+        return [event async for event in processor.process()]
+
+    record, complete = asyncio.run(collect())
+
+    # no Pydantic model, nor a per-instance dict, per rg line
+    assert type(record) is MatchRecord and not hasattr(record, '__dict__')
+    assert isinstance(complete, SearchComplete)
+    model = record.to_model('req')
+    assert SearchMatch.model_validate(model.model_dump()) == model
+    assert (model.path, model.line_number, model.request_id) == ('a.txt', 2, 'req')
+    assert orjson.loads(encode_events([record]).removeprefix(b'data: ')) == (
+        record.to_model().model_dump()
+    )
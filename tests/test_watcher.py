@@ -0,0 +1,102 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import core
+from core import get_directories
+from core.ngram import NgramIndex
+from core.patterns import build_literals
+from core.shadow import ShadowCorpus
+from core.watcher import CorpusGeneration, CorpusUpdater, InotifyWatcher, PollingWatcher
+
+
+def test_generation_counts_and_expires(tmp_path: Path):
+    generation = CorpusGeneration(tmp_path / 'generation')
+    assert generation.current() is None
+
+    assert generation.bump() == 1
+    assert generation.bump() == 2
+    assert generation.current() == 2
+
+    os.utime(generation.path, (0, 0))
+    assert generation.current() is None
+
+
+def test_get_directories_follows_generation_instead_of_ttl(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(core, '_dir_cache', {})
+    (tmp_path / 'one').mkdir()
+    assert get_directories(tmp_path, ttl=0, generation=1) == ['.', 'one']
+
+    (tmp_path / 'two').mkdir()
+    assert get_directories(tmp_path, ttl=0, generation=1) == ['.', 'one']
+    assert sorted(get_directories(tmp_path, ttl=0, generation=2)) == ['.', 'one', 'two']
+
+
+def test_updater_applies_changes_and_removed_directories(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(core, '_dir_cache', {'stale': (0, [], None)})
+    data_dir = tmp_path / 'data'
+    (data_dir / 'old').mkdir(parents=True)
+    (data_dir / 'old' / 'a.txt').write_text('كتاب الزكاة')
+    index = NgramIndex(tmp_path / 'index', data_dir)
+    index.build()
+    generation = CorpusGeneration(tmp_path / 'generation')
+    updater = CorpusUpdater(data_dir, ngram_index=index, generation=generation)
+
+    (data_dir / 'old' / 'a.txt').unlink()
+    (data_dir / 'old').rmdir()
+    (data_dir / 'new').mkdir()
+    (data_dir / 'new' / 'b.txt').write_text('كتاب الصيام')
+    (data_dir / '.hidden').write_text('الصيام')
+    updater.apply([data_dir / 'old', data_dir / 'new', data_dir / '.hidden'])
+
+    assert set(index.files()) == {'new/b.txt'}
+    assert index.candidates(build_literals('smart', 'الصيام')) == ['new/b.txt']
+    assert core._dir_cache == {}
+    assert generation.current() == 1
+
+
+def test_updater_reconciles_overflow_with_deletions(tmp_path: Path):
+    data_dir = tmp_path / 'data'
+    (data_dir / 'books').mkdir(parents=True)
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        (data_dir / 'books' / name).write_text(f'كتاب {name}')
+    index = NgramIndex(tmp_path / 'index', data_dir)
+    index.build()
+    shadow = ShadowCorpus(tmp_path / 'shadow', data_dir)
+    shadow.build()
+    updater = CorpusUpdater(data_dir, ngram_index=index, shadow=shadow)
+
+    # deletions lost in an overflow, which reports the whole tree
+    (data_dir / 'books' / 'a.txt').unlink()
+    (data_dir / 'books' / 'b.txt').unlink()
+    updater.apply([data_dir])
+
+    assert set(index.files()) == {'books/c.txt'}
+    assert set(shadow.files()) == {'books/c.txt'}
+    assert not shadow.shadow_path('books/a.txt').exists()
+
+
+def test_polling_watcher_reports_changes(tmp_path: Path):
+    (tmp_path / 'a.txt').write_text('one')
+    watcher = PollingWatcher(tmp_path, interval=0.01)
+    (tmp_path / 'a.txt').write_text('changed')
+    (tmp_path / 'b.txt').write_text('new')
+
+    assert next(watcher.changes()) == {tmp_path / 'a.txt', tmp_path / 'b.txt'}
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux only')
+def test_inotify_watcher_tracks_new_directories(tmp_path: Path):
+    watcher = InotifyWatcher(tmp_path)
+    try:
+        changes = watcher.changes()
+        (tmp_path / 'sub').mkdir()
+        assert next(changes) == {tmp_path / 'sub'}
+
+        (tmp_path / 'sub' / 'a.txt').write_text('x')
+        (tmp_path / '.hidden').write_text('x')
+        assert next(changes) == {tmp_path / 'sub' / 'a.txt'}
+    finally:
+        watcher.close()
@@ -20,18 +20,27 @@ def collect_streaming(response):
 
 
 class FakeProcessor:
-    def __init__(self, payloads):
+    def __init__(self, payloads, hang=False):
         self._payloads = payloads
+        self._hang = hang
+        self.cancelled = False
 
     async def process(self):
         for p in self._payloads:
             yield p
+        if self._hang:
+            await asyncio.Event().wait()
+
+    async def cancel(self):
+        self.cancelled = True
 
 
 def patch_stream_search(monkeypatch, calls, *, include_pcre=False, payloads=None):
     payloads = payloads or []
 
-    def fake_stream_search(query, directory, file_filters, data_dir, rga_config, use_pcre=False):
+    def fake_stream_search(
+        query, directory, file_filters, data_dir, rga_config, use_pcre=False, **_kwargs
+    ):
         calls.append((query, directory, file_filters, data_dir, use_pcre) if include_pcre else (query, directory, file_filters, data_dir))
         return FakeProcessor(payloads)
 
@@ -65,6 +74,40 @@ def test_directories_endpoint_honors_limit(client, temp_data_dir):
     assert len(payload['directories']) == 3
 
 
+def test_directories_endpoint_clamps_depth(client, temp_data_dir):
+    (temp_data_dir / 'a' / 'b' / 'c' / 'd' / 'e').mkdir(parents=True)
+
+    response = client.get('/api/directories', {'max_depth': 50})
+    payload = json.loads(response.content)
+
+    assert 'a/b/c' in payload['directories']
+    assert 'a/b/c/d' not in payload['directories']
+
+
+def test_directory_children_endpoint_pages_one_level(client, temp_data_dir):
+    for name in ['one', 'two', 'three']:
+        (temp_data_dir / 'books' / name).mkdir(parents=True)
+    (temp_data_dir / 'books' / 'two' / 'deep').mkdir()
+
+    response = client.get('/api/directories/children', {'parent': 'books', 'limit': 2})
+    payload = json.loads(response.content)
+    assert response.status_code == 200
+    assert payload['children'] == [
+        {'path': 'books/one', 'name': 'one', 'children': 0},
+        {'path': 'books/three', 'name': 'three', 'children': 0},
+    ]
+
+    response = client.get(
+        '/api/directories/children', {'parent': 'books', 'cursor': payload['next_cursor']}
+    )
+    payload = json.loads(response.content)
+    assert payload['children'] == [{'path': 'books/two', 'name': 'two', 'children': 1}]
+    assert payload['next_cursor'] is None
+
+    assert client.get('/api/directories/children', {'parent': '../etc'}).status_code == 400
+    assert client.get('/api/directories/children', {'parent': 'missing'}).status_code == 404
+
+
 def test_file_endpoint_highlights_requested_line(client, temp_data_dir):
     file_path = temp_data_dir / 'notes.txt'
     file_path.write_text('first\nsecond\nthird\n')
@@ -78,6 +121,26 @@ def test_file_endpoint_highlights_requested_line(client, temp_data_dir):
     assert 'bg-yellow-100' in body
 
 
+def test_file_endpoint_renders_window_with_load_more(client, temp_data_dir, monkeypatch):
+    monkeypatch.setattr(webapp_module, 'PREVIEW_LIMIT', 10)
+    (temp_data_dir / 'long.txt').write_text(''.join(f'row {i}\n' for i in range(1, 101)))
+
+    body = client.get('/api/file', {'file': 'long.txt', 'line_number': 50}).content.decode()
+
+    assert 'row 50' in body
+    assert 'row 44' not in body and 'row 56' not in body
+    assert 'cursor=45&direction=before' in body
+    assert 'cursor=55&direction=after' in body
+
+    more = client.get('/api/file/lines', {'file': 'long.txt', 'cursor': 55, 'direction': 'after'})
+    body = more.content.decode()
+
+    assert more.status_code == 200
+    assert 'row 55' in body and 'row 64' in body and 'row 65' not in body
+    assert 'cursor=65&direction=after' in body
+    assert 'direction=before' not in body
+
+
 def test_search_stream_emits_matches_and_completion(client, temp_data_dir, monkeypatch):
     calls = []
     patch_stream_search(
@@ -104,6 +167,50 @@ def test_search_stream_emits_matches_and_completion(client, temp_data_dir, monke
     assert b'"complete":true' in chunks[-1]
 
 
+def test_search_uses_text_cache_and_index_only_while_watched(client, temp_data_dir, monkeypatch):
+    caches = []
+
+    def fake_stream_search(*_args, text_cache=None, ngram_index=None, **_kwargs):
+        caches.append((text_cache, ngram_index))
+        return FakeProcessor([SearchComplete()])
+
+    monkeypatch.setattr(webapp_module, 'stream_search', fake_stream_search)
+    for _ in range(2):
+        collect_streaming(client.get('/api/search', {'query': 'term', 'directory': '.'}))
+        # a running watcher keeps the generation file fresh
+        webapp_module.GENERATION.bump()
+
+    assert caches == [(None, None), (webapp_module.TEXT_CACHE, webapp_module.NGRAM_INDEX)]
+
+
+def test_search_builds_processor_off_the_event_loop(client, temp_data_dir, monkeypatch):
+    calls = []
+
+    def fake_stream_search(*_args, **_kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            calls.append('thread')
+        else:
+            calls.append('loop')
+        return FakeProcessor([SearchComplete()])
+
+    monkeypatch.setattr(webapp_module, 'stream_search', fake_stream_search)
+    collect_streaming(client.get('/api/search', {'query': 'term', 'directory': '.'}))
+
+    assert calls == ['thread']
+
+
+def test_search_always_highlights_for_the_web_page(client, temp_data_dir):
+    (temp_data_dir / 'notes.txt').write_text('a term here\n')
+
+    response = client.get('/api/search', {'query': 'term', 'directory': '.', 'highlight': 'false'})
+    chunks = collect_streaming(response)
+
+    # the page only renders results that come with their highlighted text
+    assert b'"highlighted_text":"a <span' in chunks[0]
+
+
 
 def test_search_mode_smart_fast_path(client, temp_data_dir, monkeypatch):
     calls = []
@@ -123,6 +230,19 @@ def test_search_mode_ignore_sets_pcre_and_marks(client, temp_data_dir, monkeypat
     assert '\\p{M}' in calls[0][0]
 
 
+def test_search_mode_ignore_uses_built_shadow_without_pcre(client, temp_data_dir, monkeypatch):
+    calls = []
+    patch_stream_search(monkeypatch, calls, include_pcre=True, payloads=[SearchComplete()])
+    webapp_module.SHADOW_CORPUS.build()
+    params = {'query': 'العَربية', 'directory': '.', 'search_mode': 'ignore'}
+    collect_streaming(client.get('/api/search', params))
+    # only trusted while a watcher keeps it current
+    webapp_module.GENERATION.bump()
+    collect_streaming(client.get('/api/search', params))
+    assert [call[4] for call in calls] == [True, False]
+    assert calls[1][0] == '[اأآإى]لعرب[يى][ةته]'
+
+
 def test_search_mode_require_sets_pcre_and_plus_when_typed(client, temp_data_dir, monkeypatch):
     calls = []
     patch_stream_search(monkeypatch, calls, include_pcre=True, payloads=[SearchComplete()])
@@ -176,3 +296,45 @@ def test_search_file_not_found_streams_error(client, temp_data_dir, monkeypatch)
     response = client.get('/api/search', {'query': 't', 'directory': '.'})
     chunks = collect_streaming(response)
     assert any(b'File not found' in c for c in chunks)
+
+
+def test_search_cancels_processor_when_client_disconnects(client, temp_data_dir, monkeypatch):
+    processor = FakeProcessor([SearchMatch(path='a.txt', line_number=1, lines='x')], hang=True)
+    monkeypatch.setattr(webapp_module, 'stream_search', lambda *_args, **_kwargs: processor)
+    response = client.get('/api/search', {'query': 't', 'directory': '.'})
+
+    async def disconnect():
+        stream = response.streaming_content
+        first = await anext(stream)
+        task = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return first
+
+    assert b'a.txt' in asyncio.run(disconnect())
+    assert processor.cancelled
+
+
+def test_search_new_request_cancels_same_client_previous(client, temp_data_dir, monkeypatch):
+    processors = []
+
+    def fake_stream_search(*_args, **_kwargs):
+        processors.append(FakeProcessor([SearchComplete()]))
+        return processors[-1]
+
+    monkeypatch.setattr(webapp_module, 'stream_search', fake_stream_search)
+    monkeypatch.setattr(webapp_module, 'ACTIVE_SEARCHES', {})
+    first = client.get('/api/search', {'query': 'a', 'directory': '.', 'client_id': 'tab'})
+    client.get('/api/search', {'query': 'b', 'directory': '.', 'client_id': 'other'})
+    assert not processors[0].cancelled
+
+    second = client.get('/api/search', {'query': 'ab', 'directory': '.', 'client_id': 'tab'})
+    assert processors[0].cancelled
+    assert not processors[1].cancelled
+
+    collect_streaming(first)
+    assert webapp_module.ACTIVE_SEARCHES['tab'] is processors[2]
+    collect_streaming(second)
+    assert 'tab' not in webapp_module.ACTIVE_SEARCHES
@@ -1,3 +1,5 @@
+import asyncio
+from os import cpu_count, environ
 from pathlib import Path
 
 import orjson
@@ -5,20 +7,68 @@ from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from nanodjango import Django
 
-from core import directories_response, file_response, stream_search, MAX_DEPTH
+from core import (
+    MAX_DEPTH,
+    ConversionTimeout,
+    ResultStreamProcessor,
+    directories_response,
+    directory_children,
+    file_response_async,
+    stream_search,
+)
+from core.admission import MAX_SEARCHES, QUEUE_TIMEOUT, SearchScheduler
+from core.dirtree import DirectoryTree
+from core.extract import CACHE_MAX_BYTES, TextCache
+from core.metrics import render as render_metrics
+from core.ngram import NgramIndex
+from core.patterns import build_literals, build_pattern, build_shadow
+from core.preview import PREVIEW_LIMIT
+from core.results import ResultCache, SearchFlights
 from core.schemas import (
     DirectoriesRequest,
+    DirectoryChildrenRequest,
     FileRequest,
-    SearchComplete,
     SearchError,
-    SearchMatch,
 )
-from core.patterns import build_pattern
+from core.shadow import ShadowCorpus
+from core.streaming import batch_events, encode_events
+from core.watcher import CorpusGeneration
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 TEMPLATES_DIR = ROOT_DIR / 'templates'
 DATA_DIR = ROOT_DIR / 'data'
 RGA_CONFIG_PATH = ROOT_DIR / 'rga.config.json'
+CACHE_DIR = Path(environ.get('BAHETH_CACHE_DIR') or ROOT_DIR / '.cache')
+TEXT_CACHE = TextCache(
+    CACHE_DIR / 'extract',
+    DATA_DIR,
+    max_bytes=int(environ.get('BAHETH_CACHE_MAX_BYTES') or CACHE_MAX_BYTES),
+)
+# only consulted once built with `python -m core index`, while the watcher keeps it current
+NGRAM_INDEX = NgramIndex(CACHE_DIR / 'index', DATA_DIR, TEXT_CACHE)
+# Ignore-mode searches run over it once built with `python -m core extract --shadow`, while
+# the watcher (started with `--shadow`) keeps it current
+SHADOW_CORPUS = ShadowCorpus(CACHE_DIR / 'shadow', DATA_DIR, TEXT_CACHE)
+# bumped by `python -m core watch`; without a live watcher listings fall back to a TTL and
+# searches skip the text cache, n-gram index and shadow corpus, which nothing else keeps current
+GENERATION = CorpusGeneration(CACHE_DIR / 'generation')
+# one walk of the data directory shared by every worker, refreshed in the background
+DIRECTORY_TREE = DirectoryTree(CACHE_DIR / 'directories.json', DATA_DIR)
+RESULT_CACHE = ResultCache()
+# identical concurrent searches share one rg process
+SEARCH_FLIGHTS = SearchFlights()
+# latest search of each browser tab, keyed by the client_id it sends
+ACTIVE_SEARCHES: dict[str, ResultStreamProcessor] = {}
+# caps rg/rga processes per worker and, through lock files, across all Granian workers
+SCHEDULER = SearchScheduler(
+    max_running=int(environ.get('BAHETH_MAX_SEARCHES') or MAX_SEARCHES),
+    global_limit=int(environ.get('BAHETH_MAX_SEARCHES_GLOBAL') or cpu_count() or MAX_SEARCHES),
+    lock_dir=CACHE_DIR / 'slots',
+    timeout=float(environ.get('BAHETH_QUEUE_TIMEOUT') or QUEUE_TIMEOUT),
+)
+# rg/rga processes per full-directory search; each one counts against the limits above
+SEARCH_SHARDS = int(environ.get('BAHETH_SEARCH_SHARDS') or 1)
+SEARCH_ENGINE = environ.get('BAHETH_SEARCH_ENGINE') or 'rg'
 
 app = Django(
     TEMPLATES=[
@@ -38,10 +88,9 @@ app = Django(
 )
 
 
-
 def get_directories(max_depth: int = MAX_DEPTH) -> list[str]:
     request = DirectoriesRequest(max_depth=max_depth)
-    return directories_response(DATA_DIR, request).directories
+    return directories_response(DATA_DIR, request, GENERATION.current(), DIRECTORY_TREE).directories
 
 
 @app.route('/')
@@ -53,6 +102,40 @@ def index(request):
     )
 
 
+def _search_processor(
+    query: str, directory: str, filters: list[str], mode: str
+) -> ResultStreamProcessor:
+    generation = GENERATION.current()
+    watched = generation is not None
+    shadow = None
+    if watched and mode == 'ignore' and SHADOW_CORPUS.is_complete():
+        shadow = SHADOW_CORPUS
+    if shadow is not None:
+        pattern, need_pcre = build_shadow(query), False
+    else:
+        pattern, need_pcre = build_pattern(mode, query)
+
+    return stream_search(
+        pattern,
+        directory,
+        filters,
+        DATA_DIR,
+        RGA_CONFIG_PATH if RGA_CONFIG_PATH.exists() else None,
+        use_pcre=need_pcre,
+        text_cache=TEXT_CACHE if watched else None,
+        ngram_index=NGRAM_INDEX if watched else None,
+        literals=build_literals(mode, query),
+        result_cache=RESULT_CACHE,
+        generation=generation,
+        flights=SEARCH_FLIGHTS,
+        scheduler=SCHEDULER,
+        shards=SEARCH_SHARDS,
+        engine=SEARCH_ENGINE,
+        mode=mode,
+        shadow=shadow,
+    )
+
+
 @app.api.get('/search')
 async def search(
     request: StreamingHttpResponse,
@@ -60,6 +143,7 @@ async def search(
     directory: str,
     file_filter: str | None = None,
     search_mode: str | None = None,
+    client_id: str | None = None,
 ):
     if not query:
         return ''
@@ -70,16 +154,8 @@ async def search(
         if not filters and file_filter:
             filters = [p.strip() for p in file_filter.split(',') if p.strip()]
         mode = (search_mode or 'smart').strip().lower()
-        pattern, need_pcre = build_pattern(mode, query)
-
-        processor = stream_search(
-            pattern,
-            directory,
-            filters,
-            DATA_DIR,
-            RGA_CONFIG_PATH if RGA_CONFIG_PATH.exists() else None,
-            use_pcre=need_pcre,
-        )
+        # reads the caches' SQLite stores and may walk the tree, keep it off the event loop
+        processor = await asyncio.to_thread(_search_processor, query, directory, filters, mode)
     except FileNotFoundError:
 
         async def error_stream():
@@ -87,38 +163,91 @@ async def search(
 
         return StreamingHttpResponse(error_stream(), content_type='text/event-stream')
 
+    if client_id:
+        # like the desktop app, a client's new search replaces its previous one
+        previous = ACTIVE_SEARCHES.get(client_id)
+        ACTIVE_SEARCHES[client_id] = processor
+        if previous is not None:
+            await previous.cancel()
+
     async def event_stream():
-        async for payload in processor.process():
-            if isinstance(payload, (SearchMatch, SearchError, SearchComplete)):
-                data = payload.model_dump()
-            else:
-                data = payload  # fallback for unexpected payloads
-            yield f'data: {orjson.dumps(data).decode()}\n\n'
+        events = processor.process()
+        batches = batch_events(events)
+        finished = False
+        try:
+            async for batch in batches:
+                yield encode_events(batch)
+            finished = True
+        finally:
+            if not finished:
+                # the client went away, stop scanning for nobody
+                await processor.cancel()
+            await batches.aclose()
+            await events.aclose()
+            if client_id and ACTIVE_SEARCHES.get(client_id) is processor:
+                del ACTIVE_SEARCHES[client_id]
 
     return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
 
 
-@app.api.get('/file')
-def file(request: HttpRequest, file: str, line_number: int | None = None) -> HttpResponse:
+@app.route('/metrics')
+def metrics(request: HttpRequest) -> HttpResponse:
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4')
+
+
+async def file_window(request: HttpRequest, file: str, **params) -> HttpResponse | dict:
     if not file:
         return HttpResponse(status=400)
 
     try:
-        response = file_response(DATA_DIR, FileRequest(path=file, line_number=line_number))
+        response = await file_response_async(
+            DATA_DIR,
+            FileRequest(path=file, limit=PREVIEW_LIMIT, **params),
+            TEXT_CACHE,
+        )
     except ValueError:
         return HttpResponse(status=400)
     except FileNotFoundError:
         return HttpResponse(status=404)
+    except ConversionTimeout:
+        return HttpResponse(status=504)
 
-    return render(
-        request,
-        'file_modal.html',
-        {
-            'file': response.file,
-            'lines': response.lines,
-            'line_number': response.line_number,
-        },
+    return {
+        'file': response.file,
+        'lines': list(enumerate(response.lines, response.start_line)),
+        'line_number': response.line_number,
+        'prev_cursor': response.prev_cursor,
+        'next_cursor': response.next_cursor,
+    }
+
+
+@app.api.get('/file')
+async def file(request: HttpRequest, file: str, line_number: int | None = None) -> HttpResponse:
+    context = await file_window(request, file, line_number=line_number)
+    if isinstance(context, HttpResponse):
+        return context
+    return render(request, 'file_modal.html', context)
+
+
+@app.api.get('/file/lines')
+async def file_lines(
+    request: HttpRequest,
+    file: str,
+    cursor: int,
+    direction: str = 'after',
+    line_number: int | None = None,
+) -> HttpResponse:
+    """Next or previous page of the preview, swapped in place of its load button."""
+    if direction not in ('after', 'before'):
+        return HttpResponse(status=400)
+    context = await file_window(
+        request, file, cursor=cursor, direction=direction, line_number=line_number
     )
+    if isinstance(context, HttpResponse):
+        return context
+    context['show_prev'] = direction == 'before'
+    context['show_next'] = direction == 'after'
+    return render(request, 'file_lines.html', context)
 
 
 @app.api.get('/directories')
@@ -130,15 +259,36 @@ def directories(
     except Exception:  # noqa: BLE001
         limit = 200
     try:
-        max_depth = int(max_depth or MAX_DEPTH)
+        max_depth = max(1, min(int(max_depth or MAX_DEPTH), MAX_DEPTH))
     except Exception:  # noqa: BLE001
         max_depth = MAX_DEPTH
 
     response = directories_response(
         DATA_DIR,
         DirectoriesRequest(query=q, limit=limit, max_depth=max_depth),
+        GENERATION.current(),
+        DIRECTORY_TREE,
+    )
+
+    return HttpResponse(
+        orjson.dumps(response.model_dump()),
+        content_type='application/json',
     )
 
+
+@app.api.get('/directories/children')
+def directories_children(
+    request: HttpRequest, parent: str = '.', cursor: str | None = None, limit: int = 200
+) -> HttpResponse:
+    try:
+        response = directory_children(
+            DATA_DIR, DirectoryChildrenRequest(parent=parent, cursor=cursor or None, limit=limit)
+        )
+    except ValueError:
+        return HttpResponse(status=400)
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+
     return HttpResponse(
         orjson.dumps(response.model_dump()),
         content_type='application/json',